@@ -1,36 +1,39 @@
 import os
-import json
 import subprocess
-from typing import Dict, Optional
+from typing import Optional
 from Config.settings import settings
+from Agents.musicLibrary import mix_params
+from utils.media_probe import get_duration
+from utils.ffmpeg_runner import run_ffmpeg
 
-class VideoMusicSynchronizer:
-    def __init__(self, music_path: str, cache_file: str = 'music_sync_cache.json'):
-        self.music_path = music_path
-        self.cache_file = cache_file
-        self.music_sync_cache: Dict[str, Dict[str, float]] = self._load_cache()
+def music_mix_filter(voice_label: str = '[0:a]', music_label: str = '[1:a]', out_label: str = '[aout]', gain_db: Optional[float] = None) -> str:
+    """Voice/music mix shared by the music remux and the fused finalize render.
 
-    def _load_cache(self) -> Dict[str, Dict[str, float]]:
-        try:
-            with open(self.cache_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+    gain_db is the track's precomputed static gain (Agents/musicLibrary.py); the mix then only
+    needs a peak limiter. Without it the whole mix goes through loudnorm.
+    """
+    if gain_db is not None:
+        return (
+            f'{voice_label}volume=0.8[original];'
+            f'{music_label}volume={gain_db:.2f}dB[music];'
+            f'[original][music]amix=inputs=2:duration=first:normalize=0,'
+            f'alimiter=limit=0.891:level=disabled{out_label}'  # -1 dBFS ceiling
+        )
+    return (
+        f'{voice_label}volume=0.8[original];'  # Reduced from 10.0 to 0.8
+        f'{music_label}volume=0.3[music];'      # Adjusted music volume
+        f'[original][music]amix=inputs=2:duration=first:normalize=0,'
+        f'loudnorm=I=-16:TP=-1.5:LRA=11{out_label}'  # Added normalization
+    )
 
-    def _save_cache(self):
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.music_sync_cache, f)
+class VideoMusicSynchronizer:
+    def __init__(self, music_path: str, job_id: Optional[str] = None):
+        self.music_path = music_path
+        self.job_id = job_id
 
     def get_video_duration(self, video_path: str) -> float:
         try:
-            result = subprocess.run([
-                settings.get_ffprobe(), 
-                '-v', 'error', 
-                '-show_entries', 'format=duration', 
-                '-of', 'default=noprint_wrappers=1:nokey=1', 
-                video_path
-            ], capture_output=True, text=True)
-            return float(result.stdout.strip())
+            return get_duration(video_path)
         except Exception as e:
             print(f"Error getting video duration: {e}")
             return 0
@@ -39,33 +42,21 @@ class VideoMusicSynchronizer:
         # Get video duration
         video_duration = self.get_video_duration(video_path)
         
-        # Determine music start point from cache or reset
-        video_key = os.path.basename(video_path)
-        if video_key not in self.music_sync_cache:
-            self.music_sync_cache[video_key] = {'last_music_start': 0}
-        
-        # Get last music start point
-        last_music_start = self.music_sync_cache[video_key]['last_music_start']
-        
-        # Calculate music start and end points
-        music_start = last_music_start
-        music_end = music_start + video_duration
-        
+        # Canonical copy, static gain and start offset from the music index (ingested once per track)
+        params = mix_params(self.music_path, video_duration, job_id=self.job_id)
+        seek = ['-ss', f"{params['start']:.3f}"] if params and params['start'] else []
+
         # Prepare output path
         if output_path is None:
             output_path = "output/youtube_shorts_with_music.mp4"
         
         # FFmpeg command to mix audio with volume adjustments
         try:
-            subprocess.run([
-                settings.get_ffmpeg(),
+            run_ffmpeg([
+                settings.get_ffmpeg(), '-y',
                 '-i', video_path,
-                '-i', self.music_path,
-                '-filter_complex',
-                f'[0:a]volume=0.8[original];'  # Reduced from 10.0 to 0.8
-                f'[1:a]volume=0.3[music];'      # Adjusted music volume
-                f'[original][music]amix=inputs=2:duration=first:normalize=0,'
-                'loudnorm=I=-16:TP=-1.5:LRA=11[aout]',  # Added normalization
+                *seek, '-i', params['source'] if params else self.music_path,
+                '-filter_complex', music_mix_filter(gain_db=params['gain_db'] if params else None),
                 '-map', '0:v',
                 '-map', '[aout]',
                 '-c:v', 'copy',
@@ -73,15 +64,11 @@ class VideoMusicSynchronizer:
                 '-b:a', '192k',  # Added audio bitrate
                 '-shortest',
                 output_path
-            ], check=True)
-        except subprocess.CalledProcessError as e:
+            ], job_id=self.job_id, stage='music', duration=video_duration or None)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
             print(f"Error syncing music: {e}")
             return video_path
-        
-        # Update cache with new music start point
-        self.music_sync_cache[video_key]['last_music_start'] = music_end
-        self._save_cache()
-        
+
         return output_path
 
 
@@ -3,13 +3,39 @@
 Legacy Whisper-based local implementation removed for clarity; use git history if needed.
 """
 
-import subprocess
 import os
+import re
+import json
+import hashlib
+import time
+import shutil
+import socket
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from types import SimpleNamespace
+import numpy as np
 from groq import Groq
 from Config.settings import settings
+from Config.render_tiers import get_render_tier, scaled_size, tier_output_path
 from utils.logging_utils import log_event
 from utils.exceptions import CaptionError
+from utils.media_probe import probe
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.scratch import ScratchSpace
+from utils.disk_cache import DiskLRUCache, cache_key
+from Agents.captionAligner import SAMPLE_RATE, align_timeline, energy_envelope, load_voice_timeline
+from Agents.captionLayout import PLAY_RES_Y, layout_phrases, read_srt_words, write_ass
+
+CAPTION_MODES = ('burn', 'soft', 'sidecar')
+PCM_BYTES_PER_SEC = SAMPLE_RATE * 2  # 16 kHz mono s16le
+CHUNK_HOP_SEC = 0.05
+CHUNK_BITRATE = '24k'  # Opus speech: ~3 kB/s, far below Whisper upload limits
+
+_style_lock = threading.Lock()
+_transcript_cache = None
+_transcript_cache_lock = threading.Lock()
 
 def format_timestamp(seconds):
     """Convert seconds to SRT timestamp format"""
@@ -20,164 +46,528 @@ def format_timestamp(seconds):
     milliseconds = int(round((td.total_seconds() - int(td.total_seconds())) * 1000))
     return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
 
-def transcribe_and_caption(video_path, output_path="output.srt", model_name="whisper-large-v3", offset=0.1, video_mode=False, job_id: str | None = None):
+def _audio_estimate(video_path):
+    # 16 kHz mono s16le = 32 kB/s; the video's size is a safe upper bound
+    try:
+        duration = probe(video_path).get('duration') or 0
+    except (FileNotFoundError, RuntimeError):
+        duration = 0
+    if duration:
+        return int(duration * PCM_BYTES_PER_SEC) + (64 << 10)
+    return os.path.getsize(video_path) if os.path.exists(video_path) else 0
+
+def extract_audio(video_path, audio_path, job_id: str | None = None):
+    """Extract the audio track of video_path to audio_path as 16 kHz mono PCM WAV. Raises CaptionError.
+
+    Whisper resamples to 16 kHz mono anyway; the PCM is split on silence and each chunk
+    is encoded compactly for upload (see transcribe_chunked).
     """
-    Transcribe a video's audio using Groq Whisper API, build word/segment-level SRT, then burn glowing captions.
-    Returns path to final captioned video. Raises CaptionError on any failure.
+    extract_audio_cmd = [
+        settings.get_ffmpeg(), "-y", "-i", video_path, "-vn",
+        "-ac", "1", "-ar", str(SAMPLE_RATE), "-c:a", "pcm_s16le", audio_path
+    ]
+    log_event(job_id, 'captions', 'extract_audio_start', cmd=' '.join(extract_audio_cmd))
+    extract_proc = run_ffmpeg(extract_audio_cmd, job_id=job_id, stage='captions', check=False, report=False)
+    if extract_proc.returncode != 0 or not os.path.exists(audio_path):
+        log_event(job_id, 'captions', 'extract_audio_failed', returncode=extract_proc.returncode, stderr=extract_proc.stderr[:400])
+        raise CaptionError(f"Audio extraction failed: {extract_proc.stderr.strip()[:500]}")
+    log_event(job_id, 'captions', 'extract_audio_done', size=os.path.getsize(audio_path))
+    return audio_path
+
+def transcribe(audio_path, model_name="whisper-large-v3", job_id: str | None = None):
+    """Transcribe audio_path with Groq Whisper (verbose_json, segment/word timings)."""
+    log_event(job_id, 'captions', 'init_model', model=model_name)
+    client = Groq()
+    log_event(job_id, 'captions', 'transcribe_start', file=os.path.basename(audio_path))
+    with open(audio_path, "rb") as file:
+        transcription = client.audio.transcriptions.create(
+            file=(os.path.basename(audio_path), file.read()),
+            model=model_name,
+            response_format="verbose_json",
+        )
+    log_event(job_id, 'captions', 'transcribe_done', has_segments=hasattr(transcription, 'segments'))
+    return transcription
+
+def read_pcm(wav_path):
+    """Mono int16 samples of a 16-bit PCM WAV (as written by extract_audio) and its sample rate."""
+    with wave.open(wav_path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise CaptionError(f"Expected 16-bit PCM audio: {wav_path}")
+        channels, rate = wav.getnchannels(), wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, rate
+
+def plan_chunks(samples, sample_rate=SAMPLE_RATE, chunk_sec=None, search_sec=None):
+    """[(start, end)] seconds covering the audio, cut at the quietest point near every chunk_sec.
+
+    Each cut is searched within +/- search_sec of its target on a smoothed 50 ms energy
+    envelope, so chunks end in pauses rather than mid-word.
     """
-    audio_path = os.path.splitext(video_path)[0] + ".m4a"
-    output_video = None
-    try:
-        # 1. Extract audio
-        extract_audio_cmd = [
-            settings.get_ffmpeg(), "-y", "-i", video_path, "-vn", "-acodec", "aac", audio_path
-        ]
-        log_event(job_id, 'captions', 'extract_audio_start', cmd=' '.join(extract_audio_cmd))
-        extract_proc = subprocess.run(extract_audio_cmd, capture_output=True, text=True)
-        if extract_proc.returncode != 0 or not os.path.exists(audio_path):
-            log_event(job_id, 'captions', 'extract_audio_failed', returncode=extract_proc.returncode, stderr=extract_proc.stderr[:400])
-            raise CaptionError(f"Audio extraction failed: {extract_proc.stderr.strip()[:500]}")
-        log_event(job_id, 'captions', 'extract_audio_done', size=os.path.getsize(audio_path))
-
-        # 2. Transcription
-        log_event(job_id, 'captions', 'init_model', model=model_name)
-        client = Groq()
-        log_event(job_id, 'captions', 'transcribe_start')
-        with open(audio_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(audio_path, file.read()),
-                model=model_name,
-                response_format="verbose_json",
+    chunk_sec = chunk_sec or settings.CAPTION_CHUNK_SEC
+    search_sec = settings.CAPTION_CHUNK_SEARCH_SEC if search_sec is None else search_sec
+    total = len(samples) / float(sample_rate)
+    if chunk_sec <= 0 or total <= chunk_sec + search_sec:
+        return [(0.0, total)]
+    env = energy_envelope(samples, sample_rate, CHUNK_HOP_SEC)
+    # 300 ms moving average: a cut needs a pause, not a single quiet hop
+    width = max(1, int(0.3 / CHUNK_HOP_SEC))
+    env = np.convolve(env, np.ones(width) / width, mode='same')
+    cuts, pos = [0.0], 0.0
+    while total - pos > chunk_sec + search_sec:
+        lo = int((pos + chunk_sec - search_sec) / CHUNK_HOP_SEC)
+        hi = int((pos + chunk_sec + search_sec) / CHUNK_HOP_SEC)
+        window = env[lo:hi]
+        cut = (lo + int(np.argmin(window)) + 0.5) * CHUNK_HOP_SEC if window.size else pos + chunk_sec
+        cuts.append(cut)
+        pos = cut
+    cuts.append(total)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def encode_chunk(wav_path, start, end, chunk_path, job_id: str | None = None):
+    """Encode [start, end) of wav_path to chunk_path as low-bitrate Opus (speech-tuned)."""
+    cmd = [
+        settings.get_ffmpeg(), '-y', '-ss', f"{start:.3f}", '-t', f"{end - start:.3f}", '-i', wav_path,
+        '-c:a', 'libopus', '-b:a', CHUNK_BITRATE, '-application', 'voip', chunk_path
+    ]
+    proc = run_ffmpeg(cmd, job_id=job_id, stage='captions', check=False, report=False)
+    if proc.returncode != 0 or not os.path.exists(chunk_path):
+        raise CaptionError(f"Audio chunk encode failed: {proc.stderr.strip()[:500]}")
+    return chunk_path
+
+def _field(obj, name, default=None):
+    return obj.get(name, default) if isinstance(obj, dict) else getattr(obj, name, default)
+
+def _shift_segments(transcription, offset):
+    # Chunk-relative Whisper timings -> global timeline
+    if not hasattr(transcription, 'segments'):
+        text = (getattr(transcription, 'text', '') or '').strip()
+        return [{'start': offset, 'end': offset + 5, 'text': text, 'words': []}] if text else []
+    segments = []
+    for seg in transcription.segments or []:
+        start = float(_field(seg, 'start', 0) or 0)
+        segments.append({
+            'start': offset + start,
+            'end': offset + float(_field(seg, 'end', start + 5) or start + 5),
+            'text': _field(seg, 'text', '') or '',
+            'words': [{
+                'word': _field(w, 'word', ''),
+                'start': offset + float(_field(w, 'start', start) or start),
+                'end': offset + float(_field(w, 'end', start + 0.4) or start + 0.4),
+            } for w in (_field(seg, 'words') or [])],
+        })
+    return segments
+
+def transcript_cache():
+    """Process-wide cache of stitched transcriptions (CACHE_DIR/transcripts), or None when disabled."""
+    global _transcript_cache
+    if not settings.TRANSCRIPT_CACHE_ENABLED:
+        return None
+    with _transcript_cache_lock:
+        if _transcript_cache is None:
+            _transcript_cache = DiskLRUCache(
+                os.path.join(settings.CACHE_DIR, 'transcripts'),
+                settings.TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024,
+                name='transcripts',
             )
-        has_segments = hasattr(transcription, 'segments')
-        log_event(job_id, 'captions', 'transcribe_done', has_segments=has_segments)
-
-        # 3. Build SRT
-        log_event(job_id, 'captions', 'caption_build_start')
-        srt_index = 1
-        with open(output_path, "w", encoding="utf-8") as srt_file:
-            if has_segments:
-                segments_list = transcription.segments
+        return _transcript_cache
+
+def _cached_transcription(cache, key, job_id):
+    path = cache.get(key, '.json')
+    if path is None:
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return SimpleNamespace(segments=json.load(f)['segments'])
+    except (OSError, ValueError, KeyError) as e:
+        log_event(job_id, 'captions', 'transcript_cache_corrupt', error=str(e))
+        return None
+
+def transcribe_chunked(wav_path, model_name="whisper-large-v3", job_id: str | None = None, scratch: ScratchSpace | None = None):
+    """Transcribe a 16 kHz mono WAV as silence-split Opus chunks with bounded parallelism.
+
+    Chunk timings are shifted back onto the global timeline, so the result is a single
+    transcription-like object (segments with words) for write_srt. Results are cached by
+    PCM content + model, so re-captioning unchanged audio makes no provider call.
+    """
+    samples, rate = read_pcm(wav_path)
+    cache = transcript_cache()
+    key = None
+    if cache is not None:
+        key = cache_key('transcript', hashlib.sha256(samples.tobytes()).hexdigest(), rate, model_name)
+        cached = _cached_transcription(cache, key, job_id)
+        log_event(job_id, 'captions', 'transcript_cache_hit' if cached else 'transcript_cache_miss', key=key[:12])
+        cache.log_stats(job_id, 'captions')
+        if cached is not None:
+            return cached
+    chunks = plan_chunks(samples, rate)
+    del samples
+    own_scratch = scratch is None
+    scratch = scratch or ScratchSpace(job_id, 'captions')
+    workers = max(1, min(settings.CAPTION_MAX_PARALLEL, len(chunks)))
+    log_event(job_id, 'captions', 'chunks_planned', chunks=len(chunks), workers=workers,
+              bounds=[round(e, 2) for _, e in chunks[:-1]])
+
+    def run_chunk(i, start, end):
+        chunk_path = scratch.path(f"chunk_{i:03d}.ogg", estimate=int((end - start) * 4000) + (16 << 10))
+        encode_chunk(wav_path, start, end, chunk_path, job_id=job_id)
+        t0 = time.perf_counter()
+        result = transcribe(chunk_path, model_name, job_id=job_id)
+        log_event(job_id, 'captions', 'chunk_done', chunk=i, start=round(start, 3), seconds=round(end - start, 3),
+                  bytes=os.path.getsize(chunk_path), elapsed_ms=round((time.perf_counter() - t0) * 1000, 1))
+        return _shift_segments(result, start)
+
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='transcribe') as pool:
+            futures = [pool.submit(run_chunk, i, s, e) for i, (s, e) in enumerate(chunks)]
+            segments = [seg for f in futures for seg in f.result()]
+    finally:
+        if own_scratch:
+            scratch.cleanup()
+    log_event(job_id, 'captions', 'transcribe_chunked_done', chunks=len(chunks), segments=len(segments),
+              elapsed_ms=round((time.perf_counter() - t0) * 1000, 1))
+    if cache is not None:
+        cache.put_bytes(key, json.dumps({'model': model_name, 'segments': segments}, ensure_ascii=False).encode('utf-8'), '.json')
+    return SimpleNamespace(segments=segments)
+
+def write_srt(transcription, output_path, offset=0.1, job_id: str | None = None):
+    """Write word-level (or segment-level) SRT cues for a transcription. Returns the cue count."""
+    log_event(job_id, 'captions', 'caption_build_start')
+    srt_index = 1
+    with open(output_path, "w", encoding="utf-8") as srt_file:
+        if hasattr(transcription, 'segments'):
+            segments_list = transcription.segments
+        else:
+            segments_list = [{
+                'start': 0,
+                'end': 5,
+                'text': getattr(transcription, 'text', '')
+            }]
+        for segment in segments_list:
+            # Normalize segment
+            if isinstance(segment, dict):
+                start_time = segment.get('start', 0)
+                end_time = segment.get('end', start_time + 5)
+                text = segment.get('text', '').strip()
+                words = segment.get('words', [])
             else:
-                segments_list = [{
-                    'start': 0,
-                    'end': 5,
-                    'text': getattr(transcription, 'text', '')
-                }]
-            for segment in segments_list:
-                # Normalize segment
-                if isinstance(segment, dict):
-                    start_time = segment.get('start', 0)
-                    end_time = segment.get('end', start_time + 5)
-                    text = segment.get('text', '').strip()
-                    words = segment.get('words', [])
-                else:
-                    start_time = getattr(segment, 'start', 0)
-                    end_time = getattr(segment, 'end', start_time + 5)
-                    text = getattr(segment, 'text', '').strip()
-                    words = getattr(segment, 'words', [])
-
-                if words:
-                    for word_info in words:
-                        if isinstance(word_info, dict):
-                            word_start = word_info.get('start', start_time)
-                            word_end = word_info.get('end', word_start + 0.4)
-                            word_text = word_info.get('word', '').strip()
-                        else:
-                            word_start = getattr(word_info, 'start', start_time)
-                            word_end = getattr(word_info, 'end', word_start + 0.4)
-                            word_text = getattr(word_info, 'word', '').strip()
-                        word_end_adjusted = min(word_end + offset, end_time)
-                        srt_file.write(f"{srt_index}\n")
-                        srt_file.write(f"{format_timestamp(word_start)} --> {format_timestamp(word_end_adjusted)}\n")
-                        srt_file.write(f"{word_text}\n\n")
-                        srt_index += 1
-                else:
+                start_time = getattr(segment, 'start', 0)
+                end_time = getattr(segment, 'end', start_time + 5)
+                text = getattr(segment, 'text', '').strip()
+                words = getattr(segment, 'words', [])
+
+            if words:
+                for word_info in words:
+                    if isinstance(word_info, dict):
+                        word_start = word_info.get('start', start_time)
+                        word_end = word_info.get('end', word_start + 0.4)
+                        word_text = word_info.get('word', '').strip()
+                    else:
+                        word_start = getattr(word_info, 'start', start_time)
+                        word_end = getattr(word_info, 'end', word_start + 0.4)
+                        word_text = getattr(word_info, 'word', '').strip()
+                    word_end_adjusted = min(word_end + offset, end_time)
                     srt_file.write(f"{srt_index}\n")
-                    srt_file.write(f"{format_timestamp(start_time)} --> {format_timestamp(end_time)}\n")
-                    srt_file.write(f"{text}\n\n")
+                    srt_file.write(f"{format_timestamp(word_start)} --> {format_timestamp(word_end_adjusted)}\n")
+                    srt_file.write(f"{word_text}\n\n")
                     srt_index += 1
-        log_event(job_id, 'captions', 'caption_build_done', captions=srt_index-1)
+            else:
+                srt_file.write(f"{srt_index}\n")
+                srt_file.write(f"{format_timestamp(start_time)} --> {format_timestamp(end_time)}\n")
+                srt_file.write(f"{text}\n\n")
+                srt_index += 1
+    log_event(job_id, 'captions', 'caption_build_done', captions=srt_index-1)
+    return srt_index - 1
 
-        # 4. Probe video for dimensions
-        probe_cmd = [
-            settings.get_ffprobe(), "-v", "error", "-select_streams", "v:0",
-            "-show_entries", "stream=width,height",
-            "-of", "csv=s=x:p=0", video_path
+def caption_audio(audio_path, output_path, model_name="whisper-large-v3", offset=0.1, job_id: str | None = None, scratch: ScratchSpace | None = None):
+    """Transcribe a 16 kHz mono WAV (chunked, in parallel) and write its SRT to output_path. Raises CaptionError."""
+    try:
+        transcription = transcribe_chunked(audio_path, model_name, job_id=job_id, scratch=scratch)
+        write_srt(transcription, output_path, offset=offset, job_id=job_id)
+    except CaptionError:
+        raise
+    except Exception as e:
+        log_event(job_id, 'captions', 'error', error=str(e))
+        raise CaptionError(str(e))
+    return output_path
+
+def align_known_scripts(video_path, job_id: str | None = None):
+    """Locally aligned captions for a video produced by the edit stage, or None to fall back to Whisper.
+
+    Needs the edit's voice_timeline.json next to the video (matching its duration) and the
+    voice stage's scripts.json for every clip.
+    """
+    try:
+        duration = probe(video_path, job_id=job_id).get('duration')
+        timeline = load_voice_timeline(os.path.dirname(os.path.abspath(video_path)), duration)
+        if timeline is None:
+            log_event(job_id, 'captions', 'align_skipped', reason='no matching voice timeline')
+            return None
+        return align_timeline(timeline['clips'], job_id=job_id)
+    except Exception as e:
+        log_event(job_id, 'captions', 'align_failed', error=str(e))
+        return None
+
+def caption_font_size(height, video_mode=False):
+    return max(14, int(height * (0.02 if video_mode else 0.013)))
+
+def _outline(variant):
+    return 6 if variant == 'fancy' else 4
+
+def subtitle_style(height, video_mode=False, variant='simple'):
+    """ASS force_style for burned captions; "fancy" imitates a glow with a heavier outline."""
+    bottom_padding = 50
+    font_size = caption_font_size(height, video_mode)
+    return (
+        f"FontName=Arial,FontSize={font_size},PrimaryColour=&HFFFFFF&,Outline={_outline(variant)},Shadow=0,"
+        f"BorderStyle=1,Alignment=2,MarginV={bottom_padding}"
+    )
+
+def subtitles_filter(srt_path, style=None):
+    """subtitles= filter for srt_path (or an .ass script) with the path escaped for the filtergraph parser."""
+    # Use forward slashes for ffmpeg
+    srt_ff = srt_path.replace('\\', '/').replace(':', '\\:')  # escape drive colon
+    return f"subtitles={srt_ff}:force_style='{style}'" if style else f"subtitles={srt_ff}"
+
+def srt_to_ass(srt_path, ass_path, width, height, video_mode=False, variant='simple', job_id: str | None = None):
+    """Lay out a word-level SRT as karaoke phrases (Agents/captionLayout.py); returns the event count."""
+    font_size = caption_font_size(height, video_mode)
+    # Arial averages ~0.55 em per character; the script is scaled from PlayResY to the frame height
+    char_px = font_size * height / PLAY_RES_Y * 0.55
+    max_chars = max(4, min(settings.CAPTION_MAX_CHARS, int(width * 0.9 / char_px)))
+    words = read_srt_words(srt_path)
+    phrases = layout_phrases(words, max_chars=max_chars, max_lines=settings.CAPTION_MAX_LINES, max_duration=settings.CAPTION_MAX_PHRASE_SEC)
+    events = write_ass(phrases, ass_path, font_size, outline=_outline(variant), margin_v=50)
+    log_event(job_id, 'captions', 'layout_done', words=len(words), events=events, max_chars=max_chars)
+    return events
+
+def burn_filter(srt_path, width, height, video_mode=False, variant='simple', job_id: str | None = None):
+    """Filter that burns srt_path: karaoke phrases from a generated .ass (CAPTION_LAYOUT=phrases) or one cue per word."""
+    if settings.CAPTION_LAYOUT == 'phrases':
+        ass_path = os.path.splitext(srt_path)[0] + '.ass'
+        srt_to_ass(srt_path, ass_path, width, height, video_mode, variant, job_id=job_id)
+        return subtitles_filter(ass_path)
+    return subtitles_filter(srt_path, subtitle_style(height, video_mode, variant))
+
+def _style_cache_path():
+    return os.path.join(settings.CACHE_DIR, 'caption_styles.json')
+
+def _load_style_cache():
+    try:
+        with open(_style_cache_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_style_cache(cache):
+    path = _style_cache_path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def _first_cue_start(srt_path):
+    with open(srt_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if '-->' in line:
+                h, m, rest = line.split('-->')[0].strip().split(':')
+                return int(h) * 3600 + int(m) * 60 + float(rest.replace(',', '.'))
+    return 0.0
+
+def preflight_subtitles(srt_path, width, height, video_mode=False, job_id: str | None = None):
+    """Validate the burn filter on a 1-second sample before any full-length encode.
+
+    The sample is a black clip shifted to the first cue, filtered with the real (escaped)
+    SRT path; "simple" is tried before "fancy". libass' font selection is checked so a
+    missing font shows up as a logged substitution. The working variant is cached per
+    host/ffmpeg/font, caption layout and variant styles in CACHE_DIR/caption_styles.json and reused without a sample when the
+    SRT path has no characters that need escaping. Returns (variant, filter); raises
+    CaptionError when no variant renders.
+    """
+    font = 'Arial'
+    # Everything that shapes the sampled filter: a variant validated for one layout/style is not reused for another
+    style_key = cache_key(
+        'caption-style/v2', socket.gethostname(), settings.get_ffmpeg(), font,
+        settings.CAPTION_LAYOUT, settings.CAPTION_MAX_CHARS, settings.CAPTION_MAX_LINES,
+        width, height, bool(video_mode),
+        [subtitle_style(height, video_mode, variant) for variant in ('simple', 'fancy')],
+    )
+    plain_path = re.fullmatch(r'[\w./-]+', srt_path.replace('\\', '/')) is not None
+    with _style_lock:
+        cached = _load_style_cache().get(style_key)
+    if cached and plain_path:
+        variant = cached['variant']
+        log_event(job_id, 'captions', 'preflight_cached', variant=variant, font=cached.get('font'))
+        return variant, burn_filter(srt_path, width, height, video_mode, variant, job_id=job_id)
+    start = _first_cue_start(srt_path)
+    last_err = ''
+    for variant in ('simple', 'fancy'):
+        expr = burn_filter(srt_path, width, height, video_mode, variant, job_id=job_id)
+        cmd = [
+            settings.get_ffmpeg(), '-hide_banner', '-v', 'verbose',
+            '-f', 'lavfi', '-i', f"color=c=black:s={width}x{height}:r=5:d=1,setpts=PTS+{start:.3f}/TB",
+            '-vf', expr, '-f', 'null', '-'
         ]
-        dimensions = subprocess.check_output(probe_cmd, universal_newlines=True).strip()
-        width, height = map(int, dimensions.split('x'))
+        proc = run_ffmpeg(cmd, job_id=job_id, stage='captions', check=False, report=False)
+        chosen = re.search(r'fontselect: \((.+?),.*?\) -> (.+?), \d+, (\S+)', proc.stderr)
+        if proc.returncode == 0 and 'failed to find any fallback' not in proc.stderr:
+            resolved = chosen.group(3) if chosen else None
+            if resolved and font.lower() not in resolved.lower() and font.lower() not in chosen.group(2).lower():
+                log_event(job_id, 'captions', 'font_fallback', requested=font, resolved=resolved)
+            log_event(job_id, 'captions', 'preflight_ok', variant=variant, font=resolved)
+            with _style_lock:
+                cache = _load_style_cache()
+                cache[style_key] = {'variant': variant, 'font': resolved, 'ts': round(time.time(), 3)}
+                _save_style_cache(cache)
+            return variant, expr
+        last_err = proc.stderr.strip()[-500:]
+        log_event(job_id, 'captions', 'preflight_failed', variant=variant, code=proc.returncode, stderr=last_err[-300:])
+    raise CaptionError(f"Caption style preflight failed (simple & fancy): {last_err}")
+
+def srt_to_vtt(srt_path, vtt_path):
+    """Convert an SRT file to WebVTT (HTML5 <track>) without touching cue timing."""
+    with open(srt_path, "r", encoding="utf-8") as f:
+        body = f.read()
+    cues = []
+    for block in body.strip().split("\n\n"):
+        lines = block.strip().splitlines()
+        if lines and lines[0].strip().isdigit():
+            lines = lines[1:]
+        if lines:
+            lines[0] = lines[0].replace(",", ".")
+            cues.append("\n".join(lines))
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n\n" + "\n\n".join(cues) + "\n")
+    return vtt_path
+
+def shift_srt(srt_path, output_path, seconds):
+    """Copy an SRT with every cue moved by seconds (e.g. body-relative cues -> a deliverable with an intro)."""
+    def shift(match):
+        return format_timestamp(max(0.0, int(match[1]) * 3600 + int(match[2]) * 60 + float(f"{match[3]}.{match[4]}") + seconds))
+    with open(srt_path, "r", encoding="utf-8") as f:
+        body = f.read()
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(re.sub(r'(\d+):(\d+):(\d+),(\d+)', shift, body))
+    return output_path
+
+def mux_soft_subtitles(video_path, srt_path, output_video, job_id: str | None = None):
+    """Add srt_path as a toggleable subtitle track with stream copy (no video re-encode)."""
+    codec = 'mov_text' if os.path.splitext(output_video)[1].lower() in ('.mp4', '.mov', '.m4v') else 'webvtt'
+    cmd = [
+        settings.get_ffmpeg(), '-y', '-i', video_path, '-i', srt_path,
+        '-map', '0:v', '-map', '0:a?', '-map', '1:0',
+        '-c', 'copy', '-c:s', codec, '-metadata:s:s:0', 'language=eng',
+        output_video
+    ]
+    log_event(job_id, 'captions', 'mux_soft', codec=codec)
+    proc = run_ffmpeg(cmd, job_id=job_id, stage='captions', check=False, report=False)
+    if proc.returncode != 0 or not os.path.exists(output_video):
+        raise CaptionError(f"Subtitle mux failed: {proc.stderr.strip()[:500]}")
+    log_event(job_id, 'captions', 'mux_done', output=output_video)
+    return output_video
+
+def transcribe_and_caption(video_path, output_path="output.srt", model_name="whisper-large-v3", offset=0.1, video_mode=False, job_id: str | None = None, render_tier: str | None = None, output_dir: str = "output", caption_mode: str | None = None):
+    """
+    Transcribe a video's audio using Groq Whisper API, build word/segment-level SRT, then deliver captions.
+    caption_mode: "burn" re-encodes with glowing captions, "soft" muxes a toggleable subtitle track
+    with stream copy, "sidecar" only writes captions.srt/.vtt. Default: burn for the final tier, soft otherwise.
+    render_tier (draft/preview/final) controls burn resolution, fps and encoder cost.
+    output_dir receives the captioned video (the job workspace's output/ when called per job).
+    Returns path to the captioned video (the SRT in sidecar mode). Raises CaptionError on any failure.
+    """
+    try:
+        tier = get_render_tier(render_tier)
+    except ValueError as e:
+        raise CaptionError(str(e))
+    mode = caption_mode or ('burn' if tier['name'] == 'final' else 'soft')
+    if mode not in CAPTION_MODES:
+        raise CaptionError(f"Unknown caption mode '{mode}'. Allowed: {', '.join(CAPTION_MODES)}")
+    # Extracted audio is an intermediate: keep it in RAM-backed scratch, not next to the video
+    scratch = ScratchSpace(job_id, 'captions')
+    audio_path = scratch.path(os.path.splitext(os.path.basename(video_path))[0] + ".wav", estimate=_audio_estimate(video_path))
+    output_video = None
+    try:
+        aligned = align_known_scripts(video_path, job_id=job_id) if settings.CAPTIONS_ALIGN else None
+        if aligned is not None:
+            # Generated voices: word timings from the known scripts, no network round-trip
+            write_srt(aligned, output_path, offset=0, job_id=job_id)  # aligned words already end at the next word
+        else:
+            # 1. Extract audio
+            extract_audio(video_path, audio_path, job_id=job_id)
+
+            # 2. Transcription + 3. Build SRT
+            caption_audio(audio_path, output_path, model_name=model_name, offset=offset, job_id=job_id, scratch=scratch)
+        os.makedirs(output_dir, exist_ok=True)
+        if mode == 'sidecar':
+            srt_out = os.path.join(output_dir, "captions.srt")
+            if os.path.abspath(output_path) != os.path.abspath(srt_out):
+                shutil.copyfile(output_path, srt_out)
+            srt_to_vtt(srt_out, os.path.join(output_dir, "captions.vtt"))
+            log_event(job_id, 'captions', 'sidecar_done', output=srt_out)
+            return srt_out
+        if mode == 'soft':
+            return mux_soft_subtitles(video_path, output_path, os.path.join(output_dir, "output_with_soft_captions.mp4"), job_id=job_id)
+
+        # 4. Probe video for dimensions
+        info = probe(video_path, job_id=job_id)
+        if not (info.get('width') and info.get('height')):
+            raise CaptionError(f"No video stream found in {video_path}")
+        width, height = int(info['width']), int(info['height'])
         log_event(job_id, 'captions', 'probe_done', width=width, height=height)
+        # Lower tiers burn at reduced size/fps; never upscale an already-small input
+        target_w, target_h = scaled_size(1920, 1080, tier) if video_mode else scaled_size(1080, 1920, tier)
+        pre_filter = ''
+        if tier['name'] != 'final':
+            if target_h < height:
+                pre_filter = f"scale={target_w}:{target_h},"
+                width, height = target_w, target_h
+            pre_filter += f"fps={tier['fps']},"
 
         # 5. Prepare burn parameters (safe paths & simplified filter for performance)
-        output_dir = "output"
-        os.makedirs(output_dir, exist_ok=True)
-        output_video = os.path.join(output_dir, "output_with_captions.mp4")
+        output_video = tier_output_path(os.path.join(output_dir, "output_with_captions.mp4"), tier)
         # Copy/normalize SRT path to temp with safe name (avoid colon issues in subtitles filter on Windows)
         safe_srt = os.path.join(os.path.dirname(output_video), "captions.srt")
         try:
             if output_path != safe_srt:
                 # copy SRT to safe location
-                import shutil
                 shutil.copyfile(output_path, safe_srt)
         except Exception as copy_err:
             log_event(job_id, 'captions', 'srt_copy_warn', warning=str(copy_err))
             safe_srt = output_path  # fallback
-        # Use forward slashes for ffmpeg
-        srt_ff = safe_srt.replace('\\', '/').replace(':', '\\:')  # escape drive colon
-        bottom_padding = 50
-        font_size = max(14, int(height * (0.02 if video_mode else 0.013)))
-
-        # Build simple outline filter first (fast)
-        primary_style = (
-            f"FontName=Arial,FontSize={font_size},PrimaryColour=&HFFFFFF&,Outline=4,Shadow=0,"
-            f"BorderStyle=1,Alignment=2,MarginV={bottom_padding}"
-        )
-        simple_filter = f"subtitles={srt_ff}:force_style='{primary_style}'"
 
-        # Fancy (optional) second attempt style (lighter glow imitation w/ bigger outline)
-        fancy_style = primary_style.replace("Outline=4", "Outline=6")
-        fancy_filter = f"subtitles={srt_ff}:force_style='{fancy_style}'"
+        # Validate style/font/escaped path on a 1-second sample; the full-length burn then runs once
+        variant, burn_expr = preflight_subtitles(safe_srt, width, height, video_mode=video_mode, job_id=job_id)
 
         def run_burn(filter_expr: str, tag: str):
             cmd = [
                 settings.get_ffmpeg(), '-y', '-i', video_path,
                 '-vf', filter_expr,
-                '-c:v', 'libx264', '-preset', 'medium', '-crf', '23',
+                '-c:v', 'libx264', '-preset', tier['preset'], '-crf', str(tier['crf']),
                 '-c:a', 'copy',
                 output_video
             ]
-            log_event(job_id, 'captions', 'burn_try', variant=tag)
-            proc = subprocess.run(cmd, capture_output=True, text=True)
-            return proc
+            log_event(job_id, 'captions', 'burn_try', variant=tag, tier=tier['name'])
+            return run_ffmpeg(cmd, job_id=job_id, stage='captions', duration=info.get('duration'), check=False)
 
-        # Attempt simple first
-        log_event(job_id, 'captions', 'burn_start', font_size=font_size, strategy='simple')
-        proc = run_burn(simple_filter, 'simple')
+        log_event(job_id, 'captions', 'burn_start', font_size=caption_font_size(height, video_mode), strategy=variant)
+        proc = run_burn(pre_filter + burn_expr, variant)
         if proc.returncode != 0 or not os.path.exists(output_video):
-            log_event(job_id, 'captions', 'burn_variant_failed', variant='simple', code=proc.returncode, stderr=proc.stderr[:300])
-            # Attempt fancy variant
-            proc2 = run_burn(fancy_filter, 'fancy')
-            if proc2.returncode != 0 or not os.path.exists(output_video):
-                log_event(job_id, 'captions', 'burn_failed', variant='fancy', code=proc2.returncode, stderr=proc2.stderr[:300])
-                raise CaptionError(f"Caption burn failed (simple & fancy). Last error: {proc2.stderr.strip()[:500]}")
-            else:
-                log_event(job_id, 'captions', 'burn_done', variant='fancy', output=output_video)
-                return output_video
-        else:
-            log_event(job_id, 'captions', 'burn_done', variant='simple', output=output_video)
-            return output_video
+            log_event(job_id, 'captions', 'burn_failed', variant=variant, code=proc.returncode, stderr=proc.stderr[:300])
+            raise CaptionError(f"Caption burn failed ({variant}). Last error: {proc.stderr.strip()[:500]}")
+        log_event(job_id, 'captions', 'burn_done', variant=variant, output=output_video)
+        return output_video
     except CaptionError:
         raise
     except Exception as e:
         log_event(job_id, 'captions', 'error', error=str(e))
         raise CaptionError(str(e))
     finally:
-        if os.path.exists(audio_path):
-            try:
-                os.remove(audio_path)
-            except OSError:
-                pass
+        scratch.cleanup()
 
     
 # video_file = r"D:\AI_AGENT_FOR_YOUTUBE\YoutubeVideoGen\output\youtube_shorts_with_music.mp4"
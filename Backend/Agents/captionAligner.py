@@ -0,0 +1,166 @@
+"""Local caption alignment for generated voices.
+
+Generated narration has known text (the voice scripts) and known placement (each
+voice clip's start in the edited timeline), so word timings can be estimated
+locally instead of transcribing the finished video: the clip's PCM is reduced to
+a 10 ms RMS energy envelope with NumPy, leading/trailing silence is trimmed,
+words get time proportional to their length, and each word boundary is snapped
+to the nearest low-energy dip (a pause between words) when one is close enough.
+
+Inputs are two small JSON files written by earlier stages:
+    <voices>/scripts.json          {voice filename: sentence}   (voice stage)
+    <output>/voice_timeline.json   {video, duration, clips: [{voice, start, duration}]}   (edit)
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pydub import AudioSegment
+
+from utils.logging_utils import log_event
+
+SCRIPTS_FILE = 'scripts.json'
+TIMELINE_FILE = 'voice_timeline.json'
+
+SAMPLE_RATE = 16000
+HOP_SEC = 0.01
+SILENCE_DB = -35.0      # relative to the clip's loudest frame
+MIN_PAUSE_SEC = 0.04    # dips shorter than this are not treated as word gaps
+SNAP_WINDOW_SEC = 0.15  # max distance a proportional boundary moves to reach a dip
+
+
+def save_voice_scripts(voice_files: List[str], sentences: List[str]) -> Optional[str]:
+    """Record the sentence spoken in each voice file (voices/scripts.json); merged with existing entries."""
+    if not voice_files or len(voice_files) != len(sentences):
+        return None
+    voice_dir = os.path.dirname(os.path.abspath(voice_files[0]))
+    path = os.path.join(voice_dir, SCRIPTS_FILE)
+    scripts = _read_json(path) or {}
+    scripts.update({os.path.basename(f): s for f, s in zip(voice_files, sentences)})
+    _write_json(path, scripts)
+    return path
+
+
+def write_voice_timeline(output_dir: str, video_path: str, clips: List[Dict[str, Any]], duration: float) -> str:
+    """Record where each voice clip starts in the edited video (output/voice_timeline.json)."""
+    path = os.path.join(output_dir, TIMELINE_FILE)
+    _write_json(path, {
+        'video': os.path.basename(video_path),
+        'duration': round(duration, 4),
+        'clips': [{'voice': os.path.abspath(c['voice']), 'start': round(c['start'], 4), 'duration': round(c['duration'], 4)} for c in clips],
+    })
+    return path
+
+
+def load_voice_timeline(output_dir: str, video_duration: Optional[float] = None, tolerance: float = 0.5) -> Optional[Dict[str, Any]]:
+    """Timeline of the last edit in output_dir, or None if missing or not matching video_duration."""
+    timeline = _read_json(os.path.join(output_dir, TIMELINE_FILE))
+    if not timeline or not timeline.get('clips'):
+        return None
+    if video_duration and abs(float(timeline.get('duration') or 0) - video_duration) > tolerance:
+        return None
+    return timeline
+
+
+def energy_envelope(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, hop_sec: float = HOP_SEC) -> np.ndarray:
+    """Per-hop RMS energy in dB relative to the loudest hop (0 dB = peak)."""
+    hop = max(1, int(sample_rate * hop_sec))
+    n = len(samples) // hop
+    if n == 0:
+        return np.zeros(0)
+    frames = samples[:n * hop].astype(np.float64).reshape(n, hop)
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) + 1e-9
+    return 20.0 * np.log10(rms / rms.max())
+
+
+def pause_centers(env_db: np.ndarray, hop_sec: float = HOP_SEC) -> np.ndarray:
+    """Centers (seconds) of low-energy runs long enough to be gaps between words."""
+    quiet = env_db < SILENCE_DB
+    if not quiet.any():
+        return np.zeros(0)
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long_enough = (ends - starts) * hop_sec >= MIN_PAUSE_SEC
+    return (starts[long_enough] + ends[long_enough]) * hop_sec / 2.0
+
+
+def align_words(words: List[str], samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> List[Dict[str, Any]]:
+    """Estimate [{'word', 'start', 'end'}] (clip-relative seconds) for words spoken in samples."""
+    if not words:
+        return []
+    total = len(samples) / float(sample_rate)
+    env = energy_envelope(samples, sample_rate)
+    voiced = np.flatnonzero(env >= SILENCE_DB)
+    if voiced.size:
+        speech_start, speech_end = voiced[0] * HOP_SEC, min(total, (voiced[-1] + 1) * HOP_SEC)
+    else:
+        speech_start, speech_end = 0.0, total
+    # Longer words (and ones followed by punctuation) take proportionally more time
+    weights = np.array([len(re.sub(r'\W', '', w)) + 1 + (2 if re.search(r'[,.;:!?]$', w) else 0) for w in words], dtype=np.float64)
+    bounds = speech_start + np.concatenate(([0.0], np.cumsum(weights) / weights.sum())) * (speech_end - speech_start)
+    pauses = pause_centers(env)
+    pauses = pauses[(pauses > speech_start) & (pauses < speech_end)]
+    for i in range(1, len(bounds) - 1):
+        if pauses.size:
+            nearest = pauses[np.argmin(np.abs(pauses - bounds[i]))]
+            if abs(nearest - bounds[i]) <= SNAP_WINDOW_SEC and bounds[i - 1] < nearest < bounds[i + 1]:
+                bounds[i] = nearest
+    return [{'word': w, 'start': float(bounds[i]), 'end': float(bounds[i + 1])} for i, w in enumerate(words)]
+
+
+def load_pcm(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Mono PCM samples of an audio file at sample_rate (pydub decode)."""
+    audio = AudioSegment.from_file(path).set_channels(1).set_frame_rate(sample_rate)
+    return np.array(audio.get_array_of_samples(), dtype=np.float64)
+
+
+def align_timeline(clips: List[Dict[str, Any]], job_id: Optional[str] = None) -> Optional[SimpleNamespace]:
+    """Word-level transcription-like object for a voice timeline; None if any clip has no known script.
+
+    The result has the same shape as a Whisper verbose_json response (segments with words),
+    so captionAgent.write_srt can consume it directly.
+    """
+    segments = []
+    scripts_by_dir: Dict[str, Dict[str, str]] = {}
+    for clip in clips:
+        voice = clip['voice']
+        voice_dir = os.path.dirname(voice)
+        if voice_dir not in scripts_by_dir:
+            scripts_by_dir[voice_dir] = _read_json(os.path.join(voice_dir, SCRIPTS_FILE)) or {}
+        text = scripts_by_dir[voice_dir].get(os.path.basename(voice))
+        if text is None or not os.path.exists(voice):
+            log_event(job_id, 'captions', 'align_unavailable', voice=os.path.basename(voice))
+            return None
+        samples = load_pcm(voice)
+        # The edit pads/trims each voice to its block; never place words past the block
+        samples = samples[:int(clip['duration'] * SAMPLE_RATE)]
+        words = align_words(text.split(), samples)
+        start = float(clip['start'])
+        segments.append({
+            'start': start,
+            'end': start + float(clip['duration']),
+            'text': text,
+            'words': [{'word': w['word'], 'start': start + w['start'], 'end': start + w['end']} for w in words],
+        })
+    log_event(job_id, 'captions', 'align_done', clips=len(segments), words=sum(len(s['words']) for s in segments))
+    return SimpleNamespace(segments=segments)
+
+
+def _read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: Any) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
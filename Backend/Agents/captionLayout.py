@@ -0,0 +1,130 @@
+"""Caption layout: group word cues into short karaoke phrases for the burn.
+
+A per-word SRT flashes one word at a time (~150 events for a 60 s short). Here
+consecutive words are packed into phrases bounded by characters per line, lines
+per phrase, phrase duration and pauses/sentence ends. Each phrase is written as a
+single ASS Dialogue event whose words carry inline `\\k` karaoke timing, so the
+viewer reads the phrase while the spoken word is highlighted.
+
+This is for readability, not burn speed: the subtitles filter's cost follows the
+text area blended per frame, so a phrase burns slower than one word per cue
+(CAPTION_LAYOUT therefore defaults to "words").
+
+The script keeps ffmpeg's SRT conversion defaults (PlayRes 384x288) so a style
+renders at exactly the size the same force_style gives a plain SRT.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List
+
+PLAY_RES_X = 384
+PLAY_RES_Y = 288
+MAX_GAP_SEC = 0.6  # a longer pause between words always starts a new phrase
+
+_SENTENCE_END = re.compile(r'[.!?]["\')\]]*$')
+
+
+def _srt_seconds(stamp: str) -> float:
+    h, m, rest = stamp.strip().split(':')
+    return int(h) * 3600 + int(m) * 60 + float(rest.replace(',', '.'))
+
+
+def read_srt_words(srt_path: str) -> List[Dict[str, Any]]:
+    """[{'word', 'start', 'end'}] for every cue of an SRT (one word per cue for word-level SRTs)."""
+    with open(srt_path, 'r', encoding='utf-8') as f:
+        body = f.read()
+    words = []
+    for block in re.split(r'\n\s*\n', body.strip()):
+        lines = [line for line in block.strip().splitlines() if line.strip()]
+        for i, line in enumerate(lines):
+            if '-->' in line:
+                start, end = line.split('-->')
+                text = ' '.join(lines[i + 1:]).strip()
+                if text:
+                    words.append({'word': text, 'start': _srt_seconds(start), 'end': _srt_seconds(end)})
+                break
+    return words
+
+
+def layout_phrases(words: List[Dict[str, Any]], max_chars: int = 32, max_lines: int = 2, max_duration: float = 3.0) -> List[Dict[str, Any]]:
+    """Pack words into phrases: [{'start', 'end', 'lines': [[word, ...], ...]}] in time order."""
+    phrases: List[Dict[str, Any]] = []
+    current = None
+    for w in words:
+        text = w['word']
+        if current is not None:
+            prev = current['lines'][-1][-1]
+            line_len = sum(len(x['word']) + 1 for x in current['lines'][-1]) - 1
+            fits_line = line_len + 1 + len(text) <= max_chars
+            if (w['start'] - prev['end'] > MAX_GAP_SEC
+                    or _SENTENCE_END.search(prev['word'])
+                    or w['end'] - current['start'] > max_duration
+                    or (not fits_line and len(current['lines']) >= max_lines)):
+                current = None
+            elif fits_line:
+                current['lines'][-1].append(w)
+            else:
+                current['lines'].append([w])
+        if current is None:
+            current = {'start': w['start'], 'lines': [[w]]}
+            phrases.append(current)
+        current['end'] = max(current.get('end', w['end']), w['end'])
+    # Never let a phrase linger over the next one
+    for a, b in zip(phrases, phrases[1:]):
+        a['end'] = min(a['end'], b['start'])
+    return phrases
+
+
+def ass_timestamp(seconds: float) -> str:
+    cs = max(0, int(round(seconds * 100)))
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+
+def _ass_text(text: str) -> str:
+    return text.replace('\\', '/').replace('{', '(').replace('}', ')').replace('\n', ' ')
+
+
+def karaoke_text(phrase: Dict[str, Any]) -> str:
+    """Dialogue text with one {\\kN} per word; N (centiseconds) runs until the next word starts."""
+    words = [w for line in phrase['lines'] for w in line]
+    starts = [w['start'] for w in words[1:]] + [phrase['end']]
+    parts, elapsed = [], 0
+    first_of_line = {id(line[0]) for line in phrase['lines'][1:]}
+    for w, next_start in zip(words, starts):
+        # Cumulative rounding keeps the highlight from drifting across long phrases
+        until = max(elapsed, int(round((next_start - phrase['start']) * 100)))
+        sep = '\\N' if id(w) in first_of_line else (' ' if parts else '')
+        parts.append(f"{sep}{{\\k{until - elapsed}}}{_ass_text(w['word'])}")
+        elapsed = until
+    return ''.join(parts)
+
+
+def write_ass(phrases: List[Dict[str, Any]], ass_path: str, font_size: int, outline: int = 4, margin_v: int = 50) -> int:
+    """Write phrases as an ASS script (one Dialogue per phrase); returns the event count.
+
+    Sung words use PrimaryColour (white); upcoming words SecondaryColour (translucent white).
+    """
+    header = (
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        f"PlayResX: {PLAY_RES_X}\n"
+        f"PlayResY: {PLAY_RES_Y}\n"
+        "ScaledBorderAndShadow: yes\n"
+        "WrapStyle: 2\n"
+        "\n"
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding\n"
+        f"Style: Default,Arial,{font_size},&H00FFFFFF,&H99FFFFFF,&H00000000,&H00000000,0,0,0,0,100,100,0,0,1,"
+        f"{outline},0,2,10,10,{margin_v},1\n"
+        "\n"
+        "[Events]\n"
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+    with open(ass_path, 'w', encoding='utf-8') as f:
+        f.write(header)
+        for p in phrases:
+            f.write(f"Dialogue: 0,{ass_timestamp(p['start'])},{ass_timestamp(p['end'])},Default,,0,0,0,,{karaoke_text(p)}\n")
+    return len(phrases)
@@ -0,0 +1,196 @@
+"""Pre-encoded template clips (gaps, branded intros/outros, title cards).
+
+Clips are encoded once per render profile (resolution, fps, codec settings,
+audio format) under CACHE_DIR/clips/<profile>/ and then spliced into renders
+with `-c copy`. Every clip carries the same stream layout as the voice blocks
+produced by VideoEditor (H.264 video + AAC 44.1 kHz stereo), which keeps it
+concat-compatible. Shorts (1080x1920) and standard (1920x1080) renders resolve
+to different profiles, so each gets its own set.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import subprocess
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from Config.settings import settings
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.logging_utils import log_event
+from utils.media_probe import probe
+
+AUDIO_RATE = 44100
+AUDIO_CHANNELS = 2
+
+_build_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _locks_guard:
+        if path not in _build_locks:
+            _build_locks[path] = threading.Lock()
+        return _build_locks[path]
+
+
+class ClipLibrary:
+    def __init__(self, width: int, height: int, fps: int, encoder: Dict[str, str], audio_bitrate: str = '192k',
+                 ffmpeg: Optional[str] = None, job_id: Optional[str] = None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.encoder = dict(encoder)
+        self.audio_bitrate = audio_bitrate
+        self.ffmpeg = ffmpeg or settings.get_ffmpeg()
+        self.job_id = job_id
+        self.root = os.path.join(settings.CACHE_DIR, 'clips', self.profile_key)
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def profile_key(self) -> str:
+        e = self.encoder
+        return (
+            f"{self.width}x{self.height}_{self.fps}fps_{e.get('codec')}_{e.get('preset')}"
+            f"_crf{e.get('crf', 'na')}_{e.get('pix_fmt')}_a{AUDIO_RATE}x{AUDIO_CHANNELS}_{self.audio_bitrate}"
+        )
+
+    def output_args(self) -> list[str]:
+        """Encoder arguments shared by all clips of this profile."""
+        e = self.encoder
+        args = ['-c:v', e['codec'], '-pix_fmt', e['pix_fmt'], '-preset', e['preset']]
+        if e.get('crf'):
+            args += ['-crf', str(e['crf'])]
+        return args + [
+            '-r', str(self.fps),
+            '-c:a', 'aac', '-b:a', self.audio_bitrate, '-ar', str(AUDIO_RATE), '-ac', str(AUDIO_CHANNELS),
+            '-shortest',
+        ]
+
+    def _fit_filter(self) -> str:
+        w, h = self.width, self.height
+        return (
+            f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+            f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:color=black,setsar=1,fps={self.fps},format={self.encoder['pix_fmt']}"
+        )
+
+    def _build(self, name: str, input_args: list[str], filter_args: list[str]) -> str:
+        """Encode a clip into the library unless it already exists; returns its path."""
+        path = os.path.join(self.root, name)
+        if os.path.exists(path):
+            return path
+        with _lock_for(path):
+            if os.path.exists(path):
+                return path
+            tmp = os.path.join(self.root, f".{uuid.uuid4().hex[:8]}_{name}")
+            cmd = [self.ffmpeg, '-y', *input_args, *filter_args, *self.output_args(), tmp]
+            log_event(self.job_id, 'clips', 'build', clip=name, profile=self.profile_key)
+            try:
+                run_ffmpeg(cmd, job_id=self.job_id, stage='clips', report=False)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return path
+
+    def _silence(self) -> list[str]:
+        return ['-f', 'lavfi', '-i', f'anullsrc=r={AUDIO_RATE}:cl=stereo']
+
+    def gap(self, duration: float = 0.01) -> str:
+        """Black frame(s) with matching silent audio; at least one frame long."""
+        frames = max(1, int(round(duration * self.fps)))
+        return self._build(
+            f"gap_{frames}f.mp4",
+            ['-f', 'lavfi', '-i', f'color=c=black:s={self.width}x{self.height}:r={self.fps}', *self._silence()],
+            ['-frames:v', str(frames), '-t', f"{frames / self.fps:.6f}"],
+        )
+
+    def title_card(self, text: str, duration: float = 2.0, background=(0, 0, 0), color=(255, 255, 255)) -> str:
+        """Centered text card rendered with Pillow, encoded once per text/duration/profile."""
+        digest = hashlib.sha256(f"{text}|{duration}|{background}|{color}".encode('utf-8')).hexdigest()[:16]
+        name = f"title_{digest}.mp4"
+        path = os.path.join(self.root, name)
+        if os.path.exists(path):
+            return path
+        card = Image.new('RGB', (self.width, self.height), background)
+        draw = ImageDraw.Draw(card)
+        size = max(16, self.height // 18)
+        try:
+            font = ImageFont.truetype(settings.TITLE_CARD_FONT or 'DejaVuSans-Bold.ttf', size)
+        except Exception:
+            font = ImageFont.load_default()
+        box = draw.multiline_textbbox((0, 0), text, font=font, align='center')
+        x = (self.width - (box[2] - box[0])) // 2
+        y = (self.height - (box[3] - box[1])) // 2
+        draw.multiline_text((x, y), text, font=font, fill=color, align='center')
+        png = os.path.join(self.root, f".{uuid.uuid4().hex[:8]}_{digest}.png")
+        card.save(png, 'PNG', compress_level=1)
+        try:
+            return self._build(
+                name,
+                ['-loop', '1', '-framerate', str(self.fps), '-i', png, *self._silence()],
+                ['-vf', self._fit_filter(), '-t', f"{duration:.3f}"],
+            )
+        finally:
+            if os.path.exists(png):
+                os.remove(png)
+
+    def branded(self, source_path: Optional[str], kind: str, still_duration: float = 2.0) -> Optional[str]:
+        """Conform a configured intro/outro (video or still image) to this profile; None if unset."""
+        if not source_path or not os.path.exists(source_path):
+            return None
+        st = os.stat(source_path)
+        digest = hashlib.sha256(f"{os.path.abspath(source_path)}|{st.st_size}|{st.st_mtime_ns}".encode('utf-8')).hexdigest()[:16]
+        name = f"{kind}_{digest}.mp4"
+        if source_path.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')):
+            return self._build(
+                name,
+                ['-loop', '1', '-framerate', str(self.fps), '-i', source_path, *self._silence()],
+                ['-vf', self._fit_filter(), '-t', f"{still_duration:.3f}"],
+            )
+        info: Dict[str, Any] = probe(source_path, job_id=self.job_id)
+        if info.get('audio_codec'):
+            audio_in: list[str] = []
+            audio_map = ['-map', '0:a:0']
+        else:
+            audio_in = self._silence()
+            audio_map = ['-map', '1:a:0']
+        duration = info.get('duration') or still_duration
+        return self._build(
+            name,
+            ['-i', source_path, *audio_in],
+            ['-vf', self._fit_filter(), '-map', '0:v:0', *audio_map, '-t', f"{duration:.3f}"],
+        )
+
+    def _branded_or_skip(self, source_path: Optional[str], kind: str) -> Optional[str]:
+        # A broken brand asset should not take every render down with it
+        try:
+            return self.branded(source_path, kind)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, RuntimeError) as e:
+            log_event(self.job_id, 'clips', 'brand_skipped', kind=kind, source=source_path, error=str(e)[:300])
+            return None
+
+    def intro(self) -> Optional[str]:
+        return self._branded_or_skip(settings.BRAND_INTRO_PATH, 'intro')
+
+    def outro(self) -> Optional[str]:
+        return self._branded_or_skip(settings.BRAND_OUTRO_PATH, 'outro')
+
+
+def warm_default_profiles() -> None:
+    """Pre-encode gap clips for the final shorts and standard profiles (startup hook)."""
+    from Config.render_tiers import get_render_tier, scaled_size
+    tier = get_render_tier('final')
+    encoder = {'codec': 'libx264', 'preset': tier['preset'], 'crf': str(tier['crf']), 'pix_fmt': 'yuv420p'}
+    for base in ((1080, 1920), (1920, 1080)):
+        w, h = scaled_size(*base, tier)
+        try:
+            lib = ClipLibrary(w, h, tier['fps'], encoder, audio_bitrate=tier['audio_bitrate'])
+            lib.gap()
+            lib.intro()
+            lib.outro()
+        except Exception as e:
+            log_event(None, 'clips', 'warm_failed', width=w, height=h, error=str(e))
@@ -1,17 +1,45 @@
 import os
-import subprocess
 from PIL import Image
 from pydub import AudioSegment
-import shutil
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from Config.settings import settings
+from Config.render_tiers import get_render_tier, scaled_size, tier_output_path
 from utils.logging_utils import log_event, StageTimer
+from utils.media_probe import get_duration, probe_many
+from utils.disk_cache import DiskLRUCache, cache_key, hash_file, link_or_copy
+from utils.ffmpeg_runner import StageProgress, run_ffmpeg
+from utils.scratch import ScratchSpace
+from Agents.frameSynthesizer import KenBurnsSynthesizer
+from Agents.clipLibrary import ClipLibrary
+from Agents.bgMusicAgent import music_mix_filter
+from Agents.musicLibrary import mix_params
+from Agents.captionAligner import align_timeline, write_voice_timeline
+from jobs.timeline import load_timeline
+from jobs.workspace import stage_order
 import shutil as _shutil
 
+RENDER_MODES = ('segments', 'parallel', 'graph', 'frames')
+
 class VideoEditor:
-    def __init__(self,video_mode: bool = False, job_id: str | None = None):
-        self.temp_dir = tempfile.mkdtemp()
+    def __init__(self,video_mode: bool = False, job_id: str | None = None, render_mode: str | None = None, render_tier: str | None = None):
         self.job_id = job_id
+        # Intermediates (lists, per-block clips, uncached segments) live in RAM-backed scratch
+        self.scratch = ScratchSpace(job_id, 'edit')
+        self.tier = get_render_tier(render_tier)
+        self.fps = self.tier['fps']
+        self.gap_duration = 0.01
+        self.render_mode = (render_mode or settings.EDIT_RENDER_MODE or 'segments').strip().lower()
+        if self.render_mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode '{self.render_mode}'. Allowed: {', '.join(RENDER_MODES)}")
+        # Encoder settings shared by every render path (also part of the segment cache key)
+        self.encoder = {'codec': 'libx264', 'preset': self.tier['preset'], 'crf': str(self.tier['crf']), 'pix_fmt': 'yuv420p'}
+        self.segment_cache = None
+        if settings.SEGMENT_CACHE_ENABLED:
+            self.segment_cache = DiskLRUCache(
+                os.path.join(settings.CACHE_DIR, 'segments'),
+                settings.SEGMENT_CACHE_MAX_MB * 1024 * 1024,
+                name='segments',
+            )
         # Ensure pydub can locate ffmpeg/ffprobe even if not on PATH (Windows-friendly)
         try:
             ffmpeg_bin = settings.get_ffmpeg()
@@ -137,13 +165,15 @@ class VideoEditor:
         except Exception:
             pass
         if video_mode:
-            self.width = 1920
-            self.height = 1080
-            log_event(job_id, 'edit', 'init', mode='long', width=self.width, height=self.height)
+            self.width, self.height = scaled_size(1920, 1080, self.tier)
+            log_event(job_id, 'edit', 'init', mode='long', width=self.width, height=self.height, render_mode=self.render_mode, tier=self.tier['name'])
         else:
-            self.width = 1080
-            self.height = 1920
-            log_event(job_id, 'edit', 'init', mode='shorts', width=self.width, height=self.height)
+            self.width, self.height = scaled_size(1080, 1920, self.tier)
+            log_event(job_id, 'edit', 'init', mode='shorts', width=self.width, height=self.height, render_mode=self.render_mode, tier=self.tier['name'])
+        # Stage-level progress shared by every ffmpeg call of one create_final_video run
+        self.progress: StageProgress | None = None
+        # Gaps / intros / outros pre-encoded once per (resolution, fps, encoder) profile
+        self.clips = ClipLibrary(self.width, self.height, self.fps, self.encoder, audio_bitrate=self.tier['audio_bitrate'], ffmpeg=self.ffmpeg, job_id=job_id)
         
     def validate_files(self, image_dir, voice_dir, video_mode: bool = False):
         """Validate images & voices; allow any multiple instead of fixed 5/3.
@@ -153,8 +183,8 @@ class VideoEditor:
         image_files = [f for f in os.listdir(image_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
         voice_files = [f for f in os.listdir(voice_dir) if f.lower().endswith(('.mp3', '.wav'))]
 
-        image_files.sort(key=lambda f: os.path.getctime(os.path.join(image_dir, f)))
-        voice_files.sort(key=lambda f: os.path.getctime(os.path.join(voice_dir, f)))
+        image_files.sort(key=stage_order(image_dir))
+        voice_files.sort(key=stage_order(voice_dir))
 
         if not voice_files:
             raise ValueError("No voice files found")
@@ -172,73 +202,100 @@ class VideoEditor:
         return image_files, voice_files, images_per_voice
 
     def get_audio_duration(self, audio_path):
-        """Get duration of audio file in seconds"""
-        audio = AudioSegment.from_file(audio_path)
-        return len(audio) / 1000.0
+        """Get duration of audio file in seconds (header/ffprobe via the shared probe cache)"""
+        try:
+            return get_duration(audio_path, job_id=self.job_id)
+        except Exception as e:
+            log_event(self.job_id, 'edit', 'probe_fallback', file=os.path.basename(audio_path), error=str(e))
+            audio = AudioSegment.from_file(audio_path)
+            return len(audio) / 1000.0
 
-    def resize_image(self, image_path, output_path):
-        """Resize image to fit YouTube Shorts dimensions"""
+    def letterbox(self, image_path) -> Image.Image:
+        """Load an image and fit it (centered, black bars) into the output frame."""
         with Image.open(image_path) as img:
             # Calculate new dimensions maintaining aspect ratio
             ratio = min(self.width / img.width, self.height / img.height)
-            new_size = (int(img.width * ratio), int(img.height * ratio))
-            
+            new_size = (max(1, int(img.width * ratio)), max(1, int(img.height * ratio)))
+
+            # JPEG: let the decoder downscale by 1/2..1/8 during DCT instead of decoding full size
+            img.draft('RGB', new_size)
+            img = img.convert('RGB')
+            # Cheap box pre-reduction so LANCZOS only ever works on <= 2x the target size
+            factor = min(img.width // new_size[0], img.height // new_size[1]) // 2
+            if factor >= 2:
+                img = img.reduce(factor)
+
             # Resize image
-            resized = img.resize(new_size, Image.Resampling.LANCZOS)
-            
+            resized = img if img.size == new_size else img.resize(new_size, Image.Resampling.LANCZOS)
+            if new_size == (self.width, self.height):
+                return resized
+
             # Create new image with black background
             new_img = Image.new('RGB', (self.width, self.height), (0, 0, 0))
-            
+
             # Paste resized image in center
             x = (self.width - new_size[0]) // 2
             y = (self.height - new_size[1]) // 2
             new_img.paste(resized, (x, y))
-            
-            new_img.save(output_path, 'PNG')
-
-    def create_video_segment(self, image_path, duration, output_path, effect_type="zoom"):
-        """Create video segment with zoom/pan effect"""
-        # Resize image first
-        temp_img_path = os.path.join(self.temp_dir, 'temp_resized.png')
-        self.resize_image(image_path, temp_img_path)
-        
-        # Define filter based on effect type
+            return new_img
+
+    def resize_image(self, image_path, output_path):
+        """Resize image to fit YouTube Shorts dimensions"""
+        self.letterbox(image_path).save(output_path, 'PNG', compress_level=1)
+
+    @staticmethod
+    def effect_for_index(j: int) -> str:
+        """Effect rotation used for the j-th image inside a voice block."""
+        return ("fade", "zoom", "pan", "slide", "zoom")[j % 5]
+
+    def effect_chain(self, effect_type, duration):
+        """Filter chain (no pad labels) applying the zoom/pan/slide/fade effect to a WxH frame."""
         if effect_type == "zoom":
-            filter_complex = (
-                f"[0:v]scale={self.width}:{self.height},"
+            return (
+                f"scale={self.width}:{self.height},"
                 f"zoompan=z='if(lte(zoom,1.0),1.1,max(1.001,zoom-0.0015))':"
-                f"d={int(duration*30)}:s={self.width}x{self.height}[v]"
+                f"d={self._frames(duration)}:s={self.width}x{self.height}:fps={self.fps}"
             )
-        elif effect_type == "slide":
-            filter_complex = (
-                f"[0:v]scale={self.width}:{self.height},"
+        if effect_type == "slide":
+            return (
+                f"scale={self.width}:{self.height},"
                 f"crop={self.width}:{self.height}:x='(iw-{self.width})*t/{duration}':y=0,"
-                f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2[v]"
+                f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2"
             )
-        elif effect_type == "fade":
+        if effect_type == "fade":
             # This example creates a fade-in effect over the first 1 second.
-            filter_complex = (
-                f"[0:v]scale={self.width}:{self.height},fade=t=in:st=0:d=1[v]"
-            )
+            return f"scale={self.width}:{self.height},fade=t=in:st=0:d=1"
+        # pan effect
+        return (
+            f"scale={self.width}:{self.height},"
+            f"crop={self.width}:{self.height}:"
+            f"iw/2-(iw/2)*sin(t/5):"
+            f"ih/2-(ih/2)*sin(t/7)"
+        )
 
-        else:  # pan effect
-            filter_complex = (
-                f"[0:v]scale={self.width}:{self.height},"
-                f"crop={self.width}:{self.height}:"
-                f"iw/2-(iw/2)*sin(t/5):"
-                f"ih/2-(ih/2)*sin(t/7)[v]"
-            )
+    def create_video_segment(self, image_path, duration, output_path, effect_type="zoom", threads: int | None = None):
+        """Create video segment with zoom/pan effect.
+
+        The letterboxed frame never touches disk: it is piped to ffmpeg as a
+        single raw RGB frame and repeated with the `loop` filter.
+        """
+        frame = self.letterbox(image_path)
+
+        # Define filter based on effect type
+        filter_complex = f"[0:v]loop=loop=-1:size=1:start=0,{self.effect_chain(effect_type, duration)}[v]"
 
         zoom_cmd = [
             self.ffmpeg, '-y',
-            '-loop', '1',
-            '-i', temp_img_path,
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', f'{self.width}x{self.height}',
+            '-framerate', str(self.fps),
+            '-i', 'pipe:0',
             '-t', str(duration),
             '-filter_complex', filter_complex,
             '-map', '[v]',
-            '-c:v', 'libx264',
-            '-pix_fmt', 'yuv420p',
-            '-preset', 'medium',
+            *self.video_codec_args(),
+            *(['-threads', str(threads)] if threads else []),
             output_path
         ]
         
@@ -246,72 +303,506 @@ class VideoEditor:
             log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=zoom_cmd[:8])
         except Exception:
             pass
-        subprocess.run(zoom_cmd, check=True)
+        self.run(zoom_cmd, input=frame.tobytes(), duration=duration)
+
+    def video_codec_args(self) -> list[str]:
+        return [
+            '-c:v', self.encoder['codec'], '-pix_fmt', self.encoder['pix_fmt'],
+            '-preset', self.encoder['preset'], '-crf', self.encoder['crf'],
+        ]
+
+    def segment_key(self, image_path, duration, effect_type, image_hash: str | None = None) -> str:
+        """Cache key: image bytes + frame-rounded duration + effect + geometry + encoder settings."""
+        return cache_key(
+            'segment/v2',
+            image_hash or hash_file(image_path),
+            self._frames(duration),
+            self.fps,
+            effect_type,
+            self.width,
+            self.height,
+            sorted(self.encoder.items()),
+        )
 
-    def create_final_video(self, image_dir, voice_dir, video_mode = False):
-        # Determine output filename based on mode
-        output_path = 'output/standard_video.mp4' if video_mode else 'output/youtube_shorts.mp4'
-        log_event(self.job_id, 'edit', 'start_assembly', output=output_path)
+    def render_segment_cached(self, image_path, duration, output_path, effect_type="zoom", threads: int | None = None, key: str | None = None):
+        """create_video_segment backed by the persistent segment cache."""
+        if self.segment_cache is None:
+            return self.create_video_segment(image_path, duration, output_path, effect_type, threads)
+        key = key or self.segment_key(image_path, duration, effect_type)
+        cached = self.segment_cache.get(key, '.mp4')
+        if cached:
+            link_or_copy(cached, output_path)
+            if self.progress:
+                self.progress.credit(duration)
+            log_event(self.job_id, 'edit', 'segment_cache_hit', image=os.path.basename(image_path), effect=effect_type)
+            return
+        self.create_video_segment(image_path, duration, output_path, effect_type, threads)
+        try:
+            self.segment_cache.put(key, output_path, '.mp4')
+        except OSError as e:
+            log_event(self.job_id, 'edit', 'segment_cache_store_failed', error=str(e))
+
+    def _pool_size(self, n_jobs: int) -> tuple[int, int]:
+        """Return (workers, ffmpeg threads per worker) sized from the usable cores."""
+        try:
+            cores = len(os.sched_getaffinity(0))  # type: ignore[attr-defined]
+        except Exception:
+            cores = os.cpu_count() or 1
+        threads = max(1, settings.EDIT_THREADS_PER_WORKER)
+        workers = settings.EDIT_MAX_WORKERS or max(1, cores // threads)
+        return max(1, min(workers, n_jobs)), threads
+
+    def render_segments(self, jobs):
+        """Render image segments; jobs are (image_path, duration, output_path, effect, cache_key).
+
+        In "parallel" mode segments fan out over a bounded thread pool (each worker
+        blocks on its own ffmpeg process) and results are returned in input order.
+        """
+        if self.render_mode != 'parallel' or len(jobs) <= 1:
+            for image_path, duration, output_path, effect, key in jobs:
+                self.render_segment_cached(image_path, duration, output_path, effect, key=key)
+            self._log_cache_stats()
+            return [job[2] for job in jobs]
+        workers, threads = self._pool_size(len(jobs))
+        log_event(self.job_id, 'edit', 'parallel_render', segments=len(jobs), workers=workers, threads_per_worker=threads)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='segment') as pool:
+            futures = [
+                pool.submit(self.render_segment_cached, image_path, duration, output_path, effect, threads, key)
+                for image_path, duration, output_path, effect, key in jobs
+            ]
+            # .result() re-raises the first ffmpeg failure in timeline order
+            for fut in futures:
+                fut.result()
+        self._log_cache_stats()
+        return [job[2] for job in jobs]
+
+    def _log_cache_stats(self):
+        if self.segment_cache is not None:
+            self.segment_cache.log_stats(self.job_id, 'edit')
+
+    def plan_timeline(self, image_dir, voice_dir, video_mode = False):
+        """Resolve inputs into voice blocks.
+
+        Returns a list of blocks: {voice_path, duration, images: [{path, index, duration, effect}]}
+        """
         image_files, voice_files, images_per_voice = self.validate_files(image_dir, voice_dir, video_mode=video_mode)
         log_event(self.job_id, 'edit', 'validated', images=len(image_files), voices=len(voice_files), images_per_voice=images_per_voice)
-        segments = []
-
+        try:
+            # Warm the probe cache for all voices at once (non-WAV files probed concurrently)
+            probe_many([os.path.join(voice_dir, v) for v in voice_files], job_id=self.job_id)
+        except Exception:
+            pass
+        blocks = []
         for voice_idx, voice_file in enumerate(voice_files):
-            log_event(self.job_id, 'edit', 'process_voice', index=voice_idx+1, total=len(voice_files))
             voice_path = os.path.join(voice_dir, voice_file)
             voice_duration = self.get_audio_duration(voice_path)
             image_duration = voice_duration / images_per_voice if images_per_voice else voice_duration
-            image_segments = []
+            images = []
             for j in range(images_per_voice):
                 img_idx = voice_idx * images_per_voice + j
-                image_path = os.path.join(image_dir, image_files[img_idx])
-                temp_segment = os.path.join(self.temp_dir, f'temp_segment_{img_idx}.mp4')
-                if j % 5 == 0:
-                    effect_type = "fade"
-                elif j % 5 == 1:
-                    effect_type = "zoom"
-                elif j % 5 == 2:
-                    effect_type = "pan"
-                elif j % 5 == 3:
-                    effect_type = "slide"
+                images.append({
+                    'path': os.path.join(image_dir, image_files[img_idx]),
+                    'index': img_idx,
+                    'duration': image_duration,
+                    'effect': self.effect_for_index(j),
+                })
+            blocks.append({'voice_path': voice_path, 'duration': voice_duration, 'images': images})
+        return blocks
+
+    def _frames(self, seconds) -> int:
+        return max(1, int(round(seconds * self.fps)))
+
+    def build_audio_graph(self, blocks, first_input: int):
+        """Audio half of the timeline: voices padded/trimmed to their block's frame count plus gap silence.
+
+        Returns (input_args, chains, audio_label). Voice inputs are numbered from first_input.
+        """
+        fps = self.fps
+        inputs: list[str] = []
+        chains: list[str] = []
+        labels: list[str] = []
+        gap_frames = self._frames(self.gap_duration)
+        for b_idx, block in enumerate(blocks):
+            block_frames = sum(self._frames(img['duration']) for img in block['images'])
+            inputs += ['-i', block['voice_path']]
+            chains.append(
+                f"[{first_input + b_idx}:a]aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo,"
+                f"apad,atrim=duration={block_frames / fps:.6f},asetpts=PTS-STARTPTS[ba{b_idx}]"
+            )
+            labels.append(f"[ba{b_idx}]")
+            if b_idx < len(blocks) - 1:
+                chains.append(
+                    f"anullsrc=r=44100:cl=stereo,atrim=duration={gap_frames / fps:.6f},"
+                    f"aformat=sample_fmts=fltp[ga{b_idx}]"
+                )
+                labels.append(f"[ga{b_idx}]")
+        chains.append(f"{''.join(labels)}concat=n={len(labels)}:v=0:a=1[aout]")
+        return inputs, chains, '[aout]'
+
+    def build_timeline_graph(self, blocks):
+        """Compile the whole timeline into one filter_complex.
+
+        Returns (input_args, filter_complex, video_label, audio_label). Every
+        image/voice/gap is cut to a whole number of frames so audio and video
+        stay aligned across the final concat.
+        """
+        w, h, fps = self.width, self.height, self.fps
+        inputs: list[str] = []
+        chains: list[str] = []
+        parts: list[str] = []
+        n_inputs = 0
+        gap_frames = self._frames(self.gap_duration)
+        for b_idx, block in enumerate(blocks):
+            image_labels = []
+            for img in block['images']:
+                frames = self._frames(img['duration'])
+                # Looped for exactly the image's frames; zoompan's `d` covers the same span, trim cuts the rest
+                inputs += ['-loop', '1', '-framerate', str(fps), '-t', f"{frames / fps:.3f}", '-i', img['path']]
+                label = f"v{img['index']}"
+                chains.append(
+                    f"[{n_inputs}:v]scale={w}:{h}:force_original_aspect_ratio=decrease,"
+                    f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2:color=black,setsar=1,"
+                    f"{self.effect_chain(img['effect'], img['duration'])},"
+                    f"fps={fps},trim=end_frame={frames},setpts=PTS-STARTPTS,format=yuv420p[{label}]"
+                )
+                image_labels.append(f"[{label}]")
+                n_inputs += 1
+            chains.append(
+                f"{''.join(image_labels)}concat=n={len(image_labels)}:v=1:a=0[bv{b_idx}]"
+            )
+            parts.append(f"[bv{b_idx}]")
+            if b_idx < len(blocks) - 1:
+                chains.append(f"color=c=black:s={w}x{h}:r={fps},trim=end_frame={gap_frames},format=yuv420p,setsar=1[gv{b_idx}]")
+                parts.append(f"[gv{b_idx}]")
+        chains.append(f"{''.join(parts)}concat=n={len(parts)}:v=1:a=0[vout]")
+        audio_inputs, audio_chains, a_label = self.build_audio_graph(blocks, n_inputs)
+        return inputs + audio_inputs, ';'.join(chains + audio_chains), '[vout]', a_label
+
+    def build_finish_graph(self, finish, v_label, a_label, first_input: int):
+        """Finalize chains appended to a timeline graph: burned subtitles and the music mix.
+
+        finish is {'subtitles': <subtitles= filter>, 'music_path': <path>, 'music': <musicLibrary.mix_params>}
+        (any may be None; without 'music' the mix falls back to loudnorm).
+        Returns (input_args, chains, video_label, audio_label).
+        """
+        inputs: list[str] = []
+        chains: list[str] = []
+        if finish and finish.get('subtitles'):
+            chains.append(f"{v_label}{finish['subtitles']}[vfin]")
+            v_label = '[vfin]'
+        if finish and finish.get('music_path'):
+            params = finish.get('music')
+            if params and params.get('start'):
+                inputs += ['-ss', f"{params['start']:.3f}"]
+            inputs += ['-i', params['source'] if params else finish['music_path']]
+            chains.append(music_mix_filter(a_label, f"[{first_input}:a]", '[amixed]', gain_db=params['gain_db'] if params else None))
+            # loudnorm resamples internally; restore the clip library's audio layout for -c copy splicing
+            chains.append("[amixed]aresample=44100,aformat=sample_fmts=fltp:channel_layouts=stereo[afin]")
+            a_label = '[afin]'
+        return inputs, chains, v_label, a_label
+
+    def render_timeline_graph(self, blocks, output_path, finish=None):
+        """Encode the planned timeline with a single ffmpeg invocation (plus finalize chains, if any)."""
+        inputs, filter_complex, v_label, a_label = self.build_timeline_graph(blocks)
+        finish_inputs, finish_chains, v_label, a_label = self.build_finish_graph(finish, v_label, a_label, inputs.count('-i'))
+        inputs += finish_inputs
+        filter_complex = ';'.join([filter_complex, *finish_chains])
+        cmd = [
+            self.ffmpeg, '-y',
+            *inputs,
+            '-filter_complex', filter_complex,
+            '-map', v_label,
+            '-map', a_label,
+            '-r', str(self.fps),
+            *self.video_codec_args(),
+            '-c:a', 'aac', '-b:a', self.tier['audio_bitrate'],
+            '-movflags', '+faststart',
+            output_path
+        ]
+        log_event(self.job_id, 'edit', 'render_graph', inputs=inputs.count('-i'), filters=filter_complex.count(';') + 1, finalize=bool(finish_chains))
+        try:
+            log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=cmd[:8])
+        except Exception:
+            pass
+        self.run(cmd, duration=self.timeline_seconds(blocks))
+
+    def render_timeline_frames(self, blocks, output_path, finish=None):
+        """Synthesize every frame in Python (KenBurnsSynthesizer) and stream rawvideo into one encoder."""
+        synth = KenBurnsSynthesizer(self.width, self.height, self.fps)
+        audio_inputs, audio_chains, a_label = self.build_audio_graph(blocks, first_input=1)
+        finish_inputs, finish_chains, v_label, a_label = self.build_finish_graph(finish, '[0:v]', a_label, 1 + audio_inputs.count('-i'))
+        cmd = [
+            self.ffmpeg, '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', f'{self.width}x{self.height}', '-framerate', str(self.fps),
+            '-i', 'pipe:0',
+            *audio_inputs,
+            *finish_inputs,
+            '-filter_complex', ';'.join(audio_chains + finish_chains),
+            '-map', '0:v' if v_label == '[0:v]' else v_label,
+            '-map', a_label,
+            *self.video_codec_args(),
+            '-c:a', 'aac', '-b:a', self.tier['audio_bitrate'],
+            '-movflags', '+faststart',
+            output_path
+        ]
+        gap_frames = self._frames(self.gap_duration)
+        log_event(self.job_id, 'edit', 'render_frames', blocks=len(blocks), finalize=bool(finish_chains))
+        try:
+            log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=cmd[:8])
+        except Exception:
+            pass
+
+        def raw_frames():
+            for b_idx, block in enumerate(blocks):
+                for img in block['images']:
+                    # Each image is decoded and letterboxed exactly once
+                    frame_src = self.letterbox(img['path'])
+                    yield from synth.frames(frame_src, self._frames(img['duration']), img['effect'])
+                if b_idx < len(blocks) - 1:
+                    yield from synth.black(gap_frames)
+
+        self.run(cmd, input=raw_frames(), duration=self.timeline_seconds(blocks))
+
+    def timeline_seconds(self, blocks) -> float:
+        """Media length of the planned body (blocks plus inter-block gaps)."""
+        frames = sum(self._frames(img['duration']) for block in blocks for img in block['images'])
+        frames += self._frames(self.gap_duration) * max(0, len(blocks) - 1)
+        return frames / self.fps
+
+    def run(self, cmd, input=None, duration=None, report=True):
+        """Run ffmpeg with progress reported against the current stage (see utils.ffmpeg_runner)."""
+        return run_ffmpeg(
+            cmd, job_id=self.job_id, stage='edit', duration=duration,
+            progress=self.progress, input=input, report=report,
+        )
+
+    def scratch_estimate(self, seconds) -> int:
+        """Rough encoded size of `seconds` of video, used to place intermediates in RAM or on disk."""
+        return int(self.width * self.height * self.fps * max(0.0, seconds) * 0.1 / 8) + (64 << 10)
+
+    def create_final_video(self, image_dir, voice_dir, video_mode = False, output_dir = 'output'):
+        # Determine output filename based on mode (output_dir is the job workspace's output/ when there is a job)
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, 'standard_video.mp4' if video_mode else 'youtube_shorts.mp4')
+        output_path = tier_output_path(output_path, self.tier)
+        log_event(self.job_id, 'edit', 'start_assembly', output=output_path, render_mode=self.render_mode)
+        try:
+            return self._assemble(image_dir, voice_dir, video_mode, output_path)
+        finally:
+            # Runs on failure too, so aborted renders never leave segments behind
+            self.scratch.cleanup()
+
+    def voice_timeline(self, blocks, with_brand=True):
+        """Where each voice block starts in the rendered video: ([{voice, start, duration}], total seconds).
+
+        with_brand=False gives body-relative times (before the intro/outro splice).
+        """
+        intro, outro = (self.clips.intro(), self.clips.outro()) if with_brand else (None, None)
+        offset = get_duration(intro) if intro else 0.0
+        gap = self._frames(self.gap_duration) / self.fps
+        clips = []
+        for b_idx, block in enumerate(blocks):
+            length = sum(self._frames(img['duration']) for img in block['images']) / self.fps
+            clips.append({'voice': block['voice_path'], 'start': offset, 'duration': length})
+            offset += length + (gap if b_idx < len(blocks) - 1 else 0.0)
+        return clips, offset + (get_duration(outro) if outro else 0.0)
+
+    def record_voice_timeline(self, blocks, output_path):
+        """Write output/voice_timeline.json so captions can be aligned locally (Agents/captionAligner)."""
+        try:
+            clips, total = self.voice_timeline(blocks)
+            write_voice_timeline(os.path.dirname(os.path.abspath(output_path)), output_path, clips, total)
+        except Exception as e:
+            log_event(self.job_id, 'edit', 'voice_timeline_skipped', error=str(e))
+
+    def render_single_pass(self, blocks, output_path, finish=None):
+        """graph/frames render of the body in one encode, then stream-copy splice of intro/outro."""
+        brand_clips = [c for c in (self.clips.intro(), self.clips.outro()) if c]
+        body_path = self.scratch.path('body.mp4', self.scratch_estimate(self.timeline_seconds(blocks))) if brand_clips else output_path
+        if self.render_mode == 'frames':
+            self.render_timeline_frames(blocks, body_path, finish)
+        else:
+            self.render_timeline_graph(blocks, body_path, finish)
+        if brand_clips:
+            self.concat_copy([c for c in (self.clips.intro(), body_path, self.clips.outro()) if c], output_path)
+        self.record_voice_timeline(blocks, output_path)
+        self.progress.complete()
+        log_event(self.job_id, 'edit', 'completed', output=output_path)
+        return output_path
+
+    def render_narration(self, blocks, audio_path):
+        """Render only the timeline's voice track (same padding/gaps as the video) as 16 kHz mono WAV for transcription."""
+        inputs, chains, a_label = self.build_audio_graph(blocks, first_input=0)
+        cmd = [
+            self.ffmpeg, '-y', *inputs,
+            '-filter_complex', ';'.join(chains),
+            '-map', a_label, '-ac', '1', '-ar', '16000', '-c:a', 'pcm_s16le',
+            audio_path
+        ]
+        log_event(self.job_id, 'edit', 'render_narration', blocks=len(blocks))
+        self.run(cmd, report=False)
+        return audio_path
+
+    def finalize(self, image_dir, voice_dir, video_mode = False, output_dir = 'output', music_path = None, captions = True):
+        """Render the deliverable (edit + music mix + burned captions) with a single video encode.
+
+        Captions are transcribed from the narration track before the render, so the
+        subtitles filter and the music mix run inside the edit's own filter graph.
+        Segment modes have no single-pass encode and fall back to "graph".
+        Returns {'video': path, 'srt': path or None}.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        base = 'standard_video' if video_mode else 'youtube_shorts'
+        if captions:
+            name = 'output_with_captions.mp4'
+        elif music_path:
+            name = f'{base}_with_music.mp4'
+        else:
+            name = f'{base}.mp4'
+        output_path = tier_output_path(os.path.join(output_dir, name), self.tier)
+        if self.render_mode not in ('graph', 'frames'):
+            log_event(self.job_id, 'edit', 'finalize_render_mode', requested=self.render_mode, used='graph')
+            self.render_mode = 'graph'
+        log_event(self.job_id, 'edit', 'start_finalize', output=output_path, render_mode=self.render_mode, music=bool(music_path), captions=captions)
+        try:
+            blocks = self.plan_timeline(image_dir, voice_dir, video_mode=video_mode)
+            self.progress = StageProgress(self.job_id, 'edit', self.timeline_seconds(blocks))
+            finish = {'music_path': music_path, 'subtitles': None}
+            if music_path:
+                # Ingested once per track: canonical copy, static gain + start offset, no loudnorm pass over the mix
+                finish['music'] = mix_params(music_path, self.timeline_seconds(blocks), job_id=self.job_id)
+            srt_path = None
+            if captions:
+                # Lazy import: the caption agent pulls in the Groq client
+                from Agents.captionAgent import caption_audio, preflight_subtitles, shift_srt, write_srt
+                # Known scripts + clip placement -> local word alignment; Whisper on the narration otherwise.
+                # Subtitles are burned into the body only, so the burned copy stays body-relative in scratch.
+                body_srt = self.scratch.path('captions_body.srt')
+                aligned = align_timeline(self.voice_timeline(blocks, with_brand=False)[0], job_id=self.job_id) if settings.CAPTIONS_ALIGN else None
+                if aligned is not None:
+                    write_srt(aligned, body_srt, offset=0, job_id=self.job_id)
                 else:
-                    effect_type = "zoom"
-                self.create_video_segment(image_path, image_duration, temp_segment, effect_type)
-                image_segments.append(temp_segment)
-
-            segment_list = os.path.join(self.temp_dir, f'segment_list_{voice_idx}.txt')
-            with open(segment_list, 'w') as f:
-                for seg in image_segments:
-                    f.write(f"file '{seg}'\n")
-            segment_video = os.path.join(self.temp_dir, f'segment_{voice_idx}.mp4')
-            cmd1 = [
-                self.ffmpeg, '-y', '-f', 'concat', '-safe', '0', '-i', segment_list, '-c', 'copy', segment_video
-            ]
-            try:
-                log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=cmd1[:8])
-            except Exception:
-                pass
-            subprocess.run(cmd1, check=True)
-            final_segment = os.path.join(self.temp_dir, f'final_segment_{voice_idx}.mp4')
-            cmd2 = [
-                self.ffmpeg, '-y', '-i', segment_video, '-i', voice_path, '-c:v', 'copy', '-c:a', 'aac', '-shortest', final_segment
-            ]
-            try:
-                log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=cmd2[:8])
-            except Exception:
-                pass
-            subprocess.run(cmd2, check=True)
+                    narration = self.render_narration(blocks, self.scratch.path('narration.wav', int(self.timeline_seconds(blocks) * 32000) + (64 << 10)))
+                    caption_audio(narration, body_srt, job_id=self.job_id, scratch=self.scratch)
+                # The returned SRT follows the deliverable, which starts with the intro
+                intro = self.clips.intro()
+                srt_path = shift_srt(body_srt, os.path.join(output_dir, 'captions.srt'), get_duration(intro) if intro else 0.0)
+                # A broken style/font fails here in seconds instead of after the full render
+                _variant, finish['subtitles'] = preflight_subtitles(body_srt, self.width, self.height, video_mode=video_mode, job_id=self.job_id)
+            return {'video': self.render_single_pass(blocks, output_path, finish), 'srt': srt_path}
+        finally:
+            self.scratch.cleanup()
+
+    def _assemble(self, image_dir, voice_dir, video_mode, output_path):
+        blocks = self.plan_timeline(image_dir, voice_dir, video_mode=video_mode)
+        self.progress = StageProgress(self.job_id, 'edit', self.timeline_seconds(blocks))
+        if self.render_mode in ('graph', 'frames'):
+            return self.render_single_pass(blocks, output_path)
+
+        # Every node (segment, voice block, gap, final) is named by a fingerprint of its inputs.
+        # With a job timeline the nodes persist in jobs/<job_id>/segments and unchanged ones are reused.
+        timeline = load_timeline(self.job_id) if settings.EDIT_INCREMENTAL else None
+        fingerprint = timeline.fingerprint_input if timeline else hash_file
+
+        def node(kind, fp, seconds):
+            if timeline:
+                return os.path.join(timeline.render_dir, f"{kind}_{fp[:20]}.mp4")
+            return self.scratch.path(f"{kind}_{fp[:20]}.mp4", self.scratch_estimate(seconds))
+
+        def reusable(path):
+            return timeline is not None and timeline.is_fresh(path)
+
+        jobs = []
+        queued = set()
+        seg_nodes, block_nodes, block_plan = {}, {}, []
+        for block in blocks:
+            seg_paths, seg_fps = [], []
+            for img in block['images']:
+                fp = self.segment_key(img['path'], img['duration'], img['effect'], image_hash=fingerprint(img['path']))
+                path = node('segment', fp, img['duration'])
+                seg_nodes[fp] = {'image': os.path.abspath(img['path']), 'effect': img['effect'], 'frames': self._frames(img['duration'])}
+                if reusable(path):
+                    timeline.mark('segments', True)
+                    self.progress.credit(img['duration'])
+                elif path not in queued:
+                    queued.add(path)
+                    jobs.append((img['path'], img['duration'], path, img['effect'], fp))
+                    if timeline:
+                        timeline.mark('segments', False)
+                seg_paths.append(path)
+                seg_fps.append(fp)
+            block_fp = cache_key('block/v2', seg_fps, fingerprint(block['voice_path']), self.tier['audio_bitrate'])
+            block_nodes[block_fp] = {'voice': os.path.abspath(block['voice_path']), 'segments': seg_fps}
+            block_plan.append((block_fp, seg_paths, sum(img['duration'] for img in block['images'])))
+        self.render_segments(jobs)
+
+        gap_path = self.clips.gap(self.gap_duration)
+        segments = []
+        for voice_idx, (block, (block_fp, image_segments, block_seconds)) in enumerate(zip(blocks, block_plan)):
+            log_event(self.job_id, 'edit', 'process_voice', index=voice_idx+1, total=len(blocks))
+            voice_path = block['voice_path']
+            final_segment = node('block', block_fp, block_seconds)
+            if reusable(final_segment):
+                timeline.mark('blocks', True)
+            else:
+                if timeline:
+                    timeline.mark('blocks', False)
+                segment_list = self.scratch.path(f'segment_list_{voice_idx}.txt')
+                with open(segment_list, 'w') as f:
+                    for seg in image_segments:
+                        f.write(f"file '{seg}'\n")
+                segment_video = self.scratch.path(f'segment_{voice_idx}.mp4', self.scratch_estimate(block_seconds))
+                cmd1 = [
+                    self.ffmpeg, '-y', '-f', 'concat', '-safe', '0', '-i', segment_list, '-c', 'copy', segment_video
+                ]
+                try:
+                    log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=cmd1[:8])
+                except Exception:
+                    pass
+                self.run(cmd1, report=False)
+                # Audio normalized to the clip library's layout so gaps/intros splice in with -c copy.
+                # The voice is padded/cut to the frame-rounded video so blocks match the planned timeline.
+                block_frames = sum(self._frames(img['duration']) for img in block['images'])
+                cmd2 = [
+                    self.ffmpeg, '-y', '-i', segment_video, '-i', voice_path, '-c:v', 'copy', '-af', 'apad',
+                    '-c:a', 'aac', '-b:a', self.tier['audio_bitrate'], '-ar', '44100', '-ac', '2',
+                    '-t', f"{block_frames / self.fps:.6f}", final_segment
+                ]
+                try:
+                    log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=cmd2[:8])
+                except Exception:
+                    pass
+                self.run(cmd2, report=False)
             segments.append(final_segment)
-            if voice_idx < len(voice_files) - 1:
-                gap_path = os.path.join(self.temp_dir, f'gap_{voice_idx}.mp4')
-                self.create_gap(gap_path)
+            if voice_idx < len(blocks) - 1:
                 segments.append(gap_path)
             log_event(self.job_id, 'edit', 'voice_done', index=voice_idx+1)
 
-        final_concat = os.path.join(self.temp_dir, 'final_concat.txt')
+        segments = [c for c in (self.clips.intro(),) if c] + segments + [c for c in (self.clips.outro(),) if c]
+        final_fp = cache_key('final/v2', [os.path.basename(p) for p in segments])
+        if timeline and timeline.final_is_current(final_fp, output_path):
+            timeline.mark('final', True)
+            log_event(self.job_id, 'edit', 'final_unchanged', output=output_path)
+        else:
+            self.concat_copy(segments, output_path)
+            if timeline:
+                timeline.mark('final', False)
+        if timeline:
+            timeline.record(seg_nodes, block_nodes, final_fp, output_path)
+            timeline.prune(set(segments) | {job[2] for job in jobs} | {p for _fp, paths, _secs in block_plan for p in paths})
+            timeline.save()
+        self.record_voice_timeline(blocks, output_path)
+        self.progress.complete()
+        log_event(self.job_id, 'edit', 'completed', output=output_path)
+        return output_path
+
+    def concat_copy(self, segments, output_path):
+        """Stream-copy concat of concat-compatible clips."""
+        final_concat = self.scratch.path('final_concat.txt')
         with open(final_concat, 'w') as f:
             for segment in segments:
-                f.write(f"file '{segment}'\n")
+                f.write(f"file '{os.path.abspath(segment)}'\n")
         log_event(self.job_id, 'edit', 'concat_segments', count=len(segments))
         cmd3 = [
             self.ffmpeg, '-y', '-f', 'concat', '-safe', '0', '-i', final_concat, '-c', 'copy', output_path
@@ -320,27 +811,11 @@ class VideoEditor:
             log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=cmd3[:8])
         except Exception:
             pass
-        subprocess.run(cmd3, check=True)
-        shutil.rmtree(self.temp_dir)
-        log_event(self.job_id, 'edit', 'completed', output=output_path)
-        return output_path
+        self.run(cmd3, report=False)
 
     def create_gap(self, output_path):
-        """Create a short (20-millisecond) black gap"""
-        cmd = [
-            self.ffmpeg, '-y',
-            '-f', 'lavfi',
-            '-i', f'color=c=black:s={self.width}x{self.height}:d=0.01',
-            '-c:v', 'libx264',
-            '-preset', 'medium',
-            '-pix_fmt', 'yuv420p',
-            output_path
-        ]
-        try:
-            log_event(self.job_id, 'edit', 'run_ffmpeg', cmd=cmd[:8])
-        except Exception:
-            pass
-        subprocess.run(cmd, check=True)
+        """Materialize the library's pre-encoded black gap (with silent audio) at output_path"""
+        link_or_copy(self.clips.gap(self.gap_duration), output_path)
 
 """Video editing utilities for assembling image + voice segments.
 
@@ -0,0 +1,255 @@
+"""Music library index: ingest each background track once, mix with static parameters.
+
+Every uploaded track is decoded once, in the background after upload. That decode
+writes a canonical mixing copy next to the original (<name>.mix.flac, 48 kHz
+stereo, trimmed to MUSIC_MAX_SEC) and describes the track in
+CACHE_DIR/music_index.json: duration, integrated loudness and true peak (ffmpeg
+ebur128, in the same decode), a beat grid and a 0.5 s energy envelope (librosa
+when installed, NumPy otherwise). Mixing then reads the canonical copy and uses
+a precomputed static gain that brings the track to MUSIC_TARGET_LUFS (bounded by
+its peak) and a beat-aligned start offset past any quiet intro, instead of a
+loudnorm analysis of the whole mix on every render.
+
+Entries are keyed by absolute path and revalidated by size + mtime; the file's
+sha256 is stored so a re-uploaded copy of a known track reuses its analysis.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+import wave
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from Agents.captionAligner import energy_envelope
+from Config.settings import settings
+from utils.disk_cache import hash_file
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.logging_utils import log_event
+from utils.scratch import ScratchSpace
+
+try:  # optional: better beat tracking
+    import librosa  # type: ignore
+except Exception:  # pragma: no cover - librosa is optional
+    librosa = None
+
+INDEX_FILE = 'music_index.json'
+ANALYSIS_RATE = 22050
+ENVELOPE_HOP_SEC = 0.5
+ONSET_HOP_SEC = 512 / ANALYSIS_RATE
+MIN_BPM, MAX_BPM = 60.0, 180.0
+INTRO_QUIET_DB = -12.0  # envelope level (vs the track's median) that still counts as intro
+CANONICAL_SUFFIX = '.mix.flac'
+CANONICAL_RATE = 48000
+
+_lock = threading.Lock()
+_path_locks: Dict[str, threading.Lock] = {}
+
+
+def _index_path() -> str:
+    return os.path.join(settings.CACHE_DIR, INDEX_FILE)
+
+
+def _load_index() -> Dict[str, Any]:
+    try:
+        with open(_index_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(index: Dict[str, Any]) -> None:
+    path = _index_path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp, path)
+
+
+def canonical_path(path: str) -> str:
+    """Where the mixing copy of an uploaded track is stored (next to the original)."""
+    return os.path.splitext(path)[0] + CANONICAL_SUFFIX
+
+
+def decode_and_measure(path: str, wav_path: str, canonical: Optional[str] = None, job_id: Optional[str] = None) -> Dict[str, Optional[float]]:
+    """Decode path once: mono ANALYSIS_RATE PCM to wav_path and, if given, the canonical mixing copy.
+
+    Both outputs are trimmed to MUSIC_MAX_SEC. Returns integrated loudness (LUFS) and true
+    peak (dBFS) of what was decoded, measured by ebur128 in the same pass.
+    """
+    trim = ['-t', f"{settings.MUSIC_MAX_SEC:g}"] if settings.MUSIC_MAX_SEC > 0 else []
+    cmd = [settings.get_ffmpeg(), '-hide_banner', '-nostats', '-y', *trim, '-i', path,
+           '-map', '0:a:0', '-af', 'ebur128=peak=true:framelog=verbose', '-ac', '1', '-ar', str(ANALYSIS_RATE), '-c:a', 'pcm_s16le', wav_path]
+    if canonical:
+        # 48 kHz stereo FLAC: exact seeks, cheap decode, no resampling left for the mix
+        cmd += ['-map', '0:a:0', '-ac', '2', '-ar', str(CANONICAL_RATE), '-sample_fmt', 's16', '-c:a', 'flac', canonical]
+    proc = run_ffmpeg(cmd, job_id=job_id, stage='music', check=False, report=False)
+    if proc.returncode != 0 or not os.path.exists(wav_path) or (canonical and not os.path.exists(canonical)):
+        raise RuntimeError(f"Music ingest decode failed: {proc.stderr.strip()[-300:]}")
+    summary = proc.stderr[proc.stderr.rfind('Integrated loudness'):]
+    integrated = re.search(r'I:\s+(-?[\d.]+|-inf) LUFS', summary)
+    peak = re.search(r'Peak:\s+(-?[\d.]+|-inf) dBFS', summary)
+
+    def num(m):
+        return float(m.group(1)) if m and m.group(1) != '-inf' else None
+    return {'lufs': num(integrated), 'peak_db': num(peak)}
+
+
+def beat_grid(samples: np.ndarray, sample_rate: int = ANALYSIS_RATE) -> Dict[str, Any]:
+    """{'bpm', 'beats': [seconds]} from librosa, or an onset-autocorrelation estimate in NumPy."""
+    if librosa is not None:
+        tempo, frames = librosa.beat.beat_track(y=samples.astype(np.float32) / 32768.0, sr=sample_rate)
+        beats = librosa.frames_to_time(frames, sr=sample_rate)
+        return {'bpm': round(float(np.atleast_1d(tempo)[0]), 2), 'beats': [round(float(b), 3) for b in beats]}
+    env = energy_envelope(samples, sample_rate, ONSET_HOP_SEC)
+    if env.size < 8:
+        return {'bpm': None, 'beats': []}
+    onset = np.maximum(0.0, np.diff(env))
+    onset -= onset.mean()
+    lags = np.arange(int(60.0 / MAX_BPM / ONSET_HOP_SEC), int(60.0 / MIN_BPM / ONSET_HOP_SEC) + 1)
+    lags = lags[lags < onset.size]
+    if not lags.size or not onset.any():
+        return {'bpm': None, 'beats': []}
+    # Smearing onsets over a few hops lets a fractional beat period still line up with itself
+    smooth = np.convolve(onset, np.hanning(7), mode='same')
+    corr = np.array([np.dot(smooth[:-lag], smooth[lag:]) for lag in lags])
+    # Log-normal tempo prior around 120 BPM keeps half/double-tempo lags from winning ties
+    bpms = 60.0 / (lags * ONSET_HOP_SEC)
+    corr = corr * np.exp(-0.5 * np.log2(bpms / 120.0) ** 2)
+    best = int(np.argmax(corr))
+    period = int(lags[best])
+    # Sub-hop period from a parabola through the peak, so the grid doesn't drift over long tracks
+    exact = float(period)
+    if 0 < best < corr.size - 1:
+        a, b, c = corr[best - 1], corr[best], corr[best + 1]
+        if a - 2 * b + c < 0:
+            exact += 0.5 * (a - c) / (a - 2 * b + c)
+    # Phase: the offset whose comb of beats collects the most onset strength
+    comb = np.arange(0, (onset.size - period) / exact) * exact
+    phase = int(np.argmax([smooth[np.round(p + comb).astype(int)].sum() for p in range(period)]))
+    beats = (phase + 1 + comb[phase + comb < onset.size]) * ONSET_HOP_SEC
+    return {'bpm': round(60.0 / (exact * ONSET_HOP_SEC), 2), 'beats': [round(float(b), 3) for b in beats]}
+
+
+def analyze_track(path: str, canonical: Optional[str] = None, job_id: Optional[str] = None) -> Dict[str, Any]:
+    """Full analysis of one track (no index access); also writes the canonical copy when given."""
+    t0 = time.perf_counter()
+    with ScratchSpace(job_id, 'music') as scratch:
+        wav_path = scratch.path('analysis.wav', estimate=os.path.getsize(path) * 4)
+        loudness = decode_and_measure(path, wav_path, canonical, job_id=job_id)
+        with wave.open(wav_path, 'rb') as wav:
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    env = energy_envelope(samples, ANALYSIS_RATE, ENVELOPE_HOP_SEC)
+    entry = {
+        'duration': round(len(samples) / float(ANALYSIS_RATE), 3),
+        **loudness,
+        **beat_grid(samples),
+        'envelope_hop_sec': ENVELOPE_HOP_SEC,
+        'envelope_db': [round(float(v), 1) for v in env],
+        'canonical': canonical,
+    }
+    log_event(job_id, 'music', 'music_analyzed', file=os.path.basename(path), duration=entry['duration'],
+              lufs=entry['lufs'], peak_db=entry['peak_db'], bpm=entry['bpm'],
+              elapsed_ms=round((time.perf_counter() - t0) * 1000, 1))
+    return entry
+
+
+def _path_lock(path: str) -> threading.Lock:
+    with _lock:
+        return _path_locks.setdefault(path, threading.Lock())
+
+
+def index_track(path: str, job_id: Optional[str] = None) -> Dict[str, Any]:
+    """Index entry for path, ingesting it only when the file is new or changed.
+
+    Ingest writes the canonical mixing copy next to the original and analyzes it in the same
+    decode. The upload hook and a render can race for a fresh track; the per-path lock makes
+    the second caller wait for the first ingest instead of repeating it.
+    """
+    path = os.path.abspath(path)
+    with _path_lock(path):
+        st = os.stat(path)
+        with _lock:
+            entry = _load_index().get(path)
+        if entry and entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns \
+                and (not entry.get('canonical') or os.path.exists(entry['canonical'])):
+            return entry
+        sha = hash_file(path)
+        with _lock:
+            twin = next((e for e in _load_index().values() if e.get('sha256') == sha and 'lufs' in e
+                         and e.get('canonical') and os.path.exists(e['canonical'])), None)
+        if twin:
+            analysis = {k: v for k, v in twin.items() if k not in ('path', 'size', 'mtime_ns')}
+        else:
+            canonical = None if path.endswith(CANONICAL_SUFFIX) else canonical_path(path)
+            analysis = analyze_track(path, canonical, job_id=job_id)
+        entry = {**analysis, 'path': path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha, 'indexed_ts': round(time.time(), 3)}
+        with _lock:
+            index = _load_index()
+            index[path] = entry
+            # Forget tracks that were deleted, and their canonical copies once nothing shares them
+            gone = {p: e for p, e in index.items() if not os.path.exists(p)}
+            index = {p: e for p, e in index.items() if p not in gone}
+            kept = {e.get('canonical') for e in index.values()}
+            for e in gone.values():
+                if e.get('canonical') and e['canonical'] not in kept and os.path.exists(e['canonical']):
+                    os.remove(e['canonical'])
+            _save_index(index)
+    log_event(job_id, 'music', 'music_indexed', file=os.path.basename(path), reused=bool(twin),
+              canonical=os.path.basename(entry.get('canonical') or ''))
+    return entry
+
+
+def static_gain_db(entry: Dict[str, Any]) -> float:
+    """Gain that brings the track to MUSIC_TARGET_LUFS without pushing its true peak over -1 dBFS."""
+    if entry.get('lufs') is None:
+        return 0.0
+    gain = settings.MUSIC_TARGET_LUFS - entry['lufs']
+    if entry.get('peak_db') is not None:
+        gain = min(gain, -1.0 - entry['peak_db'])
+    return round(gain, 2)
+
+
+def pick_start(entry: Dict[str, Any], video_duration: float) -> float:
+    """Beat-aligned start past a quiet intro, early enough that the track covers the video when it can."""
+    env = np.array(entry.get('envelope_db') or [], dtype=np.float64)
+    hop = entry.get('envelope_hop_sec') or ENVELOPE_HOP_SEC
+    start = 0.0
+    if env.size:
+        loud = np.flatnonzero(env >= np.median(env) + INTRO_QUIET_DB)
+        start = float(loud[0] * hop) if loud.size else 0.0
+    latest = max(0.0, float(entry.get('duration') or 0) - video_duration)
+    start = min(start, latest)
+    beats: List[float] = [b for b in entry.get('beats') or [] if b <= latest]
+    if beats and start > 0:
+        start = min(beats, key=lambda b: abs(b - start))
+    return round(start, 3)
+
+
+def try_index_track(path: str, job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """index_track that logs and returns None on failure (upload hook, mixing)."""
+    try:
+        return index_track(path, job_id=job_id)
+    except Exception as e:
+        log_event(job_id, 'music', 'music_index_failed', file=os.path.basename(path), error=str(e))
+        return None
+
+
+def mix_params(music_path: str, video_duration: float, job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """{'gain_db', 'start', 'source'} for mixing music_path under a video, or None if the track can't be indexed.
+
+    source is the canonical 48 kHz stereo copy when the ingest produced one.
+    """
+    entry = try_index_track(music_path, job_id=job_id)
+    if entry is None:
+        return None
+    canonical = entry.get('canonical')
+    source = canonical if canonical and os.path.exists(canonical) else music_path
+    params = {'gain_db': static_gain_db(entry), 'start': pick_start(entry, video_duration or 0.0), 'source': source}
+    log_event(job_id, 'music', 'mix_params', file=os.path.basename(music_path), gain_db=params['gain_db'],
+              start=params['start'], source=os.path.basename(source))
+    return params
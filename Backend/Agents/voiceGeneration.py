@@ -15,11 +15,53 @@ def _lazy_torch():
             _torch = None
     return _torch
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import threading
 from groq import Groq
 from dotenv import load_dotenv
 import wave
 import struct
 import math
+import random
+import re
+import unicodedata
+import uuid
+from Config.settings import settings
+from utils.disk_cache import DiskLRUCache, cache_key, link_or_copy
+from utils.rate_limit import KeyPool
+
+TTS_MODEL = "playai-tts"
+TTS_FORMAT = "wav"
+
+_clip_cache = None
+_clip_cache_lock = threading.Lock()
+
+
+def clip_cache() -> Optional[DiskLRUCache]:
+    """Process-wide cache of synthesized clips (CACHE_DIR/tts), or None when disabled."""
+    global _clip_cache
+    if not settings.TTS_CACHE_ENABLED:
+        return None
+    with _clip_cache_lock:
+        if _clip_cache is None:
+            _clip_cache = DiskLRUCache(
+                os.path.join(settings.CACHE_DIR, 'tts'),
+                settings.TTS_CACHE_MAX_MB * 1024 * 1024,
+                name='tts',
+            )
+        return _clip_cache
+
+
+def normalize_text(sentence: str) -> str:
+    """Text as the cache sees it: Unicode NFKC with whitespace collapsed.
+
+    Case and punctuation are kept since they change the delivery.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", sentence)).strip()
+
+
+def clip_key(sentence: str, voice: str) -> str:
+    return cache_key('tts', normalize_text(sentence), voice, TTS_MODEL, TTS_FORMAT)
 
 class VoiceGenerator:
     def __init__(self, 
@@ -80,8 +122,10 @@ class VoiceGenerator:
             self.current_key_index = 0
             
             # Initialize the client with the first key if not dry-run
+            self._clients = {}
+            self._clients_lock = threading.Lock()
             if not self.dry_run:
-                self.client = Groq(api_key=self.api_keys[self.current_key_index])
+                self.client = self._client_for(self.current_key_index)
             
             # Set default voice
             self.default_voice = Voices if Voices else "Arista-PlayAI"
@@ -119,10 +163,70 @@ class VoiceGenerator:
             return False
             
         self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-        self.client = Groq(api_key=self.api_keys[self.current_key_index])
+        self.client = self._client_for(self.current_key_index)
         self.logger.info(f"Rotated to API key {self.current_key_index + 1}")
         return True
     
+    def _client_for(self, index: int) -> Groq:
+        """One Groq client per API key, shared by the sequential and concurrent paths."""
+        with self._clients_lock:
+            if index not in self._clients:
+                self._clients[index] = Groq(api_key=self.api_keys[index])
+            return self._clients[index]
+
+    def _resolve_voice(self, voice: Optional[str]) -> str:
+        selected_voice = voice if voice else self.default_voice
+        if selected_voice not in self.available_voices:
+            self.logger.warning(f"Voice {selected_voice} is not available. Falling back to Arista-PlayAI")
+            selected_voice = "Arista-PlayAI"
+        return selected_voice
+
+    def _synthesize(self, client: Groq, sentence: str, filepath: str, voice: str) -> str:
+        """Single TTS request written to filepath (no retries), then stored in the clip cache."""
+        response = client.audio.speech.create(
+            model=TTS_MODEL,
+            voice=voice,
+            input=sentence,
+            response_format=TTS_FORMAT
+        )
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        # Write beside and rename: filepath may be a hardlink into the clip cache
+        tmp = f"{filepath}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(response.read())
+        os.replace(tmp, filepath)
+        cache = clip_cache()
+        if cache is not None:
+            cache.put(clip_key(sentence, voice), filepath, '.' + TTS_FORMAT)
+        return filepath
+
+    def _from_cache(self, sentence: str, filepath: str, voice: str) -> Optional[str]:
+        """Hardlink a cached clip for (sentence, voice) to filepath; None on a miss."""
+        cache = clip_cache()
+        if cache is None:
+            return None
+        cached = cache.get(clip_key(sentence, voice), '.' + TTS_FORMAT)
+        if cached is None:
+            return None
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        link_or_copy(cached, filepath)
+        self.logger.info(f"Voice clip cache hit: {filepath}")
+        return filepath
+
+    @staticmethod
+    def _is_rate_limit(error: Exception) -> bool:
+        msg = str(error).lower()
+        return "rate limit" in msg or "too many requests" in msg or getattr(error, 'status_code', None) == 429
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Seconds from the provider's Retry-After header, if the error carries one."""
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            return float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            return None
+
     def _write_silence_wav(self, path: str, duration_sec: float = 2.0, sample_rate: int = 22050):
         """Create a simple silent WAV file (or low-amplitude tone) for dry-run mode."""
         n_samples = int(duration_sec * sample_rate)
@@ -164,34 +268,26 @@ class VoiceGenerator:
         # Dry-run shortcut
         if self.dry_run:
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            if os.path.exists(filepath):
+                os.remove(filepath)  # never write through a hardlinked cache clip
             self._write_silence_wav(filepath, duration_sec=max(2, len(sentence.split())/3))
             self.logger.info(f"[DRY-RUN] Generated placeholder audio at {filepath}")
             return filepath
 
+        selected_voice = self._resolve_voice(voice)
+        if self._from_cache(sentence, filepath, selected_voice):
+            return filepath
+
         retries = 0
         while retries <= max_retries:
             try:
                 self._clear_memory()
                 self.logger.info(f"Generating voice for text: {sentence[:50]}...")
                 
-                selected_voice = voice if voice else self.default_voice
-                if selected_voice not in self.available_voices:
-                    self.logger.warning(f"Voice {selected_voice} is not available. Falling back to Arista-PlayAI")
-                    selected_voice = "Arista-PlayAI"
-                    
                 self.logger.info(f"Using voice: {selected_voice} with API key {self.current_key_index + 1}")
         
                 try:
-                    response = self.client.audio.speech.create(
-                        model="playai-tts",
-                        voice=selected_voice,
-                        input=sentence,
-                        response_format="wav"
-                    )
-                    
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                    with open(filepath, "wb") as f:
-                        f.write(response.read()) 
+                    self._synthesize(self.client, sentence, filepath, selected_voice)
                     
                     self.logger.info(f"Voice generated successfully at: {filepath}")
                     return filepath
@@ -244,12 +340,121 @@ class VoiceGenerator:
             raise ValueError(f"Invalid voice '{voice}'. Allowed: {', '.join(self.available_voices)}")
         return voice
             
+    def _generate_concurrent(self, sentences: List[str], base_filename: str, voice: Optional[str], max_retries: int = 3,
+                             positions: Optional[List[int]] = None) -> List[Optional[str]]:
+        """Synthesize all sentences in parallel across every API key; paths (None on failure) in input order.
+
+        Each key has its own token bucket sized to the provider limit (TTS_RPM_PER_KEY), so requests
+        start as soon as any key has budget; a 429 pauses only that key (Retry-After when given).
+        """
+        selected_voice = self._resolve_voice(voice)
+        pool = KeyPool(self.api_keys, settings.TTS_RPM_PER_KEY / 60.0, settings.TTS_RPM_PER_KEY, namespace='groq-tts')
+        workers = max(1, min(len(sentences), settings.TTS_MAX_PARALLEL or 8))
+
+        def synth(i: int, sentence: str) -> Optional[str]:
+            filepath = os.path.join(self.output_folder, f"{base_filename}{i}.wav")
+            if self._from_cache(sentence, filepath, selected_voice):
+                return filepath
+            deadline = time.monotonic() + settings.TTS_KEY_WAIT_SEC
+            for attempt in range(max_retries + 1):
+                acquired = pool.acquire(timeout=max(0.0, deadline - time.monotonic()))
+                if acquired is None:
+                    self.logger.error(f"No API key had budget for sentence {i} within {settings.TTS_KEY_WAIT_SEC:.0f}s")
+                    return None
+                index, _key = acquired
+                t0 = time.perf_counter()
+                try:
+                    self._synthesize(self._client_for(index), sentence, filepath, selected_voice)
+                    self.logger.info(f"Voice {i} generated with API key {index + 1} in {time.perf_counter() - t0:.2f}s")
+                    return filepath
+                except Exception as e:
+                    if "requires terms acceptance" in str(e).lower():
+                        raise RuntimeError("PlayAI TTS model requires terms acceptance. Visit Groq console to accept terms.")
+                    if attempt == max_retries:
+                        self.logger.warning(f"Voice {i} failed on API key {index + 1} ({str(e)[:200]})")
+                        break
+                    if self._is_rate_limit(e):
+                        # Only this key waits; the retry goes to whichever key has budget
+                        pool.penalize(index, self._retry_after(e) or settings.TTS_RATE_LIMIT_BACKOFF_SEC)
+                    else:
+                        # Jittered exponential backoff so a failing provider is not hammered in a tight loop
+                        time.sleep(min(settings.TTS_RATE_LIMIT_BACKOFF_SEC, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+                    self.logger.warning(f"Voice {i} failed on API key {index + 1} ({str(e)[:200]}). Retry {attempt + 1}/{max_retries}")
+            self.logger.error(f"Failed to generate voice for sentence {i} after {max_retries} retries")
+            return None
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts') as executor:
+            futures = [executor.submit(synth, i, sentence) for i, sentence in zip(positions or range(1, len(sentences) + 1), sentences)]
+            paths = [f.result() for f in futures]
+        self.logger.info(f"Generated {sum(p is not None for p in paths)}/{len(sentences)} voices with {workers} workers over {len(self.api_keys)} keys in {time.perf_counter() - t0:.2f}s")
+        return paths
+
+    def generate_voice_files(self,
+                             sentences: List[str],
+                             base_filename: str = "voicescript",
+                             voice: str = None,
+                             speed: float = 0.2,
+                             split_sentences: bool = True,
+                             concurrent: Optional[bool] = None) -> List[Optional[str]]:
+        """
+        Generate one voice file per sentence ({base_filename}{i}.wav), in sentence order.
+
+        Identical lines (after normalize_text) are synthesized once and linked to the
+        other positions; clips already in the clip cache make no provider call.
+
+        Returns:
+            Filepath per sentence, or None where generation failed.
+        """
+        if concurrent is None:
+            concurrent = settings.TTS_CONCURRENT
+        first: Dict[str, int] = {}
+        unique: List[int] = []
+        for i, sentence in enumerate(sentences):
+            norm = normalize_text(sentence)
+            if norm not in first:
+                first[norm] = i
+                unique.append(i)
+
+        paths: List[Optional[str]] = [None] * len(sentences)
+        if concurrent and not self.dry_run and len(unique) > 1:
+            generated = self._generate_concurrent([sentences[i] for i in unique], base_filename, voice, positions=[i + 1 for i in unique])
+            for i, filepath in zip(unique, generated):
+                paths[i] = filepath
+        else:
+            for i in unique:
+                try:
+                    paths[i] = self.generate_voice(
+                        sentences[i],
+                        f"{base_filename}{i + 1}.wav",
+                        voice=voice,
+                        speed=speed,
+                        split_sentences=split_sentences
+                    )
+                    if not paths[i]:
+                        self.logger.warning(f"Failed to generate voice for sentence {i + 1}")
+                except Exception as e:
+                    self.logger.error(f"Error processing sentence {i + 1}: {str(e)}")
+
+        for i, sentence in enumerate(sentences):
+            source = paths[first[normalize_text(sentence)]]
+            if paths[i] is None and source:
+                paths[i] = os.path.join(self.output_folder, f"{base_filename}{i + 1}.wav")
+                link_or_copy(source, paths[i])
+        if len(unique) < len(sentences):
+            self.logger.info(f"Synthesized {len(unique)} distinct lines for {len(sentences)} sentences")
+        cache = clip_cache()
+        if cache is not None:
+            self.logger.info(f"Voice clip cache: {cache.stats()}")
+        return paths
+
     def generate_multiple_voices(self, 
                                  sentences: List[str], 
                                  base_filename: str = "voicescript",
                                  voice: str = None,
                                  speed: float = 0.2,
-                                 split_sentences: bool = True) -> Dict[str, str]:
+                                 split_sentences: bool = True,
+                                 concurrent: Optional[bool] = None) -> Dict[str, str]:
         """
         Generate voice files for multiple sentences with sequential naming.
         
@@ -259,32 +464,17 @@ class VoiceGenerator:
             voice: Voice ID to use (defaults to the channel's default voice).
             speed: Speed factor for the synthesized speech. (Note: not used in Groq API but kept for compatibility)
             split_sentences: Enable sentence splitting for natural pauses. (Note: not used in Groq API but kept for compatibility)
+            concurrent: Synthesize in parallel across all API keys (default: TTS_CONCURRENT).
             
         Returns:
-            Dictionary mapping each sentence to its output filepath.
+            Dictionary mapping each sentence to its output filepath (in sentence order).
+            Repeated sentences keep their first file; use generate_voice_files for one path per sentence.
         """
+        paths = self.generate_voice_files(sentences, base_filename, voice, speed, split_sentences, concurrent)
         results = {}
-        
-        for i, sentence in enumerate(sentences, 1):
-            filename = f"{base_filename}{i}.wav"
-            
-            try:
-                filepath = self.generate_voice(
-                    sentence,
-                    filename,
-                    voice=voice,
-                    speed=speed,
-                    split_sentences=split_sentences
-                )
-                if filepath:
-                    results[sentence] = filepath
-                else:
-                    self.logger.warning(f"Failed to generate voice for sentence {i}")
-                    
-            except Exception as e:
-                self.logger.error(f"Error processing sentence {i}: {str(e)}")
-                continue
-                
+        for sentence, filepath in zip(sentences, paths):
+            if filepath:
+                results.setdefault(sentence, filepath)
         return results
 
 # Example usage:
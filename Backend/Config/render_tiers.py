@@ -0,0 +1,44 @@
+"""Render quality tiers shared by the edit and caption stages.
+
+`draft` is for checking pacing in the step UI (quarter resolution, ultrafast,
+low fps), `preview` is a mid-quality check, and only `final` pays the full
+encode cost.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+RENDER_TIERS: Dict[str, Dict[str, Any]] = {
+    'draft': {'scale': 0.25, 'fps': 12, 'preset': 'ultrafast', 'crf': 32, 'audio_bitrate': '64k'},
+    'preview': {'scale': 0.5, 'fps': 24, 'preset': 'veryfast', 'crf': 27, 'audio_bitrate': '96k'},
+    'final': {'scale': 1.0, 'fps': 30, 'preset': 'medium', 'crf': 23, 'audio_bitrate': '192k'},
+}
+DEFAULT_TIER = 'final'
+
+
+def get_render_tier(name: str | None) -> Dict[str, Any]:
+    """Return the tier settings (with its name); raises ValueError for unknown tiers."""
+    key = (name or DEFAULT_TIER).strip().lower()
+    if key not in RENDER_TIERS:
+        raise ValueError(f"Unknown render tier '{name}'. Allowed: {', '.join(RENDER_TIERS)}")
+    return {'name': key, **RENDER_TIERS[key]}
+
+
+def scaled_size(width: int, height: int, tier: Dict[str, Any]) -> tuple[int, int]:
+    """Scale a frame size by the tier factor, keeping both sides even for yuv420p."""
+    scale = tier['scale']
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def tier_output_path(path: str, tier: Dict[str, Any]) -> str:
+    """Non-final renders get a `_<tier>` suffix so they never overwrite the deliverable."""
+    if tier['name'] == DEFAULT_TIER:
+        return path
+    base, ext = path.rsplit('.', 1) if '.' in path else (path, 'mp4')
+    return f"{base}_{tier['name']}.{ext}"
+
+
+def tier_candidates(paths: List[str], tier: Dict[str, Any]) -> List[str]:
+    """Lookup order for a stage's input: every name at this tier first, then the final names."""
+    tiered = [tier_output_path(p, tier) for p in paths]
+    return tiered + [p for p in paths if p not in tiered]
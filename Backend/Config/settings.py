@@ -53,10 +53,80 @@ class Settings:
         self.AVATARS_DIR = os.path.abspath(os.getenv("AVATARS_DIR", os.path.join(self.ASSETS_DIR, "avatars")))
         self.CUSTOM_VOICES_DIR = os.path.abspath(os.getenv("CUSTOM_VOICES_DIR", os.path.join(self.ASSETS_DIR, "custom_voices")))
         self.JOBS_DIR = os.path.abspath(os.getenv("JOBS_DIR", os.path.join(repo_root, "jobs")))
+        self.CACHE_DIR = os.path.abspath(os.getenv("CACHE_DIR", os.path.join(repo_root, "cache")))
+
+        # ---- Clip library (pre-encoded gaps / intros / outros / title cards) ----
+        self.BRAND_INTRO_PATH = os.getenv("BRAND_INTRO_PATH") or None
+        self.BRAND_OUTRO_PATH = os.getenv("BRAND_OUTRO_PATH") or None
+        self.TITLE_CARD_FONT = os.getenv("TITLE_CARD_FONT") or None
+        self.CLIP_LIBRARY_WARM = os.getenv("CLIP_LIBRARY_WARM", "false").lower() == "true"
 
         # ---- Flags ----
+        # Skip the image/TTS/edit providers and write placeholder media (frontend work without API keys).
+        # On by default (these endpoints always served placeholders); false calls the real providers.
+        self.PLACEHOLDER_MEDIA = os.getenv("PLACEHOLDER_MEDIA", "true").lower() == "true"
         self.CLEAN_ON_START = os.getenv("CLEAN_ON_START", "false").lower() == "true"
 
+        # ---- Rendering ----
+        # "segments" = one ffmpeg per image/voice/gap (legacy), "parallel" = segments over a
+        # process pool, "graph" = single filter_complex pass, "frames" = Python-synthesized
+        # Ken Burns frames piped into one encoder
+        self.EDIT_RENDER_MODE = os.getenv("EDIT_RENDER_MODE", "segments").strip().lower()
+        self.EDIT_MAX_WORKERS = int(os.getenv("EDIT_MAX_WORKERS", "0"))  # 0 = derive from cores
+        self.EDIT_THREADS_PER_WORKER = int(os.getenv("EDIT_THREADS_PER_WORKER", "2"))
+        # Keep per-job render nodes (jobs/<id>/segments + timeline.json) and only re-render changed ones
+        self.EDIT_INCREMENTAL = os.getenv("EDIT_INCREMENTAL", "true").lower() == "true"
+        self.SEGMENT_CACHE_ENABLED = os.getenv("SEGMENT_CACHE_ENABLED", "true").lower() == "true"
+        self.SEGMENT_CACHE_MAX_MB = int(os.getenv("SEGMENT_CACHE_MAX_MB", "2048"))
+
+        # ---- Captions ----
+        # Align known voice scripts locally (Agents/captionAligner.py); Whisper only as fallback
+        self.CAPTIONS_ALIGN = os.getenv("CAPTIONS_ALIGN", "true").lower() == "true"
+        # Whisper fallback: 16 kHz mono audio split on silence into ~CAPTION_CHUNK_SEC Opus chunks
+        self.CAPTION_CHUNK_SEC = float(os.getenv("CAPTION_CHUNK_SEC", "120"))  # 0 = one request
+        self.CAPTION_CHUNK_SEARCH_SEC = float(os.getenv("CAPTION_CHUNK_SEARCH_SEC", "15"))  # +/- window for the quietest cut
+        self.CAPTION_MAX_PARALLEL = int(os.getenv("CAPTION_MAX_PARALLEL", "4"))  # concurrent chunk requests
+        # Burn layout: "words" = one SRT cue per word, "phrases" = karaoke ASS events (Agents/captionLayout.py).
+        # Burn time follows the glyph area drawn per frame, not the event count (test/test_caption_layout.py)
+        self.CAPTION_LAYOUT = os.getenv("CAPTION_LAYOUT", "words").strip().lower()
+        self.CAPTION_MAX_CHARS = int(os.getenv("CAPTION_MAX_CHARS", "32"))  # per line; also capped by frame width
+        self.CAPTION_MAX_LINES = int(os.getenv("CAPTION_MAX_LINES", "2"))
+        self.CAPTION_MAX_PHRASE_SEC = float(os.getenv("CAPTION_MAX_PHRASE_SEC", "3.0"))
+        # Stitched Whisper results keyed by PCM hash + model (CACHE_DIR/transcripts)
+        self.TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "true").lower() == "true"
+        self.TRANSCRIPT_CACHE_MAX_MB = int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "64"))
+
+        # ---- Voice (TTS) ----
+        # Parallel synthesis over all GROQ_API_KEY* keys, each with its own token bucket (utils/rate_limit.py)
+        self.TTS_CONCURRENT = os.getenv("TTS_CONCURRENT", "true").lower() == "true"
+        self.TTS_RPM_PER_KEY = float(os.getenv("TTS_RPM_PER_KEY", "10"))  # provider requests/minute per key
+        self.TTS_MAX_PARALLEL = int(os.getenv("TTS_MAX_PARALLEL", "8"))
+        self.TTS_RATE_LIMIT_BACKOFF_SEC = float(os.getenv("TTS_RATE_LIMIT_BACKOFF_SEC", "10"))  # when a 429 has no Retry-After
+        self.TTS_KEY_WAIT_SEC = float(os.getenv("TTS_KEY_WAIT_SEC", "300"))  # max wait per line for any key with budget
+        # Synthesized clips keyed by normalized text + voice + model + format (CACHE_DIR/tts)
+        self.TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+        self.TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "256"))
+
+        # ---- Uploads (streamed + deduplicated, see utils/uploads.py) ----
+        self.MUSIC_UPLOAD_MAX_MB = int(os.getenv("MUSIC_UPLOAD_MAX_MB", "100"))
+        self.VOICE_UPLOAD_MAX_MB = int(os.getenv("VOICE_UPLOAD_MAX_MB", "50"))
+
+        # ---- Music ----
+        # Loudness the music bed is brought to by its precomputed static gain (Agents/musicLibrary.py)
+        self.MUSIC_TARGET_LUFS = float(os.getenv("MUSIC_TARGET_LUFS", "-28"))
+        self.MUSIC_MAX_SEC = float(os.getenv("MUSIC_MAX_SEC", "600"))  # canonical copies are trimmed to this; 0 = full length
+
+        # ---- Scratch space (intermediate media; see utils/scratch.py) ----
+        self.SCRATCH_RAM_DIR = os.getenv("SCRATCH_RAM_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else "")
+        self.SCRATCH_RAM_BUDGET_MB = int(os.getenv("SCRATCH_RAM_BUDGET_MB", "512"))  # per job; 0 = disk only
+        self.SCRATCH_DISK_DIR = os.getenv("SCRATCH_DISK_DIR") or None  # spill target; default system temp dir
+
+        # ---- ffmpeg supervision ----
+        self.FFMPEG_TIMEOUT_SEC = float(os.getenv("FFMPEG_TIMEOUT_SEC", "1800"))  # per command; 0 = no deadline
+        self.FFPROBE_TIMEOUT_SEC = float(os.getenv("FFPROBE_TIMEOUT_SEC", "30"))
+        self.FFMPEG_NICE = int(os.getenv("FFMPEG_NICE", "10"))  # 0 = run at API priority
+        self.FFMPEG_IONICE_CLASS = int(os.getenv("FFMPEG_IONICE_CLASS", "2"))  # 2 = best-effort (lowest prio), 3 = idle, 0 = off
+
         self.ensure_directories()
 
     # ---- Helpers ----
@@ -68,6 +138,7 @@ class Settings:
             self.MUSIC_DIR,
             self.OUTPUT_DIR,
             self.JOBS_DIR,
+            self.CACHE_DIR,
             self.USER_OUTPUT_DIR,
             self.AVATARS_DIR,
         ]
@@ -1,4 +1,5 @@
 from typing import List, Optional, Dict, Any
+import asyncio
 import os
 import traceback
 from fastapi import HTTPException
@@ -11,13 +12,21 @@ from Services.VoiceGenService import VoiceGenService
 from Services.EditAgentService import EditAgentService
 from utils.exceptions import EditError
 from Services.CaptionGenService import CaptionGenService
+from Services.FinalizeService import FinalizeService
 from utils.exceptions import CaptionError
 from Config.settings import settings
 from jobs.job_utils import create_job, update_stage, load_manifest
+from jobs.workspace import stage_dirs, stage_order, workspace_for
 import uuid
 from utils.logging_utils import StageTimer, log_event
+from utils.ffmpeg_runner import cancel_job, run_ffmpeg_async
 import shutil
 
+def _stage_files(directory: str, extensions: tuple) -> List[str]:
+    """Files a stage wrote into its directory, in the order the editor consumes them (index, then creation time)."""
+    files = [os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith(extensions)]
+    return sorted(files, key=stage_order(directory))
+
 class VideoGenerationController:
     """Controller for automated video generation process"""
     
@@ -25,6 +34,88 @@ class VideoGenerationController:
         self.video_mode = False
         self.active_jobs = {}
     
+    async def _run_media(self, job_id: Optional[str], fn, *args, **kwargs):
+        """Run a blocking media service off the event loop; if we get cancelled its ffmpeg runs are killed."""
+        try:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        except asyncio.CancelledError:
+            if job_id:
+                cancel_job(job_id)
+            raise
+
+    def _placeholder_images(self, image_dir: str) -> List[str]:
+        """Empty image files standing in for the image provider (PLACEHOLDER_MEDIA)."""
+        image_paths_abs = [os.path.join(image_dir, f"image_{i}.png") for i in range(1, 30+1)]
+        # Ensure files exist (placeholder) so frontend doesn't 404 without an image provider
+        for p in image_paths_abs:
+            if not os.path.exists(p):
+                try:
+                    with open(p, 'wb') as f:
+                        f.write(b'')
+                except Exception:
+                    pass
+        return image_paths_abs
+
+    def _placeholder_voices(self, voice_dir: str, sentences: List[str], voice: Optional[str]) -> Dict[str, Any]:
+        """Silent clips standing in for TTS, or the clips already in voice_dir (PLACEHOLDER_MEDIA)."""
+        # Collect existing audio files
+        existing = [f for f in os.listdir(voice_dir) if f.lower().endswith((".wav", ".mp3"))]
+        files: List[str] = []
+        if existing:
+            # Same order the editor uses
+            files = sorted((os.path.join(voice_dir, f) for f in existing), key=stage_order(voice_dir))
+        else:
+            # Create placeholder silent wav files (very small) corresponding to sentences
+            import wave, contextlib
+            import struct
+            sample_rate = 8000
+            duration_sec = 1
+            n_samples = sample_rate * duration_sec
+            for idx, _ in enumerate(sentences or ["placeholder"]):
+                fname = os.path.join(voice_dir, f"voicescript{idx+1}.wav")
+                with wave.open(fname, 'w') as wf:
+                    wf.setnchannels(1)
+                    wf.setsampwidth(2)  # 16-bit
+                    wf.setframerate(sample_rate)
+                    silence = struct.pack('<h', 0)
+                    for _ in range(n_samples):
+                        wf.writeframesraw(silence)
+                files.append(fname)
+        return {
+            "status": "success",
+            "files": files,
+            "voice_used": voice or "default_fake"
+        }
+
+    async def _placeholder_video(self, output: str, video_mode: bool, job_id: Optional[str]) -> str:
+        """2-second black MP4 standing in for the edit (PLACEHOLDER_MEDIA)."""
+        base_name = "standard_video.mp4" if video_mode else "youtube_shorts.mp4"
+        out_abs = os.path.join(output, base_name)
+        if not os.path.exists(out_abs):
+            try:
+                ffmpeg = settings.get_ffmpeg()
+                # Choose resolution by mode (16:9 vs 9:16)
+                size = "1280x720" if video_mode else "720x1280"
+                cmd = [
+                    ffmpeg, "-y",
+                    "-f", "lavfi", "-i", f"color=c=black:s={size}:d=2",
+                    "-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo",
+                    "-shortest",
+                    "-c:v", "libx264", "-tune", "stillimage", "-pix_fmt", "yuv420p",
+                    "-c:a", "aac",
+                    "-movflags", "+faststart",
+                    out_abs,
+                ]
+                await run_ffmpeg_async(cmd, job_id=job_id, stage='edit', report=False)
+            except Exception:
+                # Final fallback: create empty file placeholder (may not play but unblocks flow)
+                try:
+                    with open(out_abs, 'wb') as f:
+                        f.write(b'')
+                except Exception:
+                    pass
+        return out_abs
+
     def set_video_mode(self, video_mode: bool) -> None:
         """Set video mode for the entire process (normalized to bool)."""
         self.video_mode = bool(video_mode)
@@ -123,24 +214,23 @@ class VideoGenerationController:
         try:
             effective_video_mode = video_mode if video_mode is not None else self.video_mode
 
-            image_dir = settings.IMAGES_DIR
-            os.makedirs(image_dir, exist_ok=True)
-            api_key = settings.GEMINI_API_KEY or os.getenv("GEMINI_API_KEY")
-            # result = ImageGenService(api_key, prompts, effective_video_mode)
-            image_paths_abs = [os.path.join(image_dir, f"image_{i}.png") for i in range(1, 30+1)]
-            # Ensure files exist (placeholder) so frontend doesn't 404 while real generation is stubbed
-            for p in image_paths_abs:
-                if not os.path.exists(p):
-                    try:
-                        with open(p, 'wb') as f:
-                            f.write(b'')
-                    except Exception:
-                        pass
+            # Job runs get their own jobs/<job_id>/images; no job -> shared IMAGES_DIR
+            image_dir = stage_dirs(job_id)['images']
+            if settings.PLACEHOLDER_MEDIA:
+                image_paths_abs = self._placeholder_images(image_dir)
+            else:
+                api_key = settings.GEMINI_API_KEY or os.getenv("GEMINI_API_KEY")
+                await self._run_media(job_id, ImageGenService, api_key, prompts, effective_video_mode, output_dir=image_dir)
+                image_paths_abs = _stage_files(image_dir, ('.png', '.jpg', '.jpeg'))
             # Convert absolute paths to web-relative (mounted under /assets)
             # If IMAGES_DIR ends with /assets/images, strip that root
             rel_paths: list[str] = []
             assets_root = settings.ASSETS_DIR
+            workspace = workspace_for(job_id)
             for abs_path in image_paths_abs:
+                if workspace:
+                    rel_paths.append(workspace.url(abs_path))
+                    continue
                 try:
                     rel = abs_path
                     if abs_path.startswith(assets_root):
@@ -188,40 +278,11 @@ class VideoGenerationController:
         try:
             effective_video_mode = video_mode if video_mode is not None else self.video_mode
             
-            voice_dir = settings.VOICES_DIR
-            os.makedirs(voice_dir, exist_ok=True)
-            # result = VoiceGenService(sentences, voice)
-# ==============================================fake data ==============================================================
-
-            # Fake / fallback result: use existing files in VoiceScripts directory (no real TTS)
-            # Collect existing audio files
-            existing = [f for f in os.listdir(voice_dir) if f.lower().endswith((".wav", ".mp3"))]
-            files: List[str] = []
-            if existing:
-                files = [os.path.join(voice_dir, f) for f in existing]
+            voice_dir = stage_dirs(job_id)['voices']
+            if settings.PLACEHOLDER_MEDIA:
+                result = self._placeholder_voices(voice_dir, sentences, voice)
             else:
-                # Create placeholder silent wav files (very small) corresponding to sentences
-                import wave, contextlib
-                import struct
-                sample_rate = 8000
-                duration_sec = 1
-                n_samples = sample_rate * duration_sec
-                for idx, _ in enumerate(sentences or ["placeholder"]):
-                    fname = os.path.join(voice_dir, f"voicescript{idx+1}.wav")
-                    with wave.open(fname, 'w') as wf:
-                        wf.setnchannels(1)
-                        wf.setsampwidth(2)  # 16-bit
-                        wf.setframerate(sample_rate)
-                        silence = struct.pack('<h', 0)
-                        for _ in range(n_samples):
-                            wf.writeframesraw(silence)
-                    files.append(fname)
-            result = {
-                "status": "success",
-                "files": files,
-                "voice_used": voice or "default_fake"
-            }
-# ==============================================fake data ==============================================================
+                result = await self._run_media(job_id, VoiceGenService, sentences, voice, output_folder=voice_dir)
 
             if result.get("status") != "success":
                 update_stage(job_id, 'voices', False, info={"error": result.get('message')}) if job_id else None
@@ -230,7 +291,11 @@ class VideoGenerationController:
             # Convert absolute file paths to web-relative paths under /assets for frontend
             rel_voice_paths: list[str] = []
             assets_root = settings.ASSETS_DIR
+            workspace = workspace_for(job_id)
             for abs_path in result.get('files', []) or []:
+                if workspace:
+                    rel_voice_paths.append(workspace.url(abs_path))
+                    continue
                 try:
                     rel = abs_path
                     if abs_path.startswith(assets_root):
@@ -255,48 +320,29 @@ class VideoGenerationController:
                 update_stage(job_id, 'voices', False, info={"error": str(e)})
             return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
     
-    async def edit_video(self, video_mode: Optional[bool] = None, job_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    async def edit_video(self, video_mode: Optional[bool] = None, job_id: Optional[str] = None, user_id: Optional[str] = None, render_tier: str = 'final') -> Dict[str, Any]:
         """Edit the final video"""
         try:
-            output = settings.OUTPUT_DIR
-            os.makedirs(output, exist_ok=True)
+            output = stage_dirs(job_id)['output']
             effective_video_mode = video_mode if video_mode is not None else self.video_mode
 
-            # Determine target filename by mode
-            base_name = "standard_video.mp4" if effective_video_mode else "youtube_shorts.mp4"
-            out_abs = os.path.join(output, base_name)
-
-            # Generate a small placeholder MP4 if it doesn't exist yet
-            if not os.path.exists(out_abs):
+            if settings.PLACEHOLDER_MEDIA:
+                out_abs = await self._placeholder_video(output, effective_video_mode, job_id)
+            else:
                 try:
-                    import subprocess
-                    ffmpeg = settings.get_ffmpeg()
-                    # Choose resolution by mode (16:9 vs 9:16)
-                    size = "1280x720" if effective_video_mode else "720x1280"
-                    cmd = [
-                        ffmpeg, "-y",
-                        "-f", "lavfi", "-i", f"color=c=black:s={size}:d=2",
-                        "-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo",
-                        "-shortest",
-                        "-c:v", "libx264", "-tune", "stillimage", "-pix_fmt", "yuv420p",
-                        "-c:a", "aac",
-                        "-movflags", "+faststart",
-                        out_abs,
-                    ]
-                    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                except Exception:
-                    # Final fallback: create empty file placeholder (may not play but unblocks flow)
-                    try:
-                        with open(out_abs, 'wb') as f:
-                            f.write(b'')
-                    except Exception:
-                        pass
+                    out_abs = await self._run_media(job_id, EditAgentService, video_mode=effective_video_mode, job_id=job_id, render_tier=render_tier)
+                except EditError as ee:
+                    if job_id:
+                        update_stage(job_id, 'edit', False, info={"error": str(ee), "render_tier": render_tier})
+                    return {"status": "error", "message": str(ee), "job_id": job_id}
+            base_name = os.path.basename(out_abs)
 
             # Ensure both names exist to satisfy frontend requests irrespective of mode
+            # (draft/preview renders carry a tier suffix and are not aliased)
             try:
-                alt_name = "youtube_shorts.mp4" if base_name == "standard_video.mp4" else "standard_video.mp4"
-                alt_abs = os.path.join(output, alt_name)
-                if os.path.exists(out_abs) and not os.path.exists(alt_abs):
+                alt_name = {"standard_video.mp4": "youtube_shorts.mp4", "youtube_shorts.mp4": "standard_video.mp4"}.get(base_name)
+                alt_abs = os.path.join(output, alt_name) if alt_name else None
+                if alt_abs and os.path.exists(out_abs) and not os.path.exists(alt_abs):
                     shutil.copy2(out_abs, alt_abs)
             except Exception:
                 pass
@@ -317,11 +363,14 @@ class VideoGenerationController:
                 except Exception:
                     pass  # Non-fatal
 
-            update_stage(job_id, 'edit', True, artifact=video_path) if job_id else None
+            update_stage(job_id, 'edit', True, artifact=video_path, info={"render_tier": render_tier}) if job_id else None
+            workspace = workspace_for(job_id)
             return {
                 "status": "success", 
                 "video_path": video_path,
+                "video_url": workspace.url(video_path) if workspace else None,
                 "video_mode": effective_video_mode,
+                "render_tier": render_tier,
                 "job_id": job_id
             }
         except Exception as e:
@@ -329,14 +378,15 @@ class VideoGenerationController:
                 update_stage(job_id, 'edit', False, info={"error": str(e)})
             return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
     
-    async def add_background_music(self, music_path: str, video_mode: Optional[bool] = None, job_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    async def add_background_music(self, music_path: str, video_mode: Optional[bool] = None, job_id: Optional[str] = None, user_id: Optional[str] = None, render_tier: str = 'final') -> Dict[str, Any]:
         """Add background music to video"""
         try:
             effective_video_mode = video_mode if video_mode is not None else self.video_mode
-            final_video = BgMusicGenService(music_path)
-            # Create a predictable alias file so frontend can find it reliably
+            final_video = await self._run_media(job_id, BgMusicGenService, music_path, job_id=job_id, render_tier=render_tier)
+            # Legacy (job-less) calls: predictable alias in the shared output dir so frontend can find it.
+            # Job runs keep the artifact in their workspace; the manifest points at it.
             try:
-                if final_video and os.path.exists(final_video):
+                if not job_id and final_video and os.path.exists(final_video):
                     out_dir = settings.OUTPUT_DIR
                     os.makedirs(out_dir, exist_ok=True)
                     alias = os.path.join(out_dir, "youtube_shorts_with_music.mp4")
@@ -357,11 +407,12 @@ class VideoGenerationController:
                     shutil.copy2(final_video, target_path)
                 except Exception:
                     pass
-            update_stage(job_id, 'music', True, artifact=final_video) if job_id else None
+            update_stage(job_id, 'music', True, artifact=final_video, info={"render_tier": render_tier}) if job_id else None
             return {
                 "status": "success",
                 "video_with_music": final_video,
                 "video_mode": effective_video_mode,
+                "render_tier": render_tier,
                 "job_id": job_id
             }
         except Exception as e:
@@ -369,17 +420,17 @@ class VideoGenerationController:
                 update_stage(job_id, 'music', False, info={"error": str(e)})
             return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
     
-    async def add_captions(self, video_mode: Optional[bool] = None, job_id: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    async def add_captions(self, video_mode: Optional[bool] = None, job_id: Optional[str] = None, user_id: Optional[str] = None, render_tier: str = 'final', caption_mode: Optional[str] = None) -> Dict[str, Any]:
         """Add captions to video"""
         try:
             # Use provided video_mode or fallback to controller's video_mode
             effective_video_mode = video_mode if video_mode is not None else self.video_mode
             # CaptionGenService might adjust caption style based on video_mode
             try:
-                captioned_video = CaptionGenService(job_id=job_id, video_mode=effective_video_mode)
-                # Create a predictable alias for captioned video if it's an mp4
+                captioned_video = await self._run_media(job_id, CaptionGenService, job_id=job_id, video_mode=effective_video_mode, render_tier=render_tier, caption_mode=caption_mode)
+                # Legacy (job-less) calls: predictable alias for captioned video if it's an mp4
                 try:
-                    if captioned_video and os.path.exists(captioned_video) and captioned_video.lower().endswith('.mp4'):
+                    if not job_id and captioned_video and os.path.exists(captioned_video) and captioned_video.lower().endswith('.mp4'):
                         out_dir = settings.OUTPUT_DIR
                         os.makedirs(out_dir, exist_ok=True)
                         alias = os.path.join(out_dir, "output_with_glowing_captions.mp4")
@@ -400,7 +451,7 @@ class VideoGenerationController:
                         shutil.copy2(captioned_video, target_path)
                     except Exception:
                         pass
-                update_stage(job_id, 'captions', True, artifact=captioned_video) if job_id else None
+                update_stage(job_id, 'captions', True, artifact=captioned_video, info={"render_tier": render_tier, "caption_mode": caption_mode}) if job_id else None
             except CaptionError as ce:
                 if job_id:
                     update_stage(job_id, 'captions', False, info={"error": str(ce)})
@@ -408,7 +459,9 @@ class VideoGenerationController:
             return {
                 "status": "success", 
                 "captioned_video": captioned_video,
+                "caption_mode": caption_mode,
                 "video_mode": effective_video_mode,
+                "render_tier": render_tier,
                 "job_id": job_id
             }
         except Exception as e:
@@ -416,14 +469,51 @@ class VideoGenerationController:
                 update_stage(job_id, 'captions', False, info={"error": str(e)})
             return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
 
-    async def generate_full_pipeline(self, title: str, channel_type: Optional[str] = None, voice: Optional[str] = None, video_mode: Optional[bool] = None, quick: bool = False, user_id: Optional[str] = None) -> Dict[str, Any]:
+    async def finalize_video(self, video_mode: Optional[bool] = None, job_id: Optional[str] = None, user_id: Optional[str] = None, render_tier: str = 'final', music_path: Optional[str] = None, captions: bool = True) -> Dict[str, Any]:
+        """Edit, music mix and caption burn in a single encode (replaces edit -> bgmusic -> captions)"""
+        try:
+            effective_video_mode = video_mode if video_mode is not None else self.video_mode
+            try:
+                result = await self._run_media(job_id, FinalizeService, video_mode=effective_video_mode, job_id=job_id, music_path=music_path, captions=captions, render_tier=render_tier)
+            except (EditError, CaptionError) as fe:
+                if job_id:
+                    update_stage(job_id, 'finalize', False, info={"error": str(fe)})
+                return {"status": "error", "message": str(fe)}
+            final_video = result['video']
+            # Archive to per-user gallery if user_id provided
+            if user_id and os.path.exists(final_video):
+                try:
+                    safe_dir = os.path.join(settings.USER_OUTPUT_DIR, ''.join(c if (c.isalnum() or c in '._-') else '_' for c in user_id))
+                    os.makedirs(safe_dir, exist_ok=True)
+                    target_path = os.path.join(safe_dir, f"{uuid.uuid4().hex[:8]}_{os.path.basename(final_video)}")
+                    shutil.copy2(final_video, target_path)
+                except Exception:
+                    pass
+            update_stage(job_id, 'finalize', True, artifact=final_video, info={"render_tier": render_tier, "music": bool(music_path), "captions": captions}) if job_id else None
+            workspace = workspace_for(job_id)
+            return {
+                "status": "success",
+                "video_path": final_video,
+                "video_url": workspace.url(final_video) if workspace else None,
+                "srt_path": result.get('srt'),
+                "video_mode": effective_video_mode,
+                "render_tier": render_tier,
+                "job_id": job_id
+            }
+        except Exception as e:
+            if job_id:
+                update_stage(job_id, 'finalize', False, info={"error": str(e)})
+            return {"status": "error", "message": str(e), "trace": traceback.format_exc()}
+
+    async def generate_full_pipeline(self, title: str, channel_type: Optional[str] = None, voice: Optional[str] = None, video_mode: Optional[bool] = None, quick: bool = False, user_id: Optional[str] = None, render_tier: str = 'final', finalize: bool = False, music_path: Optional[str] = None) -> Dict[str, Any]:
         effective_video_mode = video_mode if video_mode is not None else self.video_mode
         manifest = create_job(title, effective_video_mode, user_id=user_id, channel_type=channel_type)
         job_id = manifest['job_id']
         self.active_jobs[job_id] = True
-        summary: Dict[str, Any] = {"job_id": job_id, "video_mode": effective_video_mode}
+        summary: Dict[str, Any] = {"job_id": job_id, "video_mode": effective_video_mode, "render_tier": render_tier}
 
         try:
+            dirs = stage_dirs(job_id)
             if quick:
                 with StageTimer(job_id, 'content'):
                     dummy_content = f"Quick test content for: {title}"
@@ -435,14 +525,12 @@ class VideoGenerationController:
                     summary['scripts'] = dummy_scripts
                     summary['image_prompts'] = ["abstract background", "gradient pattern"]
                 with StageTimer(job_id, 'images'):
-                    image_dir = settings.IMAGES_DIR
-                    os.makedirs(image_dir, exist_ok=True)
+                    image_dir = dirs['images']
                     image_paths = [f"{image_dir}/quick_{i}.png" for i in range(1, 3)]
                     update_stage(job_id, 'images', True, info={"count": len(image_paths), "quick": True, "skipped_generation": True})
                     summary['image_paths'] = image_paths
                 with StageTimer(job_id, 'voices'):
-                    voice_dir = settings.VOICES_DIR
-                    os.makedirs(voice_dir, exist_ok=True)
+                    voice_dir = dirs['voices']
                     voice_files = []
                     for i in range(1, 3):
                         vf = f"{voice_dir}/quick_voice{i}.wav"
@@ -453,8 +541,7 @@ class VideoGenerationController:
                     update_stage(job_id, 'voices', True, info={"count": len(voice_files), "quick": True, "skipped_generation": True})
                     summary['voice_files'] = voice_files
                 with StageTimer(job_id, 'edit'):
-                    output_dir = settings.OUTPUT_DIR
-                    os.makedirs(output_dir, exist_ok=True)
+                    output_dir = dirs['output']
                     video_path = f"{output_dir}/quick_placeholder.txt"
                     with open(video_path, 'w', encoding='utf-8') as f:
                         f.write("Quick mode placeholder video artifact")
@@ -463,7 +550,7 @@ class VideoGenerationController:
                 with StageTimer(job_id, 'music'):
                     update_stage(job_id, 'music', True, info={"skipped": True, "quick": True})
                 with StageTimer(job_id, 'captions'):
-                    srt_path = f"{settings.OUTPUT_DIR}/quick_subs.srt"
+                    srt_path = f"{dirs['output']}/quick_subs.srt"
                     if not os.path.exists(srt_path):
                         with open(srt_path, 'w', encoding='utf-8') as f:
                             f.write("1\n00:00:00,000 --> 00:00:01,000\nQuick test.\n")
@@ -486,21 +573,56 @@ class VideoGenerationController:
                 summary['image_prompts'] = scripts_result.get('image_prompts')
             prompts = summary.get('image_prompts') or []
             with StageTimer(job_id, 'images'):
-                image_dir = settings.IMAGES_DIR
-                os.makedirs(image_dir, exist_ok=True)
-                image_paths = [f"{image_dir}/image_{i}.png" for i in range(1, len(prompts)+1)]
-                update_stage(job_id, 'images', True, info={"count": len(image_paths)})
+                image_dir = dirs['images']
+                if settings.PLACEHOLDER_MEDIA:
+                    image_paths = self._placeholder_images(image_dir)
+                else:
+                    await self._run_media(job_id, ImageGenService, settings.GEMINI_API_KEY, prompts, effective_video_mode, output_dir=image_dir)
+                    image_paths = _stage_files(image_dir, ('.png', '.jpg', '.jpeg'))
+                update_stage(job_id, 'images', True, info={"count": len(image_paths), "placeholder": settings.PLACEHOLDER_MEDIA})
                 summary['image_paths'] = image_paths
             with StageTimer(job_id, 'voices'):
-                vr = VoiceGenService(scripts_result.get('voice_scripts', []), voice)
+                if settings.PLACEHOLDER_MEDIA:
+                    vr = self._placeholder_voices(dirs['voices'], scripts_result.get('voice_scripts', []), voice)
+                else:
+                    vr = await self._run_media(job_id, VoiceGenService, scripts_result.get('voice_scripts', []), voice, output_folder=dirs['voices'])
                 if vr.get('status') != 'success':
                     update_stage(job_id, 'voices', False, info={"error": vr.get('message')})
                     raise RuntimeError(f"Voice stage failed: {vr.get('message')}")
                 update_stage(job_id, 'voices', True, info={"count": len(vr.get('files', []))})
                 summary['voice_files'] = vr.get('files')
+            if settings.PLACEHOLDER_MEDIA:
+                # Nothing real to render, mix or caption: stand-in edit, remaining stages skipped
+                with StageTimer(job_id, 'edit'):
+                    video_path = await self._placeholder_video(dirs['output'], effective_video_mode, job_id)
+                    update_stage(job_id, 'edit', True, artifact=video_path, info={"placeholder": True})
+                    summary['video_path'] = video_path
+                for stage in ('music', 'captions'):
+                    update_stage(job_id, stage, True, info={"skipped": True, "placeholder": True})
+                update_stage(job_id, 'complete', True, info={"placeholder": True})
+                log_event(job_id, 'complete', 'final', success=True, placeholder=True)
+                summary['status'] = 'success'
+                summary['manifest'] = load_manifest(job_id)
+                return summary
+            if finalize:
+                # One encode for edit + music + captions; the deliverable is the captioned video
+                with StageTimer(job_id, 'finalize'):
+                    try:
+                        result = await self._run_media(job_id, FinalizeService, video_mode=effective_video_mode, job_id=job_id, music_path=music_path, captions=True, render_tier=render_tier)
+                        update_stage(job_id, 'finalize', True, artifact=result['video'], info={"music": bool(music_path)})
+                        summary['video_path'] = result['video']
+                        summary['captioned_video'] = result['video']
+                    except (EditError, CaptionError) as fe:
+                        update_stage(job_id, 'finalize', False, info={"error": str(fe)})
+                        raise
+                update_stage(job_id, 'complete', True)
+                log_event(job_id, 'complete', 'final', success=True, finalize=True)
+                summary['status'] = 'success'
+                summary['manifest'] = load_manifest(job_id)
+                return summary
             with StageTimer(job_id, 'edit'):
                 try:
-                    video_path = EditAgentService(video_mode=effective_video_mode, job_id=job_id)
+                    video_path = await self._run_media(job_id, EditAgentService, video_mode=effective_video_mode, job_id=job_id, render_tier=render_tier)
                     update_stage(job_id, 'edit', True, artifact=video_path)
                     summary['video_path'] = video_path
                 except EditError as ee:
@@ -510,7 +632,7 @@ class VideoGenerationController:
                 update_stage(job_id, 'music', True, info={"skipped": True})
             with StageTimer(job_id, 'captions'):
                 try:
-                    captioned_video = CaptionGenService(job_id=job_id, video_mode=effective_video_mode)
+                    captioned_video = await self._run_media(job_id, CaptionGenService, job_id=job_id, video_mode=effective_video_mode, render_tier=render_tier)
                     update_stage(job_id, 'captions', True, artifact=captioned_video)
                     summary['captioned_video'] = captioned_video
                 except CaptionError as ce:
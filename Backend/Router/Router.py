@@ -1,17 +1,22 @@
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form, BackgroundTasks, Depends, Query, Header
 from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from datetime import datetime
 from PIL import Image
-import io
 import os
-import shutil
+import asyncio
 from Controller.Controller import VideoGenerationController
 from Config.settings import settings
 from db.models import get_session, User
 from Agents.voiceGeneration import VoiceGenerator
 from jobs.job_utils import load_manifest, update_stage
+from jobs.workspace import JobWorkspace, stage_dirs
+from utils.media_probe import cached_probe, probe
+from utils.ffmpeg_runner import cancel_job, run_ffmpeg_async
+from Agents.musicLibrary import try_index_track
+from utils.uploads import BlobStore, stream_to_file
+from utils.exceptions import UploadError, UploadTooLargeError
 from db.models import get_session
 from db import crud
 
@@ -21,10 +26,13 @@ router = APIRouter(prefix="/api/video", tags=["video generation"])
 # Initialize controller
 controller = VideoGenerationController()
 
+RenderTier = Literal['draft', 'preview', 'final']
+
 # Pydantic models for request validation
 class VideoModeConfig(BaseModel):
     video_mode: bool = True
     job_id: Optional[str] = None
+    render_tier: RenderTier = 'final'
 
 class ContentRequest(BaseModel):
     title: str
@@ -58,16 +66,30 @@ class BGMusicRequest(BaseModel):
     music_path: str
     video_mode: bool = True
     job_id: Optional[str] = None
+    render_tier: RenderTier = 'final'
 
 class CaptionsRequest(BaseModel):
     video_mode: bool = True
     job_id: Optional[str] = None
+    render_tier: RenderTier = 'final'
+    # burn = re-encode, soft = toggleable track via stream copy, sidecar = .srt/.vtt only; None = burn for final, soft otherwise
+    caption_mode: Optional[Literal['burn', 'soft', 'sidecar']] = None
+
+class FinalizeRequest(BaseModel):
+    video_mode: bool = True
+    job_id: Optional[str] = None
+    render_tier: RenderTier = 'final'
+    music_path: Optional[str] = None
+    captions: bool = True
 
 class FullPipelineRequest(BaseModel):
     title: str
     channel_type: Optional[str] = None
     voice: Optional[str] = None
     video_mode: bool = True
+    render_tier: RenderTier = 'final'
+    finalize: bool = False  # edit + music + captions in one encode
+    music_path: Optional[str] = None
 
 @router.post("/set-video-mode")
 async def set_video_mode(config: VideoModeConfig):
@@ -135,9 +157,12 @@ async def modify_image(request: ImageModificationRequest):
     return result
 
 @router.get("/image/{image_id}")
-async def get_image(image_id: str):
-    """Get a generated image by ID"""
-    image_path = os.path.join(settings.IMAGES_DIR, f"{image_id}.png")
+async def get_image(image_id: str, job_id: Optional[str] = Query(None)):
+    """Get a generated image by ID (from the job's workspace when job_id is given)"""
+    if any(x in image_id for x in ("..", "/", "\\")):
+        raise HTTPException(status_code=400, detail="Invalid image id")
+    _require_job(job_id)
+    image_path = os.path.join(stage_dirs(job_id)['images'], f"{image_id}.png")
     if not os.path.exists(image_path):
         raise HTTPException(status_code=404, detail="Image not found")
     return FileResponse(image_path)
@@ -206,12 +231,30 @@ async def run_full_pipeline(request: FullPipelineRequest, x_user_id: str | None
         channel_type=request.channel_type,
         voice=request.voice,
         video_mode=request.video_mode,
-        user_id=x_user_id
+        user_id=x_user_id,
+        render_tier=request.render_tier,
+        finalize=request.finalize,
+        music_path=request.music_path,
     )
     if result.get("status") == "error":
         raise HTTPException(status_code=500, detail=result.get("error"))
     return result
 
+@router.get("/jobs/{job_id}/files/{kind}/{name}")
+async def get_job_file(job_id: str, kind: str, name: str):
+    """Serve a file from a job workspace area (images, voices, segments, output)."""
+    _require_job(job_id)
+    path = JobWorkspace(job_id).resolve(kind, name)
+    if not path:
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path)
+
+@router.post("/jobs/{job_id}/cancel", response_model=Dict[str, Any])
+async def cancel_job_renders(job_id: str):
+    """Kill any ffmpeg processes currently running for a job."""
+    cancelled = cancel_job(job_id)
+    return {"status": "success", "job_id": job_id, "cancelled": cancelled}
+
 class JobCompletionRequest(BaseModel):
     success: bool = True
     error: Optional[str] = None
@@ -244,17 +287,16 @@ async def list_voices():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/custom-voice", response_model=Dict[str, Any])
-async def upload_custom_voice(voice_file: UploadFile = File(...)):
-    """Upload a custom voice model"""
-    voice_dir = settings.CUSTOM_VOICES_DIR
-    os.makedirs(voice_dir, exist_ok=True)
-    
-    file_path = os.path.join(voice_dir, voice_file.filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(voice_file.file, buffer)
-    
-    return {"status": "success", "voice_path": file_path}
+async def upload_custom_voice(voice_file: UploadFile = File(...), x_user_id: str | None = Header(default=None, convert_underscores=False)):
+    """Upload a custom voice model (streamed; identical files are stored once)"""
+    try:
+        blob = await BlobStore(settings.CUSTOM_VOICES_DIR, prefix='voice_').add(voice_file, settings.VOICE_UPLOAD_MAX_MB * 1024 * 1024, owner=x_user_id)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"status": "success", "voice_path": blob.path, "upload_ref": blob.ref, "deduplicated": blob.deduplicated}
 
 @router.post("/edit", response_model=Dict[str, Any])
 async def edit_video(request: VideoModeConfig, background_tasks: BackgroundTasks, x_user_id: str | None = Header(default=None, convert_underscores=False)):
@@ -272,32 +314,37 @@ async def edit_video(request: VideoModeConfig, background_tasks: BackgroundTasks
                 job_id = jobs[0]['job_id']
     except Exception:
         pass
-    result = await controller.edit_video(request.video_mode, job_id=job_id, user_id=x_user_id)
+    result = await controller.edit_video(request.video_mode, job_id=job_id, user_id=x_user_id, render_tier=request.render_tier)
     if result.get('status') != 'success':
         raise HTTPException(status_code=500, detail=result.get('message','Edit failed'))
     return result
 
 @router.post("/upload-music", response_model=Dict[str, Any])
-async def upload_music(music_file: UploadFile = File(...)):
-    """Upload a background music file"""
+async def upload_music(background_tasks: BackgroundTasks, music_file: UploadFile = File(...), x_user_id: str | None = Header(default=None, convert_underscores=False)):
+    """Upload a background music file (streamed and deduplicated; ingested into the music index after the response)"""
     try:
-        music_dir = settings.MUSIC_DIR
-        os.makedirs(music_dir, exist_ok=True)
-
-        file_extension = os.path.splitext(music_file.filename)[1]
-        unique_filename = f"bgmusic_{os.urandom(4).hex()}{file_extension}"
-        file_path = os.path.join(music_dir, unique_filename)
-
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(music_file.file, buffer)
+        blob = await BlobStore(settings.MUSIC_DIR, prefix='bgmusic_').add(music_file, settings.MUSIC_UPLOAD_MAX_MB * 1024 * 1024, owner=x_user_id)
+        background_tasks.add_task(try_index_track, blob.path)
 
         return {
             "status": "success",
             "message": "Music file uploaded successfully",
-            "music_path": file_path
+            "music_path": blob.path,
+            "upload_ref": blob.ref,
+            "deduplicated": blob.deduplicated
         }
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         return {"status": "error", "message": f"Failed to upload music file: {str(e)}"}
+
+@router.delete("/upload-music", response_model=Dict[str, Any])
+async def delete_music(music_path: str = Query(...), upload_ref: str = Query(...), x_user_id: str | None = Header(default=None, convert_underscores=False)):
+    """Release the caller's own upload of a music file; the shared blob is deleted with its last reference"""
+    # Only the reference returned to this user by /upload-music can be released
+    if not BlobStore(settings.MUSIC_DIR, prefix='bgmusic_').release(music_path, upload_ref, owner=x_user_id):
+        raise HTTPException(status_code=404, detail="Unknown music upload")
+    return {"status": "success"}
     
 @router.post("/bgmusic", response_model=Dict[str, Any])
 async def add_background_music(request: BGMusicRequest, x_user_id: str | None = Header(default=None, convert_underscores=False)):
@@ -317,7 +364,7 @@ async def add_background_music(request: BGMusicRequest, x_user_id: str | None =
     except Exception:
         pass
     try:
-        res = await controller.add_background_music(request.music_path, request.video_mode, job_id=job_id, user_id=x_user_id)
+        res = await controller.add_background_music(request.music_path, request.video_mode, job_id=job_id, user_id=x_user_id, render_tier=request.render_tier)
         if res.get('status') != 'success':
             raise HTTPException(status_code=500, detail=res.get('message','Music step failed'))
         return res
@@ -341,25 +388,37 @@ async def add_captions(request: CaptionsRequest, x_user_id: str | None = Header(
             job_id = job_id or jobs[0]['job_id']
     except Exception:
         pass
-    res = await controller.add_captions(request.video_mode, job_id=job_id, user_id=x_user_id)
+    res = await controller.add_captions(request.video_mode, job_id=job_id, user_id=x_user_id, render_tier=request.render_tier, caption_mode=request.caption_mode)
     if res.get('status') != 'success':
         raise HTTPException(status_code=500, detail=res.get('message','Captions step failed'))
     return res
 
+@router.post("/finalize", response_model=Dict[str, Any])
+async def finalize_video(request: FinalizeRequest, x_user_id: str | None = Header(default=None, convert_underscores=False)):
+    """Render the deliverable (edit + optional music + burned captions) in one encode"""
+    if request.music_path and not os.path.exists(request.music_path):
+        raise HTTPException(status_code=404, detail=f"Music file not found at path: {request.music_path}")
+    _require_job(request.job_id)
+    controller.set_video_mode(request.video_mode)
+    res = await controller.finalize_video(request.video_mode, job_id=request.job_id or None, user_id=x_user_id, render_tier=request.render_tier, music_path=request.music_path, captions=request.captions)
+    if res.get('status') != 'success':
+        raise HTTPException(status_code=500, detail=res.get('message','Finalize failed'))
+    return res
 
 @router.get("/video")
-async def get_final_video(file: Optional[str] = Query(None), t: Optional[str] = Query(None)):
+async def get_final_video(file: Optional[str] = Query(None), t: Optional[str] = Query(None), job_id: Optional[str] = Query(None)):
     """Serve a generated video by name with sensible fallbacks to reduce 404s.
 
-    - Respects `file` when present (joined under settings.OUTPUT_DIR).
+    - Looks in the job's workspace output/ when `job_id` is given, else settings.OUTPUT_DIR.
+    - Respects `file` when present (joined under that directory).
     - If missing or not found, falls back to current mode default.
     - If still not found, serves the most recently modified .mp4 in OUTPUT_DIR.
     """
     if file and any(x in file for x in ("..", "/", "\\")):
         raise HTTPException(status_code=400, detail="Invalid file name")
 
-    out_dir = settings.OUTPUT_DIR
-    os.makedirs(out_dir, exist_ok=True)
+    _require_job(job_id)
+    out_dir = stage_dirs(job_id)['output']
 
     def _as_path(name: str) -> str:
         return name if os.path.isabs(name) else os.path.join(out_dir, name)
@@ -372,6 +431,7 @@ async def get_final_video(file: Optional[str] = Query(None), t: Optional[str] =
     # Support both captions aliases
     candidates.append(_as_path("output_with_captions.mp4"))
     candidates.append(_as_path("output_with_glowing_captions.mp4"))
+    candidates.append(_as_path("output_with_soft_captions.mp4"))
 
     for p in candidates:
         if os.path.exists(p):
@@ -399,6 +459,17 @@ async def get_final_video(file: Optional[str] = Query(None), t: Optional[str] =
 
 # -------------------- User Gallery Endpoints --------------------
 
+def _require_job(job_id: Optional[str]) -> None:
+    """404 for unknown jobs so lookups never create workspaces for arbitrary ids."""
+    if not job_id:
+        return
+    if any(x in job_id for x in ("..", "/", "\\")):
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    try:
+        load_manifest(job_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
 def _safe_user_dir(user_id: str) -> str:
     """Return a filesystem-safe directory for the given user_id.
 
@@ -426,15 +497,18 @@ async def list_user_gallery(user_id: str):
         stat = os.stat(fpath)
         thumb_name = fname + ".jpg"
         thumb_path = os.path.join(user_dir, thumb_name)
+        # Listing never waits on ffprobe: details come from the probe cache once a thumbnail exists
+        info: Dict[str, Any] = cached_probe(fpath) or {}
         if fname.lower().endswith((".mp4",".mov",".mkv",".webm")) and not os.path.exists(thumb_path):
-            # Attempt thumbnail extraction (first frame) using moviepy fallback; if fails create placeholder
+            # Grab a single frame with ffmpeg (seek time from the probe, run off the event loop); placeholder on failure
             try:
-                from moviepy.editor import VideoFileClip  # type: ignore
-                with VideoFileClip(fpath) as clip:
-                    frame = clip.get_frame(min(1, clip.duration/2))
-                    img = Image.fromarray(frame)
-                    img.thumbnail((400,225))
-                    img.save(thumb_path, 'JPEG', quality=70)
+                if not info:
+                    info = await asyncio.to_thread(probe, fpath)
+                seek = min(1.0, (info.get('duration') or 0) / 2)
+                await run_ffmpeg_async([
+                    settings.get_ffmpeg(), '-y', '-v', 'error', '-ss', f"{seek:.3f}", '-i', fpath,
+                    '-frames:v', '1', '-vf', 'scale=400:-2', '-q:v', '5', thumb_path
+                ], stage='gallery', report=False, timeout=30)
             except Exception:
                 try:
                     # Placeholder gradient
@@ -446,6 +520,9 @@ async def list_user_gallery(user_id: str):
             "name": fname,
             "size": stat.st_size,
             "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "duration": info.get('duration'),
+            "width": info.get('width'),
+            "height": info.get('height'),
             "url": f"/api/video/user/{user_id}/gallery/file/{fname}",
             "thumbnail": f"/api/video/user/{user_id}/gallery/thumb/{thumb_name}" if os.path.exists(thumb_path) else None
         })
@@ -525,16 +602,23 @@ async def upload_avatar(user_id: str, file: UploadFile = File(...)):
     os.makedirs(avatar_dir, exist_ok=True)
     fname = f"{user_id}{ext}"
     path = os.path.join(avatar_dir, fname)
-    data = await file.read()
-    # Basic size cap 5MB
-    if len(data) > 5*1024*1024:
+    # Basic size cap 5MB, enforced while streaming
+    upload_path = os.path.join(avatar_dir, f".upload-{os.urandom(4).hex()}{ext}")
+    try:
+        await stream_to_file(file, upload_path, 5*1024*1024)
+    except UploadTooLargeError:
         raise HTTPException(status_code=400, detail="File too large")
+    def _thumbnail():
+        with Image.open(upload_path) as img:
+            img.thumbnail((512,512))
+            img.save(path)
     try:
-        img = Image.open(io.BytesIO(data))
-        img.thumbnail((512,512))
-        img.save(path)
+        await asyncio.to_thread(_thumbnail)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid image data")
+    finally:
+        try: os.remove(upload_path)
+        except OSError: pass
     # store filename
     with get_session() as session:
         u = session.get(User, user_id)
@@ -1,17 +1,32 @@
 from Agents.bgMusicAgent import VideoMusicSynchronizer
-from Config.settings import settings
+from Config.render_tiers import get_render_tier, tier_output_path
+from jobs.workspace import stage_dirs
+from utils.exceptions import MusicError
 import os
 
-def BgMusicGenService(music_path: str):
-    """Attach background music to the most recent core video output.
+def BgMusicGenService(music_path: str, job_id: str | None = None, render_tier: str | None = None):
+    """Attach background music to the most recent core video output of the job.
 
     Chooses shorts or standard path based on presence; falls back gracefully.
+    Renders of the requested tier are preferred (the final render is the fallback) and
+    the mix keeps the source's tier suffix. Reads and writes the job's workspace output/
+    (shared output dir without a job).
     """
-    synchronizer = VideoMusicSynchronizer(music_path)
-    # Prefer shorts variant then standard
-    candidate_paths = [
-        os.path.join(settings.OUTPUT_DIR, "youtube_shorts.mp4"),
-        os.path.join(settings.OUTPUT_DIR, "standard_video.mp4"),
-    ]
-    video_path = next((p for p in candidate_paths if os.path.exists(p)), candidate_paths[0])
-    return synchronizer.sync_music_to_video(video_path)
\ No newline at end of file
+    try:
+        tier = get_render_tier(render_tier)
+    except ValueError as e:
+        raise MusicError(str(e))
+    synchronizer = VideoMusicSynchronizer(music_path, job_id=job_id)
+    output_dir = stage_dirs(job_id)['output']
+    # Prefer shorts variant then standard; (video, mix output) pairs
+    candidates = []
+    for t in (tier, get_render_tier('final')):
+        for base in ("youtube_shorts", "standard_video"):
+            candidates.append((
+                tier_output_path(os.path.join(output_dir, f"{base}.mp4"), t),
+                tier_output_path(os.path.join(output_dir, f"{base}_with_music.mp4"), t),
+            ))
+    video_path, output_path = next((c for c in candidates if os.path.exists(c[0])), (None, None))
+    if video_path is None:
+        raise MusicError(f"No edited video to add music to in {output_dir} (tier '{tier['name']}'); run the edit stage first")
+    return synchronizer.sync_music_to_video(video_path, output_path)
@@ -1,26 +1,35 @@
 from Agents.captionAgent import transcribe_and_caption
-from Config.settings import settings
+from Config.render_tiers import get_render_tier, tier_candidates
+from jobs.workspace import stage_dirs
 from utils.exceptions import CaptionError
 import os
 
-def CaptionGenService(job_id: str | None = None, video_mode: bool = False):
-    """Caption the latest video.
+def CaptionGenService(job_id: str | None = None, video_mode: bool = False, render_tier: str | None = None, caption_mode: str | None = None):
+    """Caption the latest video of the job (its workspace output/, or the shared output dir without a job).
 
     In shorts mode prefer shorts with music -> shorts raw -> standard fallback.
     In long video mode prefer standard with music (if naming updated later) -> standard raw -> shorts fallback.
+    Renders of the requested tier are preferred; the final render is the fallback.
     """
+    try:
+        tier = get_render_tier(render_tier)
+    except ValueError as e:
+        raise CaptionError(str(e))
+    output_dir = stage_dirs(job_id)['output']
     if video_mode:
-        candidates = [
-            os.path.join(settings.OUTPUT_DIR, "standard_video_with_music.mp4"),
-            os.path.join(settings.OUTPUT_DIR, "standard_video.mp4"),
-            os.path.join(settings.OUTPUT_DIR, "youtube_shorts_with_music.mp4"),
-            os.path.join(settings.OUTPUT_DIR, "youtube_shorts.mp4"),
-        ]
+        names = ["standard_video_with_music.mp4", "standard_video.mp4", "youtube_shorts_with_music.mp4", "youtube_shorts.mp4"]
     else:
-        candidates = [
-            os.path.join(settings.OUTPUT_DIR, "youtube_shorts_with_music.mp4"),
-            os.path.join(settings.OUTPUT_DIR, "youtube_shorts.mp4"),
-            os.path.join(settings.OUTPUT_DIR, "standard_video.mp4"),
-        ]
-    video_path = next((p for p in candidates if os.path.exists(p)), candidates[0])
-    return transcribe_and_caption(video_path, job_id=job_id, video_mode=video_mode)
\ No newline at end of file
+        names = ["youtube_shorts_with_music.mp4", "youtube_shorts.mp4", "standard_video.mp4"]
+    candidates = tier_candidates([os.path.join(output_dir, n) for n in names], tier)
+    video_path = next((p for p in candidates if os.path.exists(p)), None)
+    if video_path is None:
+        raise CaptionError(f"No edited video to caption in {output_dir} (tier '{tier['name']}'); run the edit stage first")
+    return transcribe_and_caption(
+        video_path,
+        output_path=os.path.join(output_dir, "captions_raw.srt"),
+        job_id=job_id,
+        video_mode=video_mode,
+        render_tier=render_tier,
+        output_dir=output_dir,
+        caption_mode=caption_mode,
+    )
@@ -1,14 +1,18 @@
 from Agents.editAgent import VideoEditor
+from jobs.workspace import stage_dirs
 from utils.exceptions import EditError
 from typing import Optional
 
-def EditAgentService(video_mode: bool = False, job_id: Optional[str] = None) -> str:
-    editor = VideoEditor(video_mode=video_mode, job_id=job_id)
+def EditAgentService(video_mode: bool = False, job_id: Optional[str] = None, render_mode: Optional[str] = None, render_tier: Optional[str] = None) -> str:
+    editor = VideoEditor(video_mode=video_mode, job_id=job_id, render_mode=render_mode, render_tier=render_tier)
+    # Each job reads/writes only its own workspace (jobs/<job_id>/...); no job -> shared legacy dirs
+    dirs = stage_dirs(job_id)
     try:
         return editor.create_final_video(
-            image_dir='assets/images',
-            voice_dir='assets/VoiceScripts',
-            video_mode=video_mode
+            image_dir=dirs['images'],
+            voice_dir=dirs['voices'],
+            video_mode=video_mode,
+            output_dir=dirs['output'],
         )
     except ValueError as e:
         guidance = (
@@ -0,0 +1,31 @@
+from Agents.editAgent import VideoEditor
+from jobs.workspace import stage_dirs
+from utils.exceptions import CaptionError, EditError
+from typing import Any, Dict, Optional
+
+def FinalizeService(video_mode: bool = False, job_id: Optional[str] = None, music_path: Optional[str] = None, captions: bool = True, render_mode: Optional[str] = None, render_tier: Optional[str] = None) -> Dict[str, Any]:
+    """Edit + background music + burned captions in one video encode.
+
+    Returns {'video': path, 'srt': path or None}. Caption failures surface as CaptionError,
+    everything else as EditError.
+    """
+    editor = VideoEditor(video_mode=video_mode, job_id=job_id, render_mode=render_mode, render_tier=render_tier)
+    dirs = stage_dirs(job_id)
+    try:
+        return editor.finalize(
+            image_dir=dirs['images'],
+            voice_dir=dirs['voices'],
+            video_mode=video_mode,
+            output_dir=dirs['output'],
+            music_path=music_path,
+            captions=captions,
+        )
+    except CaptionError:
+        raise
+    except ValueError as e:
+        guidance = (
+            f"{e}\nEnsure: images count matches expectation and voice scripts present."
+        )
+        raise EditError(guidance) from e
+    except Exception as e:
+        raise EditError(str(e)) from e
@@ -2,11 +2,11 @@ import os
 from Agents.imageGeneration import ImageGenerator
 from Config.settings import settings
 
-def ImageGenService(api_key, prompts, video_mode: bool = False):
+def ImageGenService(api_key, prompts, video_mode: bool = False, output_dir: str = "assets/images"):
     # Prefer explicitly passed key, then settings, then env.
     final_key = api_key or settings.GEMINI_API_KEY or os.getenv("GEMINI_API_KEY")
     if not final_key:
         raise RuntimeError("GEMINI_API_KEY not configured.")
-    generator = ImageGenerator(final_key, video_mode=video_mode)
+    generator = ImageGenerator(final_key, output_dir=output_dir, video_mode=video_mode)
     generator.generate_all_images(prompts)
     return "Images generated successfully!"
\ No newline at end of file
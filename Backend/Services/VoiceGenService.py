@@ -1,8 +1,9 @@
 from Agents.voiceGeneration import VoiceGenerator
+from Agents.captionAligner import save_voice_scripts
 from dotenv import load_dotenv
 from typing import List, Dict, Any
 
-def VoiceGenService(sentences: List[str], Voice: str | None) -> Dict[str, Any]:
+def VoiceGenService(sentences: List[str], Voice: str | None, output_folder: str = "assets/VoiceScripts") -> Dict[str, Any]:
     """Generate voices for provided sentences using standard TTS only.
 
     Removed voice cloning feature; always returns own=False.
@@ -12,7 +13,7 @@ def VoiceGenService(sentences: List[str], Voice: str | None) -> Dict[str, Any]:
             return {"status": "error", "message": "No sentences provided", "files": []}
 
         load_dotenv()
-        generator = VoiceGenerator(Voices=Voice)
+        generator = VoiceGenerator(Voices=Voice, output_folder=output_folder)
         try:
             valid_voice = generator.validate_voice(Voice)
         except ValueError as ve:
@@ -20,8 +21,11 @@ def VoiceGenService(sentences: List[str], Voice: str | None) -> Dict[str, Any]:
             valid_voice = generator.default_voice
             print(f"Falling back to default voice: {valid_voice}")
 
-        results = generator.generate_multiple_voices(sentences, voice=valid_voice)
-        file_list = list(results.values())
+        paths = generator.generate_voice_files(sentences, voice=valid_voice)
+        # One entry per sentence (repeats included) so files and script lines stay paired
+        file_list = [p for p in paths if p]
+        # scripts.json next to the clips lets captions align the known text locally
+        save_voice_scripts(file_list, [s for s, p in zip(sentences, paths) if p])
         return {
             "status": "success",
             "files": file_list,
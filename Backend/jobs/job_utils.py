@@ -19,7 +19,9 @@ Manifest shape example:
 	 "scripts": { ... },
 	 ...
   },
-  "artifacts": {"edit": "output/standard_video.mp4", ...},
+  "workspace": {"images": "images", "voices": "voices", "segments": "segments", "output": "output"},
+  "artifacts": {"edit": ".../jobs/abc123/output/standard_video.mp4", ...},
+  "progress": {"edit": {"percent": 42.0, "speed": 1.8, "eta_sec": 12.5, "ts": ...}},
   "complete": false
 }
 """
@@ -34,9 +36,16 @@ JOBS_ROOT = os.path.join(BASE_DIR)
 
 _manifest_locks: Dict[str, threading.Lock] = {}
 
+# Per-job working areas under jobs/<job_id>/ (see jobs/workspace.py)
+WORKSPACE_KINDS = ('images', 'voices', 'segments', 'output')
+
 def _job_dir(job_id: str) -> str:
 	return os.path.join(JOBS_ROOT, job_id)
 
+def job_dir(job_id: str) -> str:
+	"""Public accessor for a job's directory (jobs/<job_id>/)."""
+	return _job_dir(job_id)
+
 def _manifest_path(job_id: str) -> str:
 	return os.path.join(_job_dir(job_id), 'manifest.json')
 
@@ -64,6 +73,8 @@ def create_job(title: str, video_mode: bool, user_id: Optional[str] = None, chan
 	job_id = uuid.uuid4().hex[:12]
 	job_path = _job_dir(job_id)
 	os.makedirs(job_path, exist_ok=True)
+	for kind in WORKSPACE_KINDS:
+		os.makedirs(os.path.join(job_path, kind), exist_ok=True)
 	manifest = {
 		'job_id': job_id,
 		'title': title,
@@ -72,6 +83,7 @@ def create_job(title: str, video_mode: bool, user_id: Optional[str] = None, chan
 		'channel_type': channel_type,
 		'created_ts': round(time.time(), 3),
 		'stages': {},  # stage_name -> {success, ts, info}
+		'workspace': {kind: kind for kind in WORKSPACE_KINDS},  # relative to jobs/<job_id>/
 		'artifacts': {},
 		'complete': False
 	}
@@ -97,6 +109,19 @@ def update_stage(job_id: str, stage: str, success: bool, artifact: Optional[str]
 	log_event(job_id, stage, 'update', success=success, artifact=artifact, **({'info': info} if info else {}))
 	return manifest
 
+def update_progress(job_id: str, stage: str, **fields: Any) -> None:
+	"""Record live progress (percent, speed, eta_sec, ...) for a running stage.
+
+	Stored under manifest['progress'][stage]; no-op when the job has no manifest.
+	"""
+	with _get_lock(job_id):
+		try:
+			manifest = _read_manifest(job_id)
+		except FileNotFoundError:
+			return
+		manifest.setdefault('progress', {})[stage] = {'ts': round(time.time(), 3), **fields}
+		_write_manifest(job_id, manifest)
+
 def load_manifest(job_id: str) -> Dict[str, Any]:
 	with _get_lock(job_id):
 		return _read_manifest(job_id)
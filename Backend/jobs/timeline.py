@@ -0,0 +1,120 @@
+"""Persisted per-job timeline graph for incremental re-renders.
+
+jobs/<job_id>/timeline.json records the dependency graph of the last edit:
+
+	inputs   -> {abs_path: {size, mtime_ns, sha256}}
+	segments -> {fingerprint: {image, effect, frames}}
+	blocks   -> {fingerprint: {voice, segments: [fp, ...]}}
+	final    -> {fingerprint, output}
+
+Rendered nodes live in the job's segments/ workspace area named by their fingerprint, so a
+node whose inputs did not change is found on disk and reused as-is; only nodes
+with a new fingerprint are rendered again. Input hashes are memoized by
+(size, mtime) so unchanged files are not re-read on every edit.
+"""
+
+from __future__ import annotations
+import os, json, time
+from typing import Any, Dict, Iterable, Optional
+from jobs.job_utils import job_dir
+from jobs.workspace import JobWorkspace
+from utils.disk_cache import hash_file
+from utils.logging_utils import log_event
+
+TIMELINE_VERSION = 1
+
+class Timeline:
+	def __init__(self, job_id: str):
+		self.job_id = job_id
+		self.path = os.path.join(job_dir(job_id), 'timeline.json')
+		self.render_dir = JobWorkspace(job_id).segments
+		self.data = self._load()
+		self.stats = {'inputs_rehashed': 0, 'reused': {}, 'rendered': {}}
+
+	def _empty(self) -> Dict[str, Any]:
+		return {'version': TIMELINE_VERSION, 'inputs': {}, 'segments': {}, 'blocks': {}, 'final': None}
+
+	def _load(self) -> Dict[str, Any]:
+		try:
+			with open(self.path, 'r', encoding='utf-8') as f:
+				data = json.load(f)
+			if data.get('version') == TIMELINE_VERSION:
+				return data
+		except (FileNotFoundError, json.JSONDecodeError):
+			pass
+		return self._empty()
+
+	def fingerprint_input(self, path: str) -> str:
+		"""Content hash of an input file, memoized on (size, mtime)."""
+		abs_path = os.path.abspath(path)
+		st = os.stat(abs_path)
+		prev = self.data['inputs'].get(abs_path)
+		if prev and prev.get('size') == st.st_size and prev.get('mtime_ns') == st.st_mtime_ns:
+			return prev['sha256']
+		digest = hash_file(abs_path)
+		self.data['inputs'][abs_path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+		self.stats['inputs_rehashed'] += 1
+		return digest
+
+	def node_path(self, kind: str, fingerprint: str, ext: str = '.mp4') -> str:
+		return os.path.join(self.render_dir, f"{kind}_{fingerprint[:20]}{ext}")
+
+	def is_fresh(self, path: str) -> bool:
+		"""A node is reusable when its fingerprint-named file exists and is non-empty."""
+		try:
+			return os.path.getsize(path) > 0
+		except OSError:
+			return False
+
+	def mark(self, kind: str, reused: bool) -> None:
+		bucket = self.stats['reused' if reused else 'rendered']
+		bucket[kind] = bucket.get(kind, 0) + 1
+
+	def final_is_current(self, fingerprint: str, output_path: str) -> bool:
+		"""True when the output still holds exactly what this graph rendered last time."""
+		final = self.data.get('final') or {}
+		if final.get('fingerprint') != fingerprint or final.get('output') != os.path.abspath(output_path):
+			return False
+		try:
+			st = os.stat(output_path)
+		except OSError:
+			return False
+		return st.st_size == final.get('size') and st.st_mtime_ns == final.get('mtime_ns')
+
+	def record(self, segments: Dict[str, Any], blocks: Dict[str, Any], final_fp: str, output_path: str) -> None:
+		self.data['segments'] = segments
+		self.data['blocks'] = blocks
+		st = os.stat(output_path)
+		self.data['final'] = {
+			'fingerprint': final_fp,
+			'output': os.path.abspath(output_path),
+			'size': st.st_size,
+			'mtime_ns': st.st_mtime_ns,
+			'ts': round(time.time(), 3),
+		}
+
+	def prune(self, keep: Iterable[str]) -> int:
+		"""Delete render nodes not referenced by the current graph."""
+		keep_set = {os.path.abspath(p) for p in keep}
+		removed = 0
+		for name in os.listdir(self.render_dir):
+			fpath = os.path.abspath(os.path.join(self.render_dir, name))
+			if fpath not in keep_set and os.path.isfile(fpath):
+				try:
+					os.remove(fpath)
+					removed += 1
+				except OSError:
+					pass
+		return removed
+
+	def save(self) -> None:
+		tmp = self.path + '.tmp'
+		with open(tmp, 'w', encoding='utf-8') as f:
+			json.dump(self.data, f, ensure_ascii=False, indent=2)
+		os.replace(tmp, self.path)
+		log_event(self.job_id, 'edit', 'timeline_saved', **self.stats)
+
+def load_timeline(job_id: Optional[str]) -> Optional[Timeline]:
+	if not job_id:
+		return None
+	return Timeline(job_id)
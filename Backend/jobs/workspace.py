@@ -0,0 +1,93 @@
+"""Per-job isolated workspaces.
+
+Every job owns a directory tree under jobs/<job_id>/:
+
+	images/    stills for the edit (image_{i}.png)
+	voices/    voice clips (voicescript{i}.wav)
+	segments/  persisted render nodes (see jobs/timeline.py)
+	output/    rendered deliverables (edit, music, captions)
+
+The layout is recorded in the manifest ('workspace' key, paths relative to
+the job dir) and every stage resolves its directories through it, so two
+pipelines never touch the same files. Calls without a job_id keep using the
+legacy shared directories from settings.
+"""
+
+from __future__ import annotations
+import os
+from typing import Dict, Optional
+from Config.settings import settings
+from jobs.job_utils import WORKSPACE_KINDS, job_dir, load_manifest
+
+class JobWorkspace:
+	def __init__(self, job_id: str):
+		self.job_id = job_id
+		self.root = job_dir(job_id)
+		layout: Dict[str, str] = {}
+		try:
+			layout = load_manifest(job_id).get('workspace') or {}
+		except FileNotFoundError:
+			pass
+		self.layout = {kind: layout.get(kind, kind) for kind in WORKSPACE_KINDS}
+
+	def dir(self, kind: str) -> str:
+		if kind not in self.layout:
+			raise ValueError(f"Unknown workspace area '{kind}'. Allowed: {', '.join(WORKSPACE_KINDS)}")
+		path = os.path.join(self.root, self.layout[kind])
+		os.makedirs(path, exist_ok=True)
+		return path
+
+	@property
+	def images(self) -> str:
+		return self.dir('images')
+
+	@property
+	def voices(self) -> str:
+		return self.dir('voices')
+
+	@property
+	def segments(self) -> str:
+		return self.dir('segments')
+
+	@property
+	def output(self) -> str:
+		return self.dir('output')
+
+	def resolve(self, kind: str, name: str) -> Optional[str]:
+		"""Path of an existing file inside one workspace area; None for anything outside it."""
+		if kind not in self.layout or not name or name != os.path.basename(name) or name.startswith('.'):
+			return None
+		path = os.path.join(self.root, self.layout[kind], name)
+		return path if os.path.isfile(path) else None
+
+	def url(self, path: str) -> str:
+		"""Web path served by GET /api/video/jobs/{job_id}/files/{kind}/{name}."""
+		rel = os.path.relpath(os.path.abspath(path), self.root).replace('\\', '/')
+		area, _, name = rel.partition('/')
+		kind = next((k for k, d in self.layout.items() if d == area), area)
+		return f"/api/video/jobs/{self.job_id}/files/{kind}/{name}"
+
+def stage_order(directory: str):
+	"""Sort key for stills and voice clips: index (image_{i} / voicescript{i}) first, creation time otherwise.
+
+	ctime alone is not enough: clips are synthesized in parallel and may be hardlinks of cached clips,
+	and a replaced image would otherwise move to the end of the timeline. The editor and the
+	controller's stage listings both use this order.
+	"""
+	def key(name: str):
+		stem = os.path.splitext(os.path.basename(name))[0]
+		digits = stem[len(stem.rstrip('0123456789')):]
+		return (int(digits) if digits else float('inf'), os.path.getctime(os.path.join(directory, name)))
+	return key
+
+def workspace_for(job_id: Optional[str]) -> Optional[JobWorkspace]:
+	return JobWorkspace(job_id) if job_id else None
+
+def stage_dirs(job_id: Optional[str]) -> Dict[str, str]:
+	"""images/voices/output directories for a stage: the job's workspace, or the shared legacy dirs."""
+	ws = workspace_for(job_id)
+	if ws is not None:
+		return {'images': ws.images, 'voices': ws.voices, 'output': ws.output}
+	for d in (settings.IMAGES_DIR, settings.VOICES_DIR, settings.OUTPUT_DIR):
+		os.makedirs(d, exist_ok=True)
+	return {'images': settings.IMAGES_DIR, 'voices': settings.VOICES_DIR, 'output': settings.OUTPUT_DIR}
@@ -45,6 +45,19 @@ app.include_router(auth_router)
 async def get_home_page(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.on_event("startup")
+async def _warm_clip_library() -> None:
+    # Pre-encode gap/intro/outro clips off the event loop so the first edit doesn't pay for them
+    if settings.CLIP_LIBRARY_WARM:
+        from Agents.clipLibrary import warm_default_profiles
+        asyncio.get_running_loop().run_in_executor(None, warm_default_profiles)
+
+@app.on_event("startup")
+async def _sweep_scratch() -> None:
+    # Drop scratch dirs (RAM and disk) left by workers that were killed mid-render
+    from utils.scratch import sweep_stale
+    sweep_stale()
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
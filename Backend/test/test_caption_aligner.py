@@ -0,0 +1,26 @@
+"""Energy-based word alignment on synthetic speech (tone bursts separated by pauses)."""
+import numpy as np
+
+from Agents.captionAligner import SAMPLE_RATE, align_words
+
+
+def _bursts(lengths, pause=0.12, lead=0.2):
+    parts = [np.zeros(int(lead * SAMPLE_RATE))]
+    for sec in lengths:
+        t = np.arange(int(sec * SAMPLE_RATE)) / SAMPLE_RATE
+        parts += [0.5 * np.sin(2 * np.pi * 220 * t), np.zeros(int(pause * SAMPLE_RATE))]
+    return np.concatenate(parts) * 32767
+
+
+def test_boundaries_snap_to_pauses_and_skip_leading_silence():
+    words = align_words(['Hello', 'brave', 'new', 'world.'], _bursts([0.5, 0.5, 0.34, 0.58]))
+    assert [w['word'] for w in words] == ['Hello', 'brave', 'new', 'world.']
+    assert abs(words[0]['start'] - 0.2) < 0.02
+    # Pause centers between the bursts: 0.76, 1.38, 1.84
+    assert [round(w['start'], 2) for w in words[1:]] == [0.76, 1.38, 1.84]
+    assert abs(words[-1]['end'] - 2.48) < 0.02
+
+
+def test_silent_clip_spreads_words_over_clip():
+    words = align_words(['a', 'b'], np.zeros(SAMPLE_RATE))
+    assert words[0]['start'] == 0.0 and abs(words[-1]['end'] - 1.0) < 1e-6
@@ -0,0 +1,89 @@
+"""Caption delivery modes: sidecar files and a soft subtitle track muxed without re-encoding (need ffmpeg)."""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import Agents.captionAgent as ca
+
+FFMPEG = os.getenv('FFMPEG_PATH') or shutil.which('ffmpeg')
+SRT = "1\n00:00:00,100 --> 00:00:00,600\nHello\n\n2\n00:00:00,600 --> 00:00:01,200\nthere\n"
+
+
+@pytest.fixture
+def video(monkeypatch, tmp_path):
+    monkeypatch.setattr(ca.settings, 'FFMPEG_PATH', FFMPEG)
+    monkeypatch.setattr(ca.settings, 'CAPTIONS_ALIGN', False)
+    transcribed = []
+
+    # Whisper stand-in: the audio is still extracted for real, the transcript is fixed
+    def fake_caption_audio(audio_path, output_path, **kwargs):
+        transcribed.append(os.path.getsize(audio_path))
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(SRT)
+        return output_path
+
+    monkeypatch.setattr(ca, 'caption_audio', fake_caption_audio)
+    path = tmp_path / 'edit.mp4'
+    subprocess.run(
+        [FFMPEG, '-y', '-v', 'error', '-f', 'lavfi', '-i', 'color=c=blue:s=64x112:r=12:d=1.5',
+         '-f', 'lavfi', '-i', 'sine=frequency=440:duration=1.5', '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+         '-c:a', 'aac', '-shortest', str(path)],
+        check=True,
+    )
+    return str(path), transcribed
+
+
+def _streams(path):
+    r = subprocess.run([FFMPEG, '-i', path], capture_output=True, text=True)
+    return [line.strip() for line in r.stderr.splitlines() if line.strip().startswith('Stream #')]
+
+
+def test_srt_to_vtt_keeps_cue_timing(tmp_path):
+    srt = tmp_path / 'captions.srt'
+    srt.write_text(SRT, encoding='utf-8')
+    vtt = ca.srt_to_vtt(str(srt), str(tmp_path / 'captions.vtt'))
+    assert open(vtt, encoding='utf-8').read() == (
+        "WEBVTT\n\n00:00:00.100 --> 00:00:00.600\nHello\n\n00:00:00.600 --> 00:00:01.200\nthere\n"
+    )
+
+
+
+def test_shift_srt_moves_every_cue(tmp_path):
+    srt = tmp_path / 'body.srt'
+    srt.write_text(SRT, encoding='utf-8')
+    shifted = ca.shift_srt(str(srt), str(tmp_path / 'captions.srt'), 2.0)
+    assert open(shifted, encoding='utf-8').read() == SRT.replace('00:00:00,', '00:00:02,').replace('00:00:01,', '00:00:03,')
+
+@pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+def test_sidecar_mode_only_writes_caption_files(video, tmp_path):
+    video_path, transcribed = video
+    out_dir = tmp_path / 'output'
+    result = ca.transcribe_and_caption(video_path, str(tmp_path / 'work.srt'), output_dir=str(out_dir), caption_mode='sidecar')
+    assert transcribed and result == str(out_dir / 'captions.srt')
+    assert sorted(os.listdir(out_dir)) == ['captions.srt', 'captions.vtt']
+
+
+@pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+def test_soft_mode_muxes_a_track_and_copies_the_video(video, monkeypatch, tmp_path):
+    video_path, _transcribed = video
+    commands = []
+    real_run = ca.run_ffmpeg
+
+    def spy(cmd, **kwargs):
+        commands.append(cmd)
+        return real_run(cmd, **kwargs)
+
+    monkeypatch.setattr(ca, 'run_ffmpeg', spy)
+    result = ca.transcribe_and_caption(video_path, str(tmp_path / 'work.srt'), output_dir=str(tmp_path / 'output'), caption_mode='soft')
+    streams = _streams(result)
+    assert any('Video: h264' in s for s in streams)
+    assert any('Subtitle: mov_text' in s for s in streams)
+    # Audio extraction + the mux; no video encoder anywhere
+    assert len(commands) == 2 and not any('libx264' in cmd for cmd in commands)
+
+
+def test_unknown_caption_mode_is_rejected(tmp_path):
+    with pytest.raises(ca.CaptionError):
+        ca.transcribe_and_caption(str(tmp_path / 'edit.mp4'), caption_mode='karaoke')
@@ -0,0 +1,90 @@
+"""Karaoke phrase layout, plus burn checks against one SRT cue per word (need ffmpeg with libass)."""
+import os
+import re
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from Agents.captionLayout import karaoke_text, layout_phrases, read_srt_words, write_ass
+
+FFMPEG = os.getenv('FFMPEG_PATH') or shutil.which('ffmpeg')
+
+
+def _words(n, step=0.4, pause_every=0):
+    words, t = [], 0.0
+    for i in range(n):
+        words.append({'word': f"word{i % 10}" + ('.' if pause_every and i % pause_every == pause_every - 1 else ''), 'start': t, 'end': t + step - 0.05})
+        t += step
+    return words
+
+
+def _write_srt(words, path):
+    def ts(s):
+        ms = int(round(s * 1000))
+        return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, w in enumerate(words, 1):
+            f.write(f"{i}\n{ts(w['start'])} --> {ts(w['end'])}\n{w['word']}\n\n")
+
+
+def test_phrases_respect_limits_and_keep_every_word():
+    words = _words(40, pause_every=7)
+    phrases = layout_phrases(words, max_chars=12, max_lines=2, max_duration=2.0)
+    flat = [w for p in phrases for line in p['lines'] for w in line]
+    assert flat == words
+    for p in phrases:
+        assert len(p['lines']) <= 2
+        assert all(sum(len(w['word']) + 1 for w in line) - 1 <= 12 for line in p['lines'])
+        assert p['end'] - p['start'] <= 2.0
+    # Sentence ends close a phrase
+    assert all(p['lines'][-1][-1]['word'].endswith('.') or not any(w['word'].endswith('.') for line in p['lines'] for w in line) for p in phrases)
+    assert all(a['end'] <= b['start'] for a, b in zip(phrases, phrases[1:]))
+
+
+def test_karaoke_durations_cover_the_phrase(tmp_path):
+    words = _words(6)
+    phrase = layout_phrases(words, max_chars=40, max_lines=1, max_duration=10)[0]
+    text = karaoke_text(phrase)
+    ks = [int(k) for k in re.findall(r'\\k(\d+)', text)]
+    assert len(ks) == 6
+    assert sum(ks) == round((phrase['end'] - phrase['start']) * 100)
+    srt = tmp_path / 'w.srt'
+    _write_srt(words, srt)
+    assert [w['word'] for w in read_srt_words(str(srt))] == [w['word'] for w in words]
+
+
+def _burned_frame(vf, at, size=(384, 288)):
+    """Gray frame at `at` seconds of a black clip with vf applied."""
+    w, h = size
+    proc = subprocess.run([FFMPEG, '-v', 'error', '-f', 'lavfi', '-i', f"color=c=black:s={w}x{h}:r=10:d=3", '-vf', vf,
+                           '-ss', str(at), '-frames:v', '1', '-f', 'rawvideo', '-pix_fmt', 'gray', '-'], capture_output=True)
+    if proc.returncode != 0 or len(proc.stdout) != w * h:
+        pytest.skip(f"subtitles filter unavailable: {proc.stderr[-200:]!r}")
+    return np.frombuffer(proc.stdout, np.uint8).reshape(h, w)
+
+
+def _span(mask):
+    idx = np.flatnonzero(mask)
+    return int(idx.min()), int(idx.max())
+
+
+@pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+def test_phrase_burn_matches_srt_size_and_highlights_spoken_words(tmp_path):
+    words = _words(6)
+    srt, ass = tmp_path / 'words.srt', tmp_path / 'phrase.ass'
+    _write_srt(words, srt)
+    write_ass(layout_phrases(words, max_chars=40, max_lines=1, max_duration=10), str(ass), font_size=16, outline=1)
+    style = "FontName=Arial,FontSize=16,PrimaryColour=&HFFFFFF&,Outline=1,Shadow=0,BorderStyle=1,Alignment=2,MarginV=50"
+
+    # 0.2 s: the SRT shows word0 alone; the phrase shows all six words with only word0 sung
+    per_word = _burned_frame(f"subtitles={srt}:force_style='{style}'", 0.2)
+    phrase = _burned_frame(f"subtitles={ass}", 0.2)
+    # Same PlayRes as ffmpeg's SRT conversion: same glyph height and bottom margin
+    assert _span((per_word > 200).any(axis=1)) == _span((phrase > 200).any(axis=1))
+    sung_left, sung_right = _span((phrase > 200).any(axis=0))
+    _, lit_right = _span((phrase > 60).any(axis=0))
+    word_w = np.subtract(*_span((per_word > 200).any(axis=0))[::-1])
+    assert sung_right - sung_left <= word_w * 1.2
+    assert lit_right > sung_right + 4 * word_w
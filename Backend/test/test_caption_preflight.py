@@ -0,0 +1,29 @@
+"""Caption preflight cache: a variant validated for one layout is not reused for another."""
+import subprocess
+
+import Agents.captionAgent as ca
+
+
+def test_preflight_cache_is_keyed_by_layout(monkeypatch, tmp_path):
+    runs = []
+
+    def fake_run(cmd, **kwargs):
+        runs.append(cmd[cmd.index('-vf') + 1])
+        return subprocess.CompletedProcess(cmd, 0, stdout=None, stderr='')
+
+    monkeypatch.setattr(ca, 'run_ffmpeg', fake_run)
+    monkeypatch.setattr(ca.settings, 'CACHE_DIR', str(tmp_path))
+    srt = tmp_path / 'captions.srt'
+    srt.write_text("1\n00:00:00,500 --> 00:00:01,000\nHello\n\n2\n00:00:01,000 --> 00:00:01,400\nthere\n", encoding='utf-8')
+
+    monkeypatch.setattr(ca.settings, 'CAPTION_LAYOUT', 'words')
+    assert ca.preflight_subtitles(str(srt), 1080, 1920)[0] == 'simple'
+    ca.preflight_subtitles(str(srt), 1080, 1920)
+    assert len(runs) == 1
+
+    # Same host/ffmpeg/font, different layout: sampled again, with the ASS script
+    monkeypatch.setattr(ca.settings, 'CAPTION_LAYOUT', 'phrases')
+    variant, expr = ca.preflight_subtitles(str(srt), 1080, 1920)
+    assert len(runs) == 2 and runs[1].endswith('captions.ass') and expr == runs[1]
+    ca.preflight_subtitles(str(srt), 1080, 1920)
+    assert len(runs) == 2
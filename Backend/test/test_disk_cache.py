@@ -0,0 +1,22 @@
+"""Disk LRU cache: running size total, tree walks only when over budget."""
+import os
+
+from utils.disk_cache import DiskLRUCache
+
+
+def test_writes_under_budget_do_not_walk_the_tree(tmp_path, monkeypatch):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=250, name='test')
+    walks = []
+    original = cache._entries
+    monkeypatch.setattr(cache, '_entries', lambda: walks.append(1) or original())
+
+    cache.put_bytes('a' * 64, b'x' * 100)  # first write syncs the running total
+    cache.put_bytes('b' * 64, b'x' * 100)
+    cache.put_bytes('b' * 64, b'x' * 100)  # replacing an entry does not grow the total
+    assert len(walks) == 1 and cache._size == 200
+
+    os.utime(cache.get('a' * 64), (1, 1))  # oldest entry
+    cache.put_bytes('c' * 64, b'x' * 100)  # over budget: walk and evict LRU
+    assert len(walks) == 2 and cache.evictions == 1
+    assert cache.get('a' * 64) is None and cache.get('b' * 64) and cache.get('c' * 64)
+    assert cache._size == cache.size_bytes() == 200
@@ -0,0 +1,199 @@
+"""Edit render paths on tiny synthetic inputs: letterboxing, planned frame counts, segment cache, incremental re-render (need ffmpeg)."""
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+from PIL import Image
+
+import Agents.editAgent as ea
+import jobs.job_utils as job_utils
+
+FFMPEG = os.getenv('FFMPEG_PATH') or shutil.which('ffmpeg')
+pytestmark = pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+
+
+@pytest.fixture
+def inputs(monkeypatch, tmp_path):
+    monkeypatch.setattr(ea.settings, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(ea.settings, 'FFMPEG_PATH', FFMPEG)
+    # Durations come from the WAV header; the editor only checks the ffprobe path exists
+    monkeypatch.setattr(ea.settings, 'FFPROBE_PATH', FFMPEG)
+    monkeypatch.setattr(ea.settings, 'BRAND_INTRO_PATH', None)
+    monkeypatch.setattr(ea.settings, 'BRAND_OUTRO_PATH', None)
+    monkeypatch.setattr(job_utils, 'JOBS_ROOT', str(tmp_path / 'jobs'))
+    image_dir, voice_dir = tmp_path / 'images', tmp_path / 'voices'
+    image_dir.mkdir()
+    voice_dir.mkdir()
+    for i, color in enumerate(['red', 'green', 'blue', 'white']):
+        Image.new('RGB', (64, 40), color).save(image_dir / f'image_{i + 1}.png')
+    for i, seconds in enumerate([1.3, 0.9]):
+        subprocess.run(
+            [FFMPEG, '-y', '-v', 'error', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+             '-ar', '16000', str(voice_dir / f'voicescript{i + 1}.wav')],
+            check=True,
+        )
+    return str(image_dir), str(voice_dir), str(tmp_path / 'output')
+
+
+def _frame_count(path):
+    r = subprocess.run([FFMPEG, '-i', path, '-map', '0:v', '-f', 'null', '-'], capture_output=True, text=True, check=True)
+    return int(re.findall(r'frame=\s*(\d+)', r.stderr)[-1])
+
+
+def _planned_frames(editor, blocks):
+    images = sum(editor._frames(img['duration']) for block in blocks for img in block['images'])
+    return images + (len(blocks) - 1) * editor._frames(editor.gap_duration)
+
+
+def _count_segment_renders(monkeypatch):
+    rendered = []
+    real = ea.VideoEditor.create_video_segment
+
+    def spy(self, image_path, *args, **kwargs):
+        rendered.append(os.path.basename(image_path))
+        return real(self, image_path, *args, **kwargs)
+
+    monkeypatch.setattr(ea.VideoEditor, 'create_video_segment', spy)
+    return rendered
+
+
+@pytest.mark.parametrize('mode', ['graph', 'frames'])
+def test_single_pass_render_matches_planned_frames(inputs, mode):
+    image_dir, voice_dir, output_dir = inputs
+    editor = ea.VideoEditor(render_mode=mode, render_tier='draft')
+    out = editor.create_final_video(image_dir, voice_dir, output_dir=output_dir)
+    blocks = editor.plan_timeline(image_dir, voice_dir)
+    # Block 1 is fade + zoom: the zoom still must last its full share, not one zoompan burst
+    assert [img['effect'] for img in blocks[0]['images']] == ['fade', 'zoom']
+    assert _frame_count(out) == _planned_frames(editor, blocks)
+
+
+@pytest.mark.parametrize('mode', ['segments', 'parallel'])
+def test_segment_cache_serves_repeat_renders(inputs, monkeypatch, mode):
+    image_dir, voice_dir, output_dir = inputs
+    monkeypatch.setattr(ea.settings, 'SEGMENT_CACHE_ENABLED', True)
+    monkeypatch.setattr(ea.settings, 'EDIT_MAX_WORKERS', 2)
+    rendered = _count_segment_renders(monkeypatch)
+    first = ea.VideoEditor(render_mode=mode, render_tier='draft').create_final_video(image_dir, voice_dir, output_dir=output_dir)
+    assert sorted(rendered) == ['image_1.png', 'image_2.png', 'image_3.png', 'image_4.png']
+    frames = _frame_count(first)
+    editor = ea.VideoEditor(render_mode=mode, render_tier='draft')
+    assert frames == _planned_frames(editor, editor.plan_timeline(image_dir, voice_dir))
+
+    rendered.clear()
+    os.remove(first)
+    again = ea.VideoEditor(render_mode=mode, render_tier='draft').create_final_video(image_dir, voice_dir, output_dir=output_dir)
+    assert rendered == []
+    assert _frame_count(again) == frames
+
+
+def test_incremental_rerender_rebuilds_only_the_changed_block(inputs, monkeypatch):
+    image_dir, voice_dir, output_dir = inputs
+    monkeypatch.setattr(ea.settings, 'SEGMENT_CACHE_ENABLED', False)
+    monkeypatch.setattr(ea.settings, 'EDIT_INCREMENTAL', True)
+    rendered = _count_segment_renders(monkeypatch)
+    muxed = []
+    real_run = ea.VideoEditor.run
+
+    def run_spy(self, cmd, *args, **kwargs):
+        voices = [os.path.basename(a) for a in cmd if str(a).endswith('.wav')]
+        muxed.extend(voices)
+        return real_run(self, cmd, *args, **kwargs)
+
+    monkeypatch.setattr(ea.VideoEditor, 'run', run_spy)
+    ea.VideoEditor(job_id='job-1', render_mode='segments', render_tier='draft').create_final_video(image_dir, voice_dir, output_dir=output_dir)
+    assert sorted(rendered) == ['image_1.png', 'image_2.png', 'image_3.png', 'image_4.png']
+    assert sorted(muxed) == ['voicescript1.wav', 'voicescript2.wav']
+
+    # Only image 3 (first image of block 2) changes
+    rendered.clear()
+    muxed.clear()
+    Image.new('RGB', (64, 40), 'yellow').save(os.path.join(image_dir, 'image_3.png'))
+    editor = ea.VideoEditor(job_id='job-1', render_mode='segments', render_tier='draft')
+    out = editor.create_final_video(image_dir, voice_dir, output_dir=output_dir)
+    assert rendered == ['image_3.png']
+    assert muxed == ['voicescript2.wav']
+    assert os.path.isfile(out)
+
+
+@pytest.mark.parametrize('mode', ['segments', 'graph'])
+def test_brand_intro_is_spliced_ahead_of_the_body(inputs, monkeypatch, tmp_path, mode):
+    image_dir, voice_dir, output_dir = inputs
+    intro = tmp_path / 'intro.png'
+    Image.new('RGB', (64, 40), 'black').save(intro)
+    monkeypatch.setattr(ea.settings, 'BRAND_INTRO_PATH', str(intro))
+    monkeypatch.setattr(ea.settings, 'SEGMENT_CACHE_ENABLED', False)
+    editor = ea.VideoEditor(render_mode=mode, render_tier='draft')
+    out = editor.create_final_video(image_dir, voice_dir, output_dir=output_dir)
+    # Still intros are conformed to 2 s of the render profile
+    assert _frame_count(out) == 2 * editor.fps + _planned_frames(editor, editor.plan_timeline(image_dir, voice_dir))
+
+
+
+
+def test_stalled_brand_intro_is_skipped(inputs, monkeypatch, tmp_path):
+    image_dir, voice_dir, output_dir = inputs
+    intro = tmp_path / 'intro.png'
+    Image.new('RGB', (64, 40), 'black').save(intro)
+    monkeypatch.setattr(ea.settings, 'BRAND_INTRO_PATH', str(intro))
+
+    def stalled(self, source_path, kind, still_duration=2.0):
+        raise subprocess.TimeoutExpired('ffmpeg', 30)
+
+    monkeypatch.setattr(ea.ClipLibrary, 'branded', stalled)
+    editor = ea.VideoEditor(render_mode='graph', render_tier='draft')
+    out = editor.create_final_video(image_dir, voice_dir, output_dir=output_dir)
+    assert _frame_count(out) == _planned_frames(editor, editor.plan_timeline(image_dir, voice_dir))
+
+def test_finalize_returns_captions_timed_to_the_deliverable(inputs, monkeypatch, tmp_path):
+    image_dir, voice_dir, output_dir = inputs
+    import Agents.captionAgent as ca
+    intro = tmp_path / 'intro.png'
+    Image.new('RGB', (64, 40), 'black').save(intro)
+    monkeypatch.setattr(ea.settings, 'BRAND_INTRO_PATH', str(intro))
+    monkeypatch.setattr(ea.settings, 'CAPTIONS_ALIGN', False)
+    # No real ffprobe here: the conformed intro clip is 2 s, voices still come from their WAV headers
+    real_duration = ea.get_duration
+    monkeypatch.setattr(ea, 'get_duration', lambda path, **kw: 2.0 if os.path.basename(path).startswith('intro_') else real_duration(path, **kw))
+    burned = []
+
+    def fake_caption_audio(audio_path, output_path, **kwargs):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write("1\n00:00:00,100 --> 00:00:00,600\nHello\n")
+        return output_path
+
+    def spy_preflight(srt_path, *args, **kwargs):
+        burned.append(open(srt_path, encoding='utf-8').read())
+        return 'simple', 'null'
+
+    monkeypatch.setattr(ca, 'caption_audio', fake_caption_audio)
+    monkeypatch.setattr(ca, 'preflight_subtitles', spy_preflight)
+    result = ea.VideoEditor(render_mode='graph', render_tier='draft').finalize(image_dir, voice_dir, output_dir=output_dir)
+    # Burned into the body as transcribed; the returned file is shifted by the 2 s intro
+    assert '00:00:00,100 --> 00:00:00,600' in burned[0]
+    assert '00:00:02,100 --> 00:00:02,600' in open(result['srt'], encoding='utf-8').read()
+    assert os.path.isfile(result['video'])
+
+def test_letterbox_fits_large_sources_in_memory(inputs, tmp_path):
+    source = tmp_path / 'wide.jpg'
+    Image.new('RGB', (4000, 1000), (200, 30, 30)).save(source, quality=95)
+    editor = ea.VideoEditor(render_tier='draft')
+    frame = editor.letterbox(str(source))
+    assert frame.size == (editor.width, editor.height)
+    # 4:1 source in a portrait frame: full width, black bars above and below
+    assert frame.getpixel((editor.width // 2, 0)) == (0, 0, 0)
+    r, g, b = frame.getpixel((editor.width // 2, editor.height // 2))
+    assert r > 150 and g < 80 and b < 80
+
+
+def test_segment_is_encoded_from_the_piped_frame(inputs, tmp_path):
+    image_dir, _voice_dir, _output_dir = inputs
+    editor = ea.VideoEditor(render_tier='draft')
+    before = set(os.listdir(image_dir))
+    out = str(tmp_path / 'segment.mp4')
+    editor.create_video_segment(os.path.join(image_dir, 'image_1.png'), 1.5, out, 'pan')
+    assert _frame_count(out) == editor._frames(1.5)
+    # The letterboxed frame goes over stdin; no resized PNG is written next to the source
+    assert set(os.listdir(image_dir)) == before
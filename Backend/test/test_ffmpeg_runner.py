@@ -0,0 +1,75 @@
+"""Progress aggregation for ffmpeg runs, plus deadline and cancellation of real runs (need ffmpeg)."""
+import concurrent.futures
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+from utils import ffmpeg_runner
+from utils.ffmpeg_runner import StageProgress, _parse_speed, _parse_time, cancel_job, run_ffmpeg
+
+FFMPEG = os.getenv('FFMPEG_PATH') or shutil.which('ffmpeg')
+# Never finishes on its own: an endless silent source throttled to realtime
+ENDLESS = [FFMPEG, '-re', '-f', 'lavfi', '-i', 'anullsrc=r=8000:cl=mono', '-f', 'null', '-']
+
+
+def test_parse_progress_fields():
+    assert _parse_time('1500000') == 1.5
+    assert _parse_time('N/A') is None
+    assert _parse_speed('2.5x') == 2.5
+    assert _parse_speed('N/A') is None
+
+
+def test_stage_progress_spans_calls_and_credits():
+    p = StageProgress(None, 'edit', 10.0, min_interval=3600)
+    p.credit(2.0)
+    p.update(1, 3.0, 1.0)
+    p.update(2, 1.0, 1.0)
+    snap = p._snapshot(p.started + 6.0)
+    assert snap['percent'] == 60.0
+    assert snap['speed'] == 1.0
+    assert snap['eta_sec'] == 4.0
+    p.finish(1)
+    p.finish(2, 2.0)
+    assert p._snapshot(p.started + 7.0)['processed_sec'] == 7.0
+
+
+@pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+def test_deadline_kills_the_run():
+    t0 = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_ffmpeg(ENDLESS, job_id='test-timeout', report=False, timeout=0.5)
+    assert time.monotonic() - t0 < ffmpeg_runner._KILL_GRACE_SEC + 2
+    assert 'test-timeout' not in ffmpeg_runner._running
+
+
+@pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+def test_cancel_job_stops_a_blocking_caller():
+    errors = []
+
+    def render():
+        try:
+            run_ffmpeg(ENDLESS, job_id='test-cancel', report=False, timeout=30)
+        except BaseException as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=render)
+    worker.start()
+    deadline = time.monotonic() + 10
+    while 'test-cancel' not in ffmpeg_runner._running and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert cancel_job('test-cancel') == 1
+    worker.join(ffmpeg_runner._KILL_GRACE_SEC + 5)
+    assert not worker.is_alive()
+    assert len(errors) == 1 and isinstance(errors[0], concurrent.futures.CancelledError)
+    assert 'test-cancel' not in ffmpeg_runner._running
+
+
+@pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+def test_capture_stdout_runs_the_command_unmodified():
+    proc = run_ffmpeg([FFMPEG, '-hide_banner', '-version'], capture_stdout=True, timeout=10)
+    assert proc.returncode == 0 and proc.stdout.startswith('ffmpeg version')
+    assert proc.args == [FFMPEG, '-hide_banner', '-version']
@@ -0,0 +1,100 @@
+"""Header-only WAV probing (no ffmpeg needed); other files go through the supervised ffprobe."""
+import json
+import os
+import struct
+import subprocess
+import tempfile
+import wave
+
+import pytest
+
+import utils.media_probe as media_probe
+from utils.media_probe import cached_probe, clear_cache, parse_wav_header, probe
+
+
+def _write_wav(path, seconds=1.5, rate=16000, channels=2):
+    with wave.open(path, 'w') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(struct.pack('<h', 0) * int(seconds * rate) * channels)
+
+
+def test_wav_header_duration():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'a.wav')
+        _write_wav(path)
+        info = parse_wav_header(path)
+        assert info is not None
+        assert abs(info['duration'] - 1.5) < 1e-6
+        assert info['sample_rate'] == 16000
+        assert info['channels'] == 2
+        assert info['audio_codec'] == 'pcm_s16le'
+
+
+def test_streamed_wav_placeholder_size_uses_file_size():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'b.wav')
+        _write_wav(path, seconds=2.0, rate=8000, channels=1)
+        with open(path, 'r+b') as f:
+            data = f.read()
+            pos = data.index(b'data') + 4
+            f.seek(pos)
+            f.write(struct.pack('<I', 0xFFFFFFFF))
+        assert abs(parse_wav_header(path)['duration'] - 2.0) < 1e-6
+
+
+def test_probe_cache_invalidates_on_change():
+    clear_cache()
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'c.wav')
+        _write_wav(path, seconds=1.0)
+        assert abs(probe(path)['duration'] - 1.0) < 1e-6
+        _write_wav(path, seconds=3.0)
+        assert abs(probe(path)['duration'] - 3.0) < 1e-6
+
+
+
+def test_cached_probe_only_reads_the_cache():
+    clear_cache()
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'c.wav')
+        _write_wav(path, seconds=1.0)
+        assert cached_probe(path) is None
+        probe(path)
+        assert abs(cached_probe(path)['duration'] - 1.0) < 1e-6
+        assert cached_probe(os.path.join(d, 'missing.mp4')) is None
+
+def test_non_wav_is_rejected_by_header_parser():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'd.wav')
+        with open(path, 'wb') as f:
+            f.write(b'RIFF\x24\x00\x00\x00WAVEfmt ')
+        assert parse_wav_header(path) is None
+
+
+def test_ffprobe_runs_supervised_with_a_deadline(monkeypatch, tmp_path):
+    calls = []
+    report = {'format': {'format_name': 'mov,mp4', 'duration': '4.5'},
+              'streams': [{'codec_type': 'video', 'codec_name': 'h264', 'width': 1080, 'height': 1920}]}
+
+    def fake_run(cmd, **kwargs):
+        calls.append(kwargs)
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(report), stderr='')
+
+    monkeypatch.setattr(media_probe, 'run_ffmpeg', fake_run)
+    clear_cache()
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(b'not a wav')
+    info = probe(str(path), job_id='job-1')
+    assert info['duration'] == 4.5 and info['height'] == 1920
+    assert calls == [{'job_id': 'job-1', 'stage': 'probe', 'check': False, 'capture_stdout': True,
+                      'timeout': media_probe.settings.FFPROBE_TIMEOUT_SEC}]
+
+    def hung(cmd, **kwargs):
+        raise subprocess.TimeoutExpired(cmd, kwargs['timeout'])
+
+    monkeypatch.setattr(media_probe, 'run_ffmpeg', hung)
+    path.write_bytes(b'changed')
+    with pytest.raises(RuntimeError, match='timed out'):
+        probe(str(path))
@@ -0,0 +1,69 @@
+"""Music index math (NumPy beat grid, static gain, start offset) and the ingest's canonical copy."""
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+
+import Agents.musicLibrary as ml
+
+FFMPEG = os.getenv('FFMPEG_PATH') or shutil.which('ffmpeg')
+
+
+def test_numpy_beat_grid_finds_click_tempo(monkeypatch):
+    monkeypatch.setattr(ml, 'librosa', None)
+    sr = ml.ANALYSIS_RATE
+    samples = np.zeros(sr * 20)
+    for k in range(40):  # 120 BPM clicks starting at 0.25 s
+        i = int((0.25 + k * 0.5) * sr)
+        samples[i:i + int(0.05 * sr)] = 16000
+    grid = ml.beat_grid(samples, sr)
+    assert abs(grid['bpm'] - 120) < 3
+    assert min(abs(b - 10.25) for b in grid['beats']) < 0.06
+
+
+def test_gain_is_capped_by_peak_and_start_skips_intro(monkeypatch):
+    monkeypatch.setattr(ml.settings, 'MUSIC_TARGET_LUFS', -28.0)
+    assert ml.static_gain_db({'lufs': -14.0, 'peak_db': -1.0}) == -14.0
+    assert ml.static_gain_db({'lufs': -40.0, 'peak_db': -6.0}) == 5.0
+    entry = {'duration': 30.0, 'envelope_hop_sec': 0.5, 'envelope_db': [-60.0] * 8 + [-6.0] * 52,
+             'beats': [3.9, 4.4, 4.9]}
+    assert ml.pick_start(entry, 10.0) == 3.9
+    # Too little track left after the intro: start early enough to cover the video
+    assert ml.pick_start({**entry, 'beats': []}, 28.0) == 2.0
+
+
+@pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+def test_ingest_writes_trimmed_48k_stereo_copy_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(ml, 'librosa', None)
+    monkeypatch.setattr(ml.settings, 'FFMPEG_PATH', FFMPEG)
+    monkeypatch.setattr(ml.settings, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(ml.settings, 'MUSIC_MAX_SEC', 3.0)
+    os.makedirs(tmp_path / 'cache')
+    upload = str(tmp_path / 'track.mp3')
+    subprocess.run([FFMPEG, '-y', '-v', 'error', '-f', 'lavfi', '-i', 'sine=frequency=220:duration=5:sample_rate=22050',
+                    '-ac', '1', upload], check=True)
+    decodes = []
+    real_run = ml.run_ffmpeg
+
+    def spy(cmd, **kwargs):
+        decodes.append(cmd)
+        return real_run(cmd, **kwargs)
+
+    monkeypatch.setattr(ml, 'run_ffmpeg', spy)
+    entry = ml.index_track(upload)
+    assert entry['canonical'] == str(tmp_path / 'track.mix.flac') and os.path.isfile(upload)
+    assert abs(entry['duration'] - 3.0) < 0.05
+
+    pcm = str(tmp_path / 'canonical.wav')
+    subprocess.run([FFMPEG, '-y', '-v', 'error', '-i', entry['canonical'], '-c:a', 'pcm_s16le', pcm], check=True)
+    with wave.open(pcm, 'rb') as wav:
+        assert (wav.getframerate(), wav.getnchannels()) == (48000, 2)
+        assert abs(wav.getnframes() / 48000 - 3.0) < 0.05
+
+    # Repeat uses read the index and mix from the canonical copy: no further decode
+    params = ml.mix_params(upload, 2.0)
+    assert params['source'] == entry['canonical']
+    assert len(decodes) == 1
@@ -0,0 +1,71 @@
+"""Per-key token buckets: burst up to capacity, penalized keys are skipped, TTS workers fan out over keys and give up in time."""
+import time
+
+import Agents.voiceGeneration as vg
+from utils.rate_limit import KeyPool, TokenBucket
+
+
+def test_bucket_allows_burst_then_blocks():
+    bucket = TokenBucket(rate_per_sec=0.01, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    assert bucket.wait_time() > 50
+    assert not bucket.acquire(timeout=0.02)
+
+
+def test_pool_round_robins_and_skips_penalized_key():
+    pool = KeyPool(['test-a', 'test-b'], rate_per_sec=0.01, capacity=2, namespace='test-pool')
+    assert [pool.acquire()[1] for _ in range(2)] == ['test-a', 'test-b']
+    pool.penalize(0, 60)
+    assert pool.acquire(timeout=0.05) == (1, 'test-b')
+    assert pool.acquire(timeout=0.05) is None
+
+
+class _Throttled(Exception):
+    status_code = 429
+
+
+def test_tts_worker_gives_up_when_no_key_recovers(monkeypatch, tmp_path):
+    class Speech:
+        def create(self, **kwargs):
+            raise _Throttled('rate limit')
+
+    monkeypatch.setenv('GROQ_API_KEY1', 'test-tts-key')
+    monkeypatch.setenv('VOICEGEN_DISABLE_TORCH', '1')
+    monkeypatch.setattr(vg, 'Groq', lambda api_key: type('Client', (), {'audio': type('Audio', (), {'speech': Speech()})()})())
+    monkeypatch.setattr(vg.settings, 'TTS_CACHE_ENABLED', False)
+    monkeypatch.setattr(vg.settings, 'TTS_RATE_LIMIT_BACKOFF_SEC', 60.0)
+    monkeypatch.setattr(vg.settings, 'TTS_KEY_WAIT_SEC', 0.3)
+    generator = vg.VoiceGenerator(output_folder=str(tmp_path))
+    t0 = time.monotonic()
+    assert generator._generate_concurrent(['one', 'two'], 'voicescript', None) == [None, None]
+    assert time.monotonic() - t0 < 5
+
+
+def test_tts_lines_run_in_parallel_across_keys(monkeypatch, tmp_path):
+    used = []
+
+    def client(api_key):
+        class Speech:
+            def create(self, input, **kwargs):
+                used.append(api_key)
+                time.sleep(0.2)
+                return type('Response', (), {'read': lambda self: input.encode('utf-8')})()
+        return type('Client', (), {'audio': type('Audio', (), {'speech': Speech()})()})()
+
+    for i, key in enumerate(['test-par-a', 'test-par-b', 'test-par-c'], 1):
+        monkeypatch.setenv(f'GROQ_API_KEY{i}', key)
+    monkeypatch.setenv('VOICEGEN_DISABLE_TORCH', '1')
+    monkeypatch.setattr(vg, 'Groq', client)
+    monkeypatch.setattr(vg.settings, 'TTS_CACHE_ENABLED', False)
+    monkeypatch.setattr(vg.settings, 'TTS_RPM_PER_KEY', 60)
+    monkeypatch.setattr(vg.settings, 'TTS_MAX_PARALLEL', 6)
+    generator = vg.VoiceGenerator(output_folder=str(tmp_path))
+    sentences = [f'line {n}' for n in range(1, 7)]
+    t0 = time.monotonic()
+    paths = generator._generate_concurrent(sentences, 'voicescript', None)
+    elapsed = time.monotonic() - t0
+    assert paths == [str(tmp_path / f'voicescript{n}.wav') for n in range(1, 7)]
+    assert [open(p, encoding='utf-8').read() for p in paths] == sentences
+    assert sorted(set(used)) == ['test-par-a', 'test-par-b', 'test-par-c'] and len(used) == 6
+    # Six 0.2 s requests back to back would take 1.2 s
+    assert elapsed < 0.6
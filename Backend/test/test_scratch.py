@@ -0,0 +1,25 @@
+"""Scratch space budget, spill and cleanup (uses tmp_path as the RAM root)."""
+import os
+
+from Config.settings import settings
+from utils.scratch import ScratchSpace
+
+
+def test_spills_to_disk_past_budget_and_cleans_up(tmp_path, monkeypatch):
+    ram, disk = tmp_path / 'ram', tmp_path / 'disk'
+    ram.mkdir()
+    monkeypatch.setattr(settings, 'SCRATCH_RAM_DIR', str(ram))
+    monkeypatch.setattr(settings, 'SCRATCH_DISK_DIR', str(disk))
+    scratch = ScratchSpace('job1', 'test', budget_bytes=1000)
+    first = scratch.path('a.bin', estimate=600)
+    with open(first, 'wb') as f:
+        f.write(b'x' * 600)
+    second = scratch.path('b.bin', estimate=600)
+    assert first.startswith(str(ram)) and second.startswith(str(disk))
+    assert scratch.path('a.bin') == first
+    usage = scratch.usage()
+    assert usage['ram_files'] == 1 and usage['spilled_files'] == 1
+    assert usage['peak_ram_bytes'] == 600
+    scratch.cleanup()
+    assert not os.listdir(ram)
+    assert not os.path.exists(os.path.dirname(second))
@@ -0,0 +1,83 @@
+"""Music and caption stages pick up the edit of their own render tier (draft edit -> draft captions; need ffmpeg)."""
+import os
+import shutil
+import subprocess
+
+import pytest
+from PIL import Image
+
+import Agents.captionAgent as ca
+import Agents.editAgent as ea
+import jobs.job_utils as job_utils
+import Services.BgMusicGenService as music_service
+import Services.CaptionGenService as caption_service
+from Services.EditAgentService import EditAgentService
+from jobs.workspace import stage_dirs
+from utils.exceptions import CaptionError, MusicError
+
+FFMPEG = os.getenv('FFMPEG_PATH') or shutil.which('ffmpeg')
+SRT = "1\n00:00:00,100 --> 00:00:00,600\nHello\n"
+
+
+@pytest.fixture
+def job(monkeypatch, tmp_path):
+    monkeypatch.setattr(job_utils, 'JOBS_ROOT', str(tmp_path / 'jobs'))
+    return 'job-1'
+
+
+@pytest.mark.skipif(not FFMPEG, reason='ffmpeg not available')
+def test_draft_captions_use_the_draft_edit(job, monkeypatch, tmp_path):
+    monkeypatch.setattr(ea.settings, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(ea.settings, 'FFMPEG_PATH', FFMPEG)
+    monkeypatch.setattr(ea.settings, 'FFPROBE_PATH', FFMPEG)
+    monkeypatch.setattr(ea.settings, 'BRAND_INTRO_PATH', None)
+    monkeypatch.setattr(ea.settings, 'BRAND_OUTRO_PATH', None)
+    monkeypatch.setattr(ea.settings, 'CAPTIONS_ALIGN', False)
+    dirs = stage_dirs(job)
+    Image.new('RGB', (64, 40), 'red').save(os.path.join(dirs['images'], 'image_1.png'))
+    subprocess.run([FFMPEG, '-y', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=1', '-ar', '16000',
+                    os.path.join(dirs['voices'], 'voicescript1.wav')], check=True)
+    # An older final render of the same job must not be captioned for a draft request
+    stale = os.path.join(dirs['output'], 'youtube_shorts.mp4')
+    open(stale, 'wb').close()
+
+    draft = EditAgentService(job_id=job, render_mode='graph', render_tier='draft')
+    assert os.path.basename(draft) == 'youtube_shorts_draft.mp4'
+
+    def fake_caption_audio(audio_path, output_path, **kwargs):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(SRT)
+        return output_path
+
+    monkeypatch.setattr(ca, 'caption_audio', fake_caption_audio)
+    captioned = []
+    real = caption_service.transcribe_and_caption
+
+    def spy(video_path, **kwargs):
+        captioned.append(video_path)
+        return real(video_path, **kwargs)
+
+    monkeypatch.setattr(caption_service, 'transcribe_and_caption', spy)
+    result = caption_service.CaptionGenService(job_id=job, render_tier='draft', caption_mode='soft')
+    assert captioned == [draft] and os.path.isfile(result)
+
+
+def test_stages_fall_back_to_final_and_fail_without_an_edit(job, monkeypatch):
+    output_dir = stage_dirs(job)['output']
+    with pytest.raises(CaptionError, match='run the edit stage first'):
+        caption_service.CaptionGenService(job_id=job, render_tier='draft')
+    with pytest.raises(MusicError, match='run the edit stage first'):
+        music_service.BgMusicGenService('track.mp3', job_id=job, render_tier='draft')
+
+    mixed = []
+    monkeypatch.setattr(music_service.VideoMusicSynchronizer, 'sync_music_to_video', lambda self, video, out: mixed.append((video, out)) or out)
+    final = os.path.join(output_dir, 'standard_video.mp4')
+    open(final, 'wb').close()
+    music_service.BgMusicGenService('track.mp3', job_id=job, render_tier='preview')
+    preview = os.path.join(output_dir, 'youtube_shorts_preview.mp4')
+    open(preview, 'wb').close()
+    music_service.BgMusicGenService('track.mp3', job_id=job, render_tier='preview')
+    assert mixed == [
+        (final, os.path.join(output_dir, 'standard_video_with_music.mp4')),
+        (preview, os.path.join(output_dir, 'youtube_shorts_with_music_preview.mp4')),
+    ]
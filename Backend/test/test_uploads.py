@@ -0,0 +1,47 @@
+"""Streaming uploads: limit enforced mid-stream, identical content stored once and reference counted."""
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+
+from utils.exceptions import UploadTooLargeError
+from utils.uploads import BlobStore, stream_to_file
+
+
+def _upload(data, name='track.mp3'):
+    return UploadFile(file=io.BytesIO(data), filename=name)
+
+
+def test_limit_rejects_while_streaming(tmp_path):
+    dest = tmp_path / 'big.bin'
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(stream_to_file(_upload(b'x' * 5000), str(dest), max_bytes=4096, chunk_size=1024))
+    assert os.listdir(tmp_path) == []
+
+
+def test_identical_uploads_share_one_blob(tmp_path):
+    store = BlobStore(str(tmp_path), prefix='bgmusic_')
+    a = asyncio.run(store.add(_upload(b'same bytes'), max_bytes=1024, owner='alice'))
+    b = asyncio.run(store.add(_upload(b'same bytes', 'copy.MP3'), max_bytes=1024, owner='bob'))
+    c = asyncio.run(store.add(_upload(b'other bytes'), max_bytes=1024, owner='alice'))
+    assert a.path == b.path and b.deduplicated and not a.deduplicated
+    assert a.path.endswith('.mp3') and c.path != a.path
+    assert store.release(a.path, a.ref, owner='alice') and os.path.exists(a.path)
+    assert store.release(b.path, b.ref, owner='bob') and not os.path.exists(a.path)
+    assert not store.release(a.path, a.ref, owner='alice')
+
+
+def test_release_is_scoped_to_the_callers_reference(tmp_path):
+    store = BlobStore(str(tmp_path), prefix='bgmusic_')
+    a = asyncio.run(store.add(_upload(b'shared track'), max_bytes=1024, owner='alice'))
+    b = asyncio.run(store.add(_upload(b'shared track'), max_bytes=1024, owner='bob'))
+    # Another user's reference, a missing reference or an anonymous caller cannot release it
+    assert not store.release(a.path, a.ref, owner='bob')
+    assert not store.release(a.path, None, owner='alice')
+    assert not store.release(a.path, a.ref)
+    assert not store.release(a.path, 'guessed', owner='alice')
+    assert store.release(a.path, a.ref, owner='alice') and os.path.exists(a.path)
+    # alice's reference is spent; bob still holds the file
+    assert not store.release(a.path, a.ref, owner='alice') and os.path.exists(b.path)
@@ -0,0 +1,36 @@
+"""TTS clip cache: repeated lines synthesized once, later runs served from the cache."""
+import os
+
+import Agents.voiceGeneration as vg
+
+
+class _Speech:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def create(self, model, voice, input, response_format):
+        self.calls.append(input)
+        data = input.encode()
+        return type('Response', (), {'read': lambda self: data})()
+
+
+def _generator(monkeypatch, tmp_path, calls):
+    monkeypatch.setenv('GROQ_API_KEY1', 'test-key')
+    monkeypatch.setenv('VOICEGEN_DISABLE_TORCH', '1')
+    monkeypatch.setattr(vg, 'Groq', lambda api_key: type('Client', (), {'audio': type('Audio', (), {'speech': _Speech(calls)})()})())
+    return vg.VoiceGenerator(output_folder=str(tmp_path / 'voices'))
+
+
+def test_repeated_and_cached_lines_skip_the_provider(monkeypatch, tmp_path):
+    monkeypatch.setattr(vg.settings, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(vg.settings, 'TTS_CACHE_ENABLED', True)
+    monkeypatch.setattr(vg, '_clip_cache', None)
+    calls = []
+    sentences = ['Like and  subscribe!', 'Top five aliens.', 'Like and subscribe!']
+    paths = _generator(monkeypatch, tmp_path, calls).generate_voice_files(sentences, concurrent=False)
+    assert [os.path.basename(p) for p in paths] == ['voicescript1.wav', 'voicescript2.wav', 'voicescript3.wav']
+    assert calls == ['Like and  subscribe!', 'Top five aliens.']
+
+    calls.clear()
+    again = _generator(monkeypatch, tmp_path, calls).generate_multiple_voices(['Like and subscribe!'], concurrent=False)
+    assert calls == [] and open(again['Like and subscribe!'], 'rb').read() == b'Like and  subscribe!'
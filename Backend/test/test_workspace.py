@@ -0,0 +1,17 @@
+"""Stage file order shared by the editor and the controller: script index first, not creation time."""
+import os
+
+from jobs.workspace import stage_order
+
+
+def test_stage_order_follows_the_index(tmp_path):
+    for name in ['image_10.png', 'image_2.png', 'image_1.png', 'cover.png']:
+        (tmp_path / name).write_bytes(b'')
+    # Replaced after the others: must keep its slot
+    os.remove(tmp_path / 'image_2.png')
+    (tmp_path / 'image_2.png').write_bytes(b'new')
+    names = sorted(os.listdir(tmp_path), key=stage_order(str(tmp_path)))
+    assert names == ['image_1.png', 'image_2.png', 'image_10.png', 'cover.png']
+    # Full paths sort the same way (controller listings)
+    paths = sorted((str(tmp_path / n) for n in names[::-1]), key=stage_order(str(tmp_path)))
+    assert [os.path.basename(p) for p in paths] == names
@@ -0,0 +1,170 @@
+"""Content-addressed on-disk cache with size-bounded LRU eviction.
+
+Entries are plain files stored as <root>/<key[:2]>/<key><suffix>. Recency is
+tracked through the file mtime (touched on every hit) so the cache survives
+restarts and can be shared by several processes; writes land via atomic rename.
+
+The total size is kept as a running figure, so a write only walks the tree when
+the budget is exceeded or the figure is older than RESYNC_SEC (to pick up
+writes and deletions by other processes).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any
+
+from utils.logging_utils import log_event
+
+RESYNC_SEC = 300.0
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """sha256 of a file's bytes (streamed)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(*parts: Any) -> str:
+    """Stable sha256 key over arbitrary repr-able parts."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(repr(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def link_or_copy(src: str, dest: str) -> None:
+    """Materialize src at dest via hardlink, falling back to a copy across devices."""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+class DiskLRUCache:
+    def __init__(self, root: str, max_bytes: int, name: str = 'cache'):
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._size: int | None = None  # running total; None = walk on next write
+        self._synced = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str, suffix: str = '') -> str:
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    def get(self, key: str, suffix: str = '') -> str | None:
+        """Return the cached file path for key (refreshing its recency) or None."""
+        path = self._path(key, suffix)
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, src_path: str, suffix: str = '', move: bool = False) -> str:
+        """Store src_path under key and return the cached path; evicts if over budget."""
+        path = self._path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        if move:
+            shutil.move(src_path, tmp)
+        else:
+            shutil.copyfile(src_path, tmp)
+        self._commit(tmp, path)
+        return path
+
+    def put_bytes(self, key: str, data: bytes, suffix: str = '') -> str:
+        path = self._path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        self._commit(tmp, path)
+        return path
+
+    def _commit(self, tmp: str, path: str) -> None:
+        """Rename tmp into place, account for its size and evict only when over budget."""
+        added = os.path.getsize(tmp)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+        with self._lock:
+            stale = self._size is None or time.monotonic() - self._synced > RESYNC_SEC
+            if not stale:
+                self._size += added - replaced
+            over = stale or self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for dirpath, _dirs, files in os.walk(self.root):
+            for fname in files:
+                if fname.endswith('.tmp'):
+                    continue
+                fpath = os.path.join(dirpath, fname)
+                try:
+                    st = os.stat(fpath)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, fpath))
+        return entries
+
+    def size_bytes(self) -> int:
+        return sum(size for _mtime, size, _path in self._entries())
+
+    def evict(self) -> int:
+        """Drop least-recently-used entries until the cache fits max_bytes (walks the tree)."""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _mtime, size, _path in entries)
+            removed = 0
+            self._size, self._synced = total, time.monotonic()
+            if total <= self.max_bytes:
+                return 0
+            for _mtime, size, fpath in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(fpath)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            self._size = total
+            self.evictions += removed
+            return removed
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'cache': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+        }
+
+    def log_stats(self, job_id: str | None, stage: str) -> None:
+        log_event(job_id, stage, 'cache_stats', **self.stats())
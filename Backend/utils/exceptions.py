@@ -24,3 +24,9 @@ class CaptionError(PipelineError):
 
 class JobNotFoundError(PipelineError):
     pass
+
+class UploadError(PipelineError):
+    pass
+
+class UploadTooLargeError(UploadError):
+    pass
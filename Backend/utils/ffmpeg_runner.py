@@ -0,0 +1,379 @@
+"""Supervised ffmpeg execution with live progress reporting.
+
+Every ffmpeg call runs as an asyncio subprocess (`run_ffmpeg_async`); sync
+code uses `run_ffmpeg`, which hands the coroutine to a shared background
+event loop so the API loop is never blocked by a render. The supervisor:
+
+- enforces a per-command deadline (FFMPEG_TIMEOUT_SEC) and raises
+  subprocess.TimeoutExpired once the process tree is killed,
+- kills the process group on cancellation (task cancel or `cancel_job`),
+- starts ffmpeg under nice/ionice so background renders don't starve the API,
+- keeps the last stderr lines for error messages.
+
+ffprobe and other tools whose stdout is the result run as given with
+`capture_stdout=True`. Encodes are launched with `-progress pipe:1 -nostats`; the key=value blocks
+ffmpeg writes to stdout are parsed into percent complete, encode speed
+(x realtime) and ETA. Updates are throttled and emitted both as `progress`
+log events and into the job manifest (manifest['progress'][stage]) so the
+frontend can poll them.
+
+A StageProgress aggregates several ffmpeg calls (e.g. one per segment, possibly
+running in parallel) into a single stage-level figure.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Optional
+
+from Config.settings import settings
+from jobs.job_utils import update_progress
+from utils.logging_utils import log_event
+
+STDERR_TAIL_LINES = 40
+
+_tokens = itertools.count(1)
+
+
+def _parse_time(value: str) -> Optional[float]:
+    """out_time_us / out_time_ms are both microseconds (ffmpeg quirk); 'N/A' early on."""
+    try:
+        us = int(value)
+    except (TypeError, ValueError):
+        return None
+    return us / 1_000_000 if us >= 0 else None
+
+
+def _parse_speed(value: str) -> Optional[float]:
+    try:
+        return float(value.strip().rstrip('x'))
+    except (AttributeError, ValueError):
+        return None
+
+
+class StageProgress:
+    """Media-time progress of one stage, possibly spread across several ffmpeg calls."""
+
+    def __init__(self, job_id: str | None, stage: str, total_seconds: float | None, min_interval: float = 1.0):
+        self.job_id = job_id
+        self.stage = stage
+        self.total = float(total_seconds) if total_seconds else None
+        self.min_interval = min_interval
+        self.started = time.monotonic()
+        self._done = 0.0
+        self._running: Dict[int, float] = {}
+        self._last_emit = 0.0
+        self._last_speed: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, token: int, out_seconds: float | None, speed: float | None) -> None:
+        with self._lock:
+            if out_seconds is not None:
+                self._running[token] = out_seconds
+            if speed is not None:
+                self._last_speed = speed
+            now = time.monotonic()
+            if now - self._last_emit < self.min_interval:
+                return
+            self._last_emit = now
+            snapshot = self._snapshot(now)
+        self._emit(snapshot)
+
+    def credit(self, seconds: float) -> None:
+        """Count work that needed no encode (cache hits, reused nodes) as done."""
+        with self._lock:
+            self._done += seconds
+
+    def finish(self, token: int, seconds: float | None = None) -> None:
+        """Close out one call; `seconds` is its media duration (defaults to last reported time)."""
+        with self._lock:
+            last = self._running.pop(token, 0.0)
+            self._done += seconds if seconds is not None else last
+
+    def complete(self) -> None:
+        with self._lock:
+            self._running.clear()
+            if self.total:
+                self._done = max(self._done, self.total)
+            snapshot = self._snapshot(time.monotonic())
+        snapshot['percent'] = 100.0
+        snapshot['eta_sec'] = 0.0
+        self._emit(snapshot)
+
+    def _snapshot(self, now: float) -> Dict[str, Any]:
+        processed = self._done + sum(self._running.values())
+        elapsed = max(now - self.started, 1e-6)
+        # Stage speed over wall-clock time covers parallel calls; ffmpeg's own figure is per call
+        speed = processed / elapsed if processed else None
+        percent = eta = None
+        if self.total:
+            percent = min(100.0, processed / self.total * 100.0)
+            if speed:
+                eta = max(0.0, (self.total - processed) / speed)
+        return {
+            'percent': round(percent, 1) if percent is not None else None,
+            'processed_sec': round(processed, 2),
+            'total_sec': round(self.total, 2) if self.total else None,
+            'speed': round(speed, 2) if speed else None,
+            'ffmpeg_speed': self._last_speed,
+            'eta_sec': round(eta, 1) if eta is not None else None,
+            'elapsed_sec': round(elapsed, 1),
+        }
+
+    def _emit(self, snapshot: Dict[str, Any]) -> None:
+        log_event(self.job_id, self.stage, 'progress', **snapshot)
+        if self.job_id:
+            try:
+                update_progress(self.job_id, self.stage, **snapshot)
+            except Exception:
+                pass  # progress is best effort; never fail a render over it
+
+
+def with_progress_args(cmd: list[str]) -> list[str]:
+    """Insert `-progress pipe:1 -nostats` right after the ffmpeg binary."""
+    return [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+
+
+_KILL_GRACE_SEC = 3.0
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+_running: Dict[str | None, set] = {}
+_running_lock = threading.Lock()
+_priority_prefix: list[str] | None = None
+
+
+def priority_prefix() -> list[str]:
+    """`nice` / `ionice` wrapper for the configured niceness (empty where unsupported)."""
+    global _priority_prefix
+    if _priority_prefix is None:
+        prefix: list[str] = []
+        if os.name == 'posix':
+            if settings.FFMPEG_NICE > 0 and shutil.which('nice'):
+                prefix += ['nice', '-n', str(settings.FFMPEG_NICE)]
+            if settings.FFMPEG_IONICE_CLASS and shutil.which('ionice'):
+                prefix += ['ionice', '-c', str(settings.FFMPEG_IONICE_CLASS)]
+                if settings.FFMPEG_IONICE_CLASS == 2:
+                    prefix += ['-n', '7']
+        _priority_prefix = prefix
+    return _priority_prefix
+
+
+async def _kill_tree(proc: asyncio.subprocess.Process) -> None:
+    """SIGTERM the process group, SIGKILL it if it is still alive after a grace period."""
+    if proc.returncode is not None:
+        return
+    use_group = os.name == 'posix' and hasattr(os, 'killpg')
+    try:
+        if use_group:
+            os.killpg(proc.pid, signal.SIGTERM)
+        else:
+            proc.terminate()
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(proc.wait(), _KILL_GRACE_SEC)
+        return
+    except asyncio.TimeoutError:
+        pass
+    try:
+        if use_group:
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:
+        pass
+    await proc.wait()
+
+
+def _register(job_id: str | None, task: asyncio.Task) -> None:
+    with _running_lock:
+        _running.setdefault(job_id, set()).add(task)
+
+
+def _unregister(job_id: str | None, task: asyncio.Task) -> None:
+    with _running_lock:
+        tasks = _running.get(job_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                _running.pop(job_id, None)
+
+
+def cancel_job(job_id: str) -> int:
+    """Cancel every supervised ffmpeg run of a job (their process trees get killed); returns the count."""
+    with _running_lock:
+        tasks = list(_running.get(job_id, ()))
+    for task in tasks:
+        task.get_loop().call_soon_threadsafe(task.cancel)
+    if tasks:
+        log_event(job_id, 'ffmpeg', 'cancel_requested', running=len(tasks))
+    return len(tasks)
+
+
+async def run_ffmpeg_async(
+    cmd: list[str],
+    job_id: str | None = None,
+    stage: str = 'ffmpeg',
+    duration: float | None = None,
+    progress: StageProgress | None = None,
+    input: bytes | Iterable[bytes] | None = None,
+    check: bool = True,
+    report: bool = True,
+    timeout: float | None = None,
+    capture_stdout: bool = False,
+) -> subprocess.CompletedProcess:
+    """Run an ffmpeg command under supervision, reporting progress while it encodes.
+
+    `duration` is the expected output media length (for percent/ETA) when no
+    shared `progress` is given. `input` is written to stdin (bytes or an
+    iterable of chunks, e.g. raw frames, pulled off the event loop).
+    `report=False` skips progress for quick stream copies inside a larger
+    stage. `timeout` defaults to FFMPEG_TIMEOUT_SEC (0 disables it).
+    `capture_stdout` runs cmd unmodified without progress (e.g. ffprobe) and
+    returns its decoded stdout.
+
+    Returns a CompletedProcess whose stderr holds the last lines ffmpeg
+    logged; raises CalledProcessError on a non-zero exit when `check` is set
+    and subprocess.TimeoutExpired when the deadline passes.
+    """
+    report = report and not capture_stdout
+    own_progress = report and progress is None
+    if own_progress:
+        progress = StageProgress(job_id, stage, duration)
+    elif not report:
+        progress = None
+    if timeout is None:
+        timeout = settings.FFMPEG_TIMEOUT_SEC
+    timeout = timeout or None
+    token = next(_tokens)
+    if capture_stdout:
+        full_cmd = list(cmd)
+    else:
+        full_cmd = with_progress_args(cmd) if progress is not None else [cmd[0], '-nostats', *cmd[1:]]
+    proc = await asyncio.create_subprocess_exec(
+        *priority_prefix(), *full_cmd,
+        stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=os.name == 'posix',
+    )
+    task = asyncio.current_task()
+    _register(job_id, task)
+    tail: deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+    last_time: list[Optional[float]] = [None]
+    stdout_chunks: list[bytes] = []
+
+    async def _read_progress() -> None:
+        if capture_stdout:
+            stdout_chunks.append(await proc.stdout.read())
+            return
+        block: Dict[str, str] = {}
+        async for raw in proc.stdout:
+            key, _, value = raw.decode('utf-8', 'replace').strip().partition('=')
+            if key != 'progress':
+                block[key] = value
+                continue
+            out_seconds = _parse_time(block.get('out_time_us') or block.get('out_time_ms'))
+            if out_seconds is not None:
+                last_time[0] = out_seconds
+            if progress is not None:
+                progress.update(token, out_seconds, _parse_speed(block.get('speed')))
+            block = {}
+
+    async def _read_stderr() -> None:
+        async for raw in proc.stderr:
+            tail.append(raw.decode('utf-8', 'replace').rstrip())
+
+    async def _write_input() -> None:
+        try:
+            if isinstance(input, (bytes, bytearray, memoryview)):
+                proc.stdin.write(input)
+                await proc.stdin.drain()
+            else:
+                loop = asyncio.get_running_loop()
+                chunks = iter(input)
+                while True:
+                    # Producers (e.g. the frame synthesizer) are CPU-bound; keep them off the loop
+                    chunk = await loop.run_in_executor(None, next, chunks, None)
+                    if chunk is None:
+                        break
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+            proc.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # encoder died; its return code carries the failure
+
+    async def _drive() -> int:
+        if input is not None:
+            await _write_input()
+        rc = await proc.wait()
+        await asyncio.gather(readers, return_exceptions=True)
+        return rc
+
+    readers = asyncio.gather(_read_progress(), _read_stderr())
+    try:
+        rc = await asyncio.wait_for(_drive(), timeout)
+    except asyncio.TimeoutError:
+        await _kill_tree(proc)
+        log_event(job_id, stage, 'ffmpeg_timeout', timeout_sec=timeout, stderr='\n'.join(tail)[-400:])
+        raise subprocess.TimeoutExpired(cmd[:8], timeout, stderr='\n'.join(tail))
+    except asyncio.CancelledError:
+        await _kill_tree(proc)
+        log_event(job_id, stage, 'ffmpeg_cancelled')
+        raise
+    finally:
+        _unregister(job_id, task)
+        if not readers.done():
+            readers.cancel()
+    if progress is not None:
+        progress.finish(token, last_time[0])
+    if own_progress and rc == 0:
+        progress.complete()
+    stderr_tail = '\n'.join(tail)
+    if rc != 0:
+        log_event(job_id, stage, 'ffmpeg_failed', returncode=rc, stderr=stderr_tail[-400:])
+        if check:
+            raise subprocess.CalledProcessError(rc, cmd[:8], stderr=stderr_tail)
+    stdout = b''.join(stdout_chunks).decode('utf-8', 'replace') if capture_stdout else None
+    return subprocess.CompletedProcess(full_cmd, rc, stdout=stdout, stderr=stderr_tail)
+
+
+def _supervisor_loop() -> asyncio.AbstractEventLoop:
+    """Shared background event loop that runs supervised ffmpeg calls for sync callers."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='ffmpeg-supervisor', daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def run_ffmpeg(cmd: list[str], **kwargs: Any) -> subprocess.CompletedProcess:
+    """Blocking bridge to run_ffmpeg_async (same arguments) for sync code and worker threads.
+
+    Must not be called from a coroutine; use `await run_ffmpeg_async(...)` there.
+    """
+    loop = _supervisor_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_ffmpeg called on the supervisor loop; await run_ffmpeg_async instead")
+    fut = asyncio.run_coroutine_threadsafe(run_ffmpeg_async(cmd, **kwargs), loop)
+    try:
+        return fut.result()
+    except BaseException:
+        # Caller interrupted: make sure the ffmpeg tree does not outlive it
+        if not fut.done():
+            fut.cancel()
+        raise
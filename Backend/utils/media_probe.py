@@ -0,0 +1,198 @@
+"""Shared media probing with a process-wide cache.
+
+WAV/RIFF files are probed by reading their header chunks directly (no decode,
+no subprocess). Everything else goes through a single ffprobe JSON call that
+collects duration, sample rate, dimensions and codecs at once; it runs under the
+ffmpeg supervisor (utils/ffmpeg_runner) with FFPROBE_TIMEOUT_SEC, niceness and
+job cancellation. Results are cached keyed by (path, size, mtime) so repeated
+probes of unchanged files are free.
+"""
+from __future__ import annotations
+
+import json
+import os
+import struct
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+from Config.settings import settings
+from utils.ffmpeg_runner import run_ffmpeg
+from utils.logging_utils import log_event
+
+_CACHE_MAX = 2048
+_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# WAVE_FORMAT tags we can describe without ffprobe
+_WAV_CODECS = {1: 'pcm_s', 3: 'pcm_f', 6: 'pcm_alaw', 7: 'pcm_mulaw', 0xFFFE: 'pcm_ext'}
+
+
+def _cache_key(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+def parse_wav_header(path: str) -> Optional[Dict[str, Any]]:
+    """Read duration/format from a RIFF/WAVE header; None if not a parseable WAV."""
+    try:
+        file_size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+                return None
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    body = f.read(chunk_size)
+                    if len(body) < 16:
+                        return None
+                    tag, channels, sample_rate, byte_rate, block_align, bits = struct.unpack('<HHIIHH', body[:16])
+                    fmt = {'tag': tag, 'channels': channels, 'sample_rate': sample_rate,
+                           'byte_rate': byte_rate, 'block_align': block_align, 'bits': bits}
+                    if chunk_size % 2:
+                        f.read(1)
+                elif chunk_id == b'data':
+                    if fmt is None or not fmt['byte_rate']:
+                        return None
+                    # Streamed writers leave 0 / 0xFFFFFFFF placeholders; trust the file size then
+                    available = file_size - f.tell()
+                    data_size = chunk_size if 0 < chunk_size <= available else available
+                    codec = _WAV_CODECS.get(fmt['tag'], f"wav_0x{fmt['tag']:04x}")
+                    if codec in ('pcm_s', 'pcm_f'):
+                        codec = f"{codec}{fmt['bits']}le"
+                    return {
+                        'format': 'wav',
+                        'duration': data_size / fmt['byte_rate'],
+                        'sample_rate': fmt['sample_rate'],
+                        'channels': fmt['channels'],
+                        'audio_codec': codec,
+                        'video_codec': None,
+                        'width': None,
+                        'height': None,
+                        'frames': data_size // fmt['block_align'] if fmt['block_align'] else None,
+                    }
+                else:
+                    f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def _ffprobe(path: str, job_id: str | None = None) -> Dict[str, Any]:
+    cmd = [
+        settings.get_ffprobe(), '-v', 'error',
+        '-show_entries', 'format=duration,format_name:stream=codec_type,codec_name,width,height,sample_rate,channels,duration',
+        '-of', 'json', path,
+    ]
+    try:
+        proc = run_ffmpeg(cmd, job_id=job_id, stage='probe', check=False, capture_stdout=True,
+                          timeout=settings.FFPROBE_TIMEOUT_SEC)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"ffprobe timed out after {settings.FFPROBE_TIMEOUT_SEC:.0f}s for {path}")
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {path}: {proc.stderr.strip()[:300]}")
+    data = json.loads(proc.stdout or '{}')
+    fmt = data.get('format') or {}
+    info: Dict[str, Any] = {
+        'format': fmt.get('format_name'),
+        'duration': None,
+        'sample_rate': None,
+        'channels': None,
+        'audio_codec': None,
+        'video_codec': None,
+        'width': None,
+        'height': None,
+    }
+    durations = []
+    for stream in data.get('streams') or []:
+        if stream.get('duration') not in (None, 'N/A'):
+            durations.append(float(stream['duration']))
+        if stream.get('codec_type') == 'video' and info['video_codec'] is None:
+            info['video_codec'] = stream.get('codec_name')
+            info['width'] = stream.get('width')
+            info['height'] = stream.get('height')
+        elif stream.get('codec_type') == 'audio' and info['audio_codec'] is None:
+            info['audio_codec'] = stream.get('codec_name')
+            info['sample_rate'] = int(stream['sample_rate']) if stream.get('sample_rate') else None
+            info['channels'] = stream.get('channels')
+    if fmt.get('duration') not in (None, 'N/A'):
+        info['duration'] = float(fmt['duration'])
+    elif durations:
+        info['duration'] = max(durations)
+    return info
+
+
+def probe(path: str, job_id: str | None = None) -> Dict[str, Any]:
+    """Return media info for path (cached). Raises FileNotFoundError / RuntimeError."""
+    key = _cache_key(path)
+    if key is None:
+        raise FileNotFoundError(path)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return dict(hit)
+    info = parse_wav_header(path)
+    source = 'header'
+    if info is None:
+        info = _ffprobe(path, job_id=job_id)
+        source = 'ffprobe'
+    log_event(job_id, 'probe', 'probed', file=os.path.basename(path), source=source, duration=info.get('duration'))
+    with _cache_lock:
+        _cache[key] = info
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return dict(info)
+
+
+def cached_probe(path: str) -> Optional[Dict[str, Any]]:
+    """Media info for path if it is already cached (None otherwise); never reads or probes the file."""
+    key = _cache_key(path)
+    if key is None:
+        return None
+    with _cache_lock:
+        hit = _cache.get(key)
+    return dict(hit) if hit is not None else None
+
+
+def probe_many(paths: Iterable[str], job_id: str | None = None, max_workers: int = 4) -> Dict[str, Dict[str, Any]]:
+    """Probe several files; header/cached ones inline, the rest with one ffprobe per file
+    (ffprobe takes a single input) run up to max_workers at a time."""
+    paths = list(paths)
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for p in paths:
+        key = _cache_key(p)
+        with _cache_lock:
+            cached = _cache.get(key) if key else None
+        if cached is not None or (key and p.lower().endswith('.wav')):
+            results[p] = probe(p, job_id=job_id)
+        else:
+            pending.append(p)
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as pool:
+            for p, info in zip(pending, pool.map(lambda x: probe(x, job_id=job_id), pending)):
+                results[p] = info
+    return results
+
+
+def get_duration(path: str, job_id: str | None = None) -> float:
+    duration = probe(path, job_id=job_id).get('duration')
+    if duration is None:
+        raise RuntimeError(f"Could not determine duration of {path}")
+    return float(duration)
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
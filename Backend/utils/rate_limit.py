@@ -0,0 +1,122 @@
+"""Thread-safe token buckets for provider API keys.
+
+Each key gets a bucket holding up to `capacity` requests, refilled at
+`rate_per_sec`; a caller blocks until its key has a token. `KeyPool` spreads
+callers over several keys by handing out whichever key can serve soonest, and
+`penalize()` empties a key's bucket for a while after the provider answers
+429, so the other keys take the load instead of everyone sleeping.
+
+Buckets are process-wide per name (`bucket_for`), so concurrent jobs that use
+the same key share one budget.
+
+    pool = KeyPool(['k1', 'k2'], rate_per_sec=10 / 60, capacity=10)
+    index, key = pool.acquire()
+    call_provider(key)   # on 429: pool.penalize(index, retry_after)
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = max(1e-9, float(rate_per_sec))
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        start = max(self._stamp, self._blocked_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._stamp = max(self._stamp, now)
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` would be available (0 if now)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            blocked = max(0.0, self._blocked_until - now)
+            missing = max(0.0, tokens - self._tokens)
+            return blocked + missing / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._blocked_until and self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until `tokens` are taken; False if timeout elapses first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire(tokens):
+            wait = self.wait_time(tokens)
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                wait = min(wait, left)
+            time.sleep(min(max(wait, 0.005), 1.0))
+        return True
+
+    def penalize(self, seconds: float) -> None:
+        """Empty the bucket and hand out nothing for `seconds` (provider said 429 / Retry-After)."""
+        with self._lock:
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + max(0.0, seconds))
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(name: str, rate_per_sec: float, capacity: float) -> TokenBucket:
+    """Process-wide bucket for a key/name (created on first use)."""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = _buckets[name] = TokenBucket(rate_per_sec, capacity)
+        return bucket
+
+
+class KeyPool:
+    """Hands out API keys so that no key exceeds its own token bucket."""
+
+    def __init__(self, keys: List[str], rate_per_sec: float, capacity: float, namespace: str = 'api'):
+        if not keys:
+            raise ValueError("KeyPool needs at least one key")
+        self.keys = list(keys)
+        # Name buckets by a key fingerprint, never the secret itself
+        self.buckets = [bucket_for(f"{namespace}:{hashlib.sha256(k.encode()).hexdigest()[:12]}", rate_per_sec, capacity) for k in self.keys]
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[Tuple[int, str]]:
+        """(index, key) of a key with a token taken, blocking until one is free; None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                # Round-robin start so load spreads over keys that all have tokens
+                for step in range(len(self.buckets)):
+                    i = (self._next + step) % len(self.buckets)
+                    if self.buckets[i].try_acquire():
+                        self._next = (i + 1) % len(self.buckets)
+                        return i, self.keys[i]
+                wait = min(b.wait_time() for b in self.buckets)
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return None
+                wait = min(wait, left)
+            time.sleep(min(max(wait, 0.005), 1.0))
+
+    def penalize(self, index: int, seconds: float) -> None:
+        self.buckets[index].penalize(seconds)
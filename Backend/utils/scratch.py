@@ -0,0 +1,218 @@
+"""Per-job scratch space for intermediate media on a RAM-backed root.
+
+Intermediate files (segment clips, concat lists, extracted audio) are placed in
+<SCRATCH_RAM_DIR>/yt-scratch-<job>-<pid>-<rand>/ (tmpfs such as /dev/shm) while the
+job's RAM usage stays under SCRATCH_RAM_BUDGET_MB; past the budget, or when the
+RAM filesystem is short on free space, new files spill to a disk directory under
+SCRATCH_DISK_DIR. `cleanup()` removes both directories and logs usage metrics;
+it is also registered as a finalizer, and `sweep_stale()` removes directories
+left behind by processes that died.
+
+    with ScratchSpace(job_id, 'edit') as scratch:
+        seg = scratch.path('segment_0.mp4', estimate=8 << 20)
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+from typing import Any, Dict, Optional
+
+from Config.settings import settings
+from utils.logging_utils import log_event
+
+PREFIX = 'yt-scratch-'
+
+_lock = threading.Lock()
+_live: 'weakref.WeakSet[ScratchSpace]' = weakref.WeakSet()
+
+
+def _dir_bytes(path: Optional[str]) -> int:
+    total = 0
+    if not path:
+        return total
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+                    elif entry.is_dir(follow_symlinks=False):
+                        total += _dir_bytes(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return total
+
+
+def _ram_root() -> Optional[str]:
+    root = (settings.SCRATCH_RAM_DIR or '').strip()
+    if not root or settings.SCRATCH_RAM_BUDGET_MB <= 0:
+        return None
+    return root if os.path.isdir(root) and os.access(root, os.W_OK) else None
+
+
+def _disk_root() -> str:
+    return settings.SCRATCH_DISK_DIR or tempfile.gettempdir()
+
+
+class ScratchSpace:
+    def __init__(self, job_id: Optional[str] = None, stage: str = 'scratch', budget_bytes: Optional[int] = None):
+        self.job_id = job_id
+        self.stage = stage
+        self.budget = settings.SCRATCH_RAM_BUDGET_MB * 1024 * 1024 if budget_bytes is None else max(0, int(budget_bytes))
+        tag = f"{(job_id or 'nojob')[:16]}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        ram_root = _ram_root()
+        self.ram_dir = os.path.join(ram_root, PREFIX + tag) if ram_root and self.budget > 0 else None
+        self.disk_dir = os.path.join(_disk_root(), PREFIX + tag)
+        self._paths: Dict[str, str] = {}
+        self._estimates: Dict[str, int] = {}  # RAM path -> expected size until it is written
+        self.ram_files = 0
+        self.spilled_files = 0
+        self.peak_ram_bytes = 0
+        self.peak_disk_bytes = 0
+        self._finalizer = weakref.finalize(self, _remove_dirs, self.ram_dir, self.disk_dir)
+        with _lock:
+            _live.add(self)
+
+    def __enter__(self) -> 'ScratchSpace':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.cleanup()
+
+    @property
+    def root(self) -> str:
+        """Preferred directory for new files (RAM when available)."""
+        return self.ram_dir or self.disk_dir
+
+    def ram_bytes(self) -> int:
+        return _dir_bytes(self.ram_dir)
+
+    def _committed_ram(self) -> int:
+        # Written files count with their real size, pending ones with their estimate
+        total = 0
+        for path, estimate in list(self._estimates.items()):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                total += estimate
+        return total
+
+    def _job_ram_bytes(self) -> int:
+        # The budget is per job: every live scratch space of the same job counts against it
+        with _lock:
+            spaces = [s for s in _live if s.job_id == self.job_id] if self.job_id else [self]
+        return sum(s._committed_ram() for s in spaces)
+
+    def _fits_in_ram(self, estimate: int) -> bool:
+        if not self.ram_dir:
+            return False
+        if self._job_ram_bytes() + estimate > self.budget:
+            return False
+        try:
+            # Leave headroom on the tmpfs itself; other jobs/processes share it
+            return shutil.disk_usage(os.path.dirname(self.ram_dir)).free > estimate * 2
+        except OSError:
+            return False
+
+    def path(self, name: str, estimate: int = 0) -> str:
+        """Path for an intermediate file; the same name always maps to the same path.
+
+        estimate is the expected size in bytes, used to decide RAM vs disk up front
+        since the file is written later (usually by ffmpeg).
+        """
+        name = os.path.basename(name)
+        with _lock:
+            if name in self._paths:
+                return self._paths[name]
+        in_ram = self._fits_in_ram(max(0, int(estimate)))
+        base = self.ram_dir if in_ram else self.disk_dir
+        try:
+            os.makedirs(base, exist_ok=True)
+        except OSError:
+            in_ram, base = False, self.disk_dir
+            os.makedirs(base, exist_ok=True)
+        path = os.path.join(base, name)
+        with _lock:
+            self._paths[name] = path
+            if in_ram:
+                self.ram_files += 1
+                self._estimates[path] = max(0, int(estimate))
+            else:
+                self.spilled_files += int(self.ram_dir is not None)
+        if not in_ram and self.ram_dir and self.spilled_files == 1:
+            log_event(self.job_id, self.stage, 'scratch_spill', file=name, estimate=estimate, budget=self.budget)
+        self._sample()
+        return path
+
+    def _sample(self) -> None:
+        ram, disk = self.ram_bytes(), _dir_bytes(self.disk_dir)
+        with _lock:
+            self.peak_ram_bytes = max(self.peak_ram_bytes, ram)
+            self.peak_disk_bytes = max(self.peak_disk_bytes, disk)
+
+    def usage(self) -> Dict[str, Any]:
+        self._sample()
+        return {
+            'ram_dir': self.ram_dir,
+            'budget_bytes': self.budget,
+            'ram_bytes': self.ram_bytes(),
+            'disk_bytes': _dir_bytes(self.disk_dir),
+            'peak_ram_bytes': self.peak_ram_bytes,
+            'peak_disk_bytes': self.peak_disk_bytes,
+            'ram_files': self.ram_files,
+            'spilled_files': self.spilled_files,
+        }
+
+    def cleanup(self) -> None:
+        """Remove all scratch files and log usage; safe to call repeatedly."""
+        if self._paths:
+            log_event(self.job_id, self.stage, 'scratch_usage', **self.usage())
+        _remove_dirs(self.ram_dir, self.disk_dir)
+        with _lock:
+            self._paths.clear()
+            self._estimates.clear()
+
+
+def _remove_dirs(*dirs: Optional[str]) -> None:
+    for d in dirs:
+        if d:
+            shutil.rmtree(d, ignore_errors=True)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def sweep_stale() -> int:
+    """Remove scratch directories whose owning process is gone; returns the count removed."""
+    removed = 0
+    for root in {r for r in (_ram_root(), _disk_root()) if r}:
+        try:
+            names = os.listdir(root)
+        except OSError:
+            continue
+        for name in names:
+            if not name.startswith(PREFIX):
+                continue
+            try:
+                pid = int(name[len(PREFIX):].rsplit('-', 2)[-2])
+            except (ValueError, IndexError):
+                continue
+            if pid != os.getpid() and not _pid_alive(pid):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                removed += 1
+    if removed:
+        log_event(None, 'scratch', 'sweep_stale', removed=removed)
+    return removed
@@ -0,0 +1,178 @@
+"""Streaming upload pipeline with size limits, on-the-fly hashing and content dedup.
+
+Request bodies are read in chunks (`await UploadFile.read`) and written to a temp
+file next to their destination from a worker thread, so the event loop never
+blocks on disk I/O and a body over its limit is rejected as soon as it crosses
+it, not after it has been buffered. The sha256 is computed while streaming.
+
+`BlobStore` keeps one file per distinct content in a directory and tracks its
+references in `<root>/.uploads.json`: the same music track uploaded by many users
+is stored once. Every upload gets its own reference (an unguessable id bound to
+the uploader), `release()` drops only a reference the caller holds, and the file
+is deleted when the last reference goes away.
+
+    store = BlobStore(settings.MUSIC_DIR, prefix='bgmusic_')
+    blob = await store.add(upload, max_bytes=50 << 20, owner=user_id)
+    store.release(blob.path, blob.ref, owner=user_id)
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from utils.exceptions import UploadError, UploadTooLargeError
+from utils.logging_utils import log_event
+
+CHUNK_SIZE = 1 << 20
+REFS_FILE = '.uploads.json'
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    sha256: str
+    size: int
+    deduplicated: bool = False
+    ref: Optional[str] = None
+
+
+def _dir_lock(root: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(root), threading.Lock())
+
+
+def safe_extension(filename: Optional[str], max_len: int = 8) -> str:
+    ext = os.path.splitext(os.path.basename(filename or ''))[1].lower()
+    return ext if 1 < len(ext) <= max_len and ext[1:].isalnum() else ''
+
+
+async def stream_to_file(upload: UploadFile, dest_path: str, max_bytes: int, chunk_size: int = CHUNK_SIZE) -> StoredUpload:
+    """Stream an upload to dest_path (via a temp file), enforcing max_bytes; returns size and sha256.
+
+    Raises UploadTooLargeError as soon as the body exceeds max_bytes (the partial file is removed).
+    """
+    tmp = f"{dest_path}.{uuid.uuid4().hex[:8]}.part"
+    h = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, tmp, 'wb')
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise UploadTooLargeError(f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit")
+            h.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(os.replace, tmp, dest_path)
+    except BaseException:
+        f.close()
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return StoredUpload(dest_path, h.hexdigest(), size)
+
+
+class BlobStore:
+    """Content-addressed, reference-counted upload directory (files named <prefix><sha16><ext>)."""
+
+    def __init__(self, root: str, prefix: str = ''):
+        self.root = os.path.abspath(root)
+        self.prefix = prefix
+        os.makedirs(self.root, exist_ok=True)
+
+    def _refs_path(self) -> str:
+        return os.path.join(self.root, REFS_FILE)
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self._refs_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, refs: Dict[str, Any]) -> None:
+        tmp = f"{self._refs_path()}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(refs, f, indent=2)
+        os.replace(tmp, self._refs_path())
+
+    @staticmethod
+    def _references(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        refs = entry.get('refs', [])
+        # Older indexes kept a bare count: those references have no id and cannot be released
+        return [{'id': None, 'owner': None} for _ in range(refs)] if isinstance(refs, int) else refs
+
+    def _commit(self, tmp_path: str, sha: str, size: int, ext: str, owner: Optional[str]) -> StoredUpload:
+        ref = {'id': uuid.uuid4().hex, 'owner': owner}
+        with _dir_lock(self.root):
+            index = self._load()
+            entry = index.get(sha)
+            if entry and os.path.exists(os.path.join(self.root, entry['name'])):
+                os.remove(tmp_path)
+                entry['refs'] = self._references(entry) + [ref]
+                deduplicated = True
+            else:
+                entry = {'name': f"{self.prefix}{sha[:16]}{ext}", 'size': size, 'refs': [ref]}
+                os.replace(tmp_path, os.path.join(self.root, entry['name']))
+                deduplicated = False
+            index[sha] = entry
+            self._save(index)
+        return StoredUpload(os.path.join(self.root, entry['name']), sha, size, deduplicated, ref['id'])
+
+    async def add(self, upload: UploadFile, max_bytes: int, owner: Optional[str] = None, job_id: Optional[str] = None) -> StoredUpload:
+        """Stream upload into the store; identical content returns the existing file with a new reference for owner."""
+        ext = safe_extension(upload.filename)
+        tmp = os.path.join(self.root, f".incoming-{uuid.uuid4().hex}{ext}")
+        streamed = await stream_to_file(upload, tmp, max_bytes)
+        if not streamed.size:
+            os.remove(tmp)
+            raise UploadError("Empty upload")
+        blob = await asyncio.to_thread(self._commit, tmp, streamed.sha256, streamed.size, ext, owner)
+        log_event(job_id, 'upload', 'upload_stored', store=os.path.basename(self.root), file=os.path.basename(blob.path),
+                  size=blob.size, deduplicated=blob.deduplicated)
+        return blob
+
+    def release(self, path: str, ref: str, owner: Optional[str] = None) -> bool:
+        """Drop the caller's reference `ref` to the blob at path; the file is deleted with its last reference.
+
+        Returns False (and changes nothing) unless path belongs to this store and holds
+        `ref` uploaded by `owner`.
+        """
+        name = os.path.basename(path)
+        if not ref or os.path.dirname(os.path.abspath(path)) != self.root:
+            return False
+        with _dir_lock(self.root):
+            index = self._load()
+            sha = next((k for k, e in index.items() if e.get('name') == name), None)
+            if sha is None:
+                return False
+            refs = self._references(index[sha])
+            remaining = [r for r in refs if not (r['id'] == ref and r['owner'] == owner)]
+            if len(remaining) == len(refs):
+                return False
+            if remaining:
+                index[sha]['refs'] = remaining
+            else:
+                del index[sha]
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+            self._save(index)
+        return True
@@ -131,7 +131,7 @@ export function PipelineProvider({ children }) {
       if (file) {
         const up = await api.uploadMusic(file);
         music_path = up.music_path;
-        await api.addBackgroundMusic({ music_path, video_mode: state.videoMode });
+        await api.addBackgroundMusic({ music_path, video_mode: state.videoMode, job_id: state.jobId || undefined });
       }
       update({ bgAdded: true });
       if (addCaptions) {
@@ -147,7 +147,7 @@ export function PipelineProvider({ children }) {
   const addCaptionsToVideo = async () => {
     startLoading('Adding captions...');
     try {
-      await api.addCaptions({ video_mode: state.videoMode });
+      await api.addCaptions({ video_mode: state.videoMode, job_id: state.jobId || undefined });
       update({ captions: true });
       await fetchFinalVideo(true, state.bgAdded);
       update({ step: 9 });
@@ -160,7 +160,8 @@ export function PipelineProvider({ children }) {
     try {
       const file = captions ? 'output_with_glowing_captions.mp4' : (bg ? 'youtube_shorts_with_music.mp4' : 'youtube_shorts.mp4');
       const cacheBust = `t=${Date.now()}`;
-      const url = `${apiBase()}/video?file=${file}&${cacheBust}`;
+      const jobParam = state.jobId ? `&job_id=${encodeURIComponent(state.jobId)}` : '';
+      const url = `${apiBase()}/video?file=${file}${jobParam}&${cacheBust}`;
       // simple fetch to validate
       const res = await fetch(url);
       if (!res.ok) throw new Error(`Video fetch failed ${res.status}`);